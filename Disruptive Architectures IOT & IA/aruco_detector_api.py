@@ -7,87 +7,181 @@ import cv2
 import numpy as np
 import requests
 import json
+import os
 import time
 from datetime import datetime
 
+from circuit_breaker import CLOSED, CircuitOpenError
+from frame_sources import open_source
+from java_client import JavaApiClient
+from pose import DEFAULT_CALIBRATION_DIR, pose_estimator
+from tag_batcher import BulkNotSupported, TagBatcher
+from tag_outbox import TagOutbox
+from tag_presence import ENTER, EXIT, TagPresenceTracker
+
 # ========== CONFIGURAÇÕES ==========
 # API Backend Java
 API_BASE_URL = "http://localhost:8080/api/aruco-tags/cadastrar"
 API_GET_URL = "http://localhost:8080/api/aruco-tags/listar"
+API_BULK_URL = "http://localhost:8080/api/aruco-tags/cadastrar-lote"
+API_LOGIN_URL = "http://localhost:8080/api/login"
 API_TIMEOUT = 5  # segundos
+API_EMAIL = "admin@email.com"
+API_SENHA = "adminmottu"
+HTTP_POOL_SIZE = 2  # conexões keep-alive com a API
+CIRCUITO_FALHAS = 3  # falhas seguidas até parar de chamar a API (circuit breaker)
+CIRCUITO_ESPERA_S = 15  # segundos com o circuito aberto antes de testar de novo
 
 # Configurações de Câmera
 CAMERA_ID = 0  # 0 para webcam padrão
 CAMERA_NAME = "Camera Principal"
+# Fonte de frames: None usa CAMERA_ID; também aceita caminho de vídeo/pasta de imagens,
+# "synthetic" ou um dict (ver frame_sources.open_source)
+FONTE = None
+# Câmera ao vivo: thread de grab() contínuo, processa sempre o frame mais novo
+# (sem ela o buffer do driver acumula frames quando a detecção atrasa)
+USAR_GRABBER = True
 
 # Configurações ArUco
 ARUCO_DICT = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
 ARUCO_PARAMS = cv2.aruco.DetectorParameters()
 ARUCO_DETECTOR = cv2.aruco.ArucoDetector(ARUCO_DICT, ARUCO_PARAMS)
 
-# Parâmetros de câmera para estimativa de distância
+# Estimativa de distância: calibração da câmera em CALIBRACAO_DIR/camera_<id>.npz
+# (ver pose.py); sem arquivo usa a matriz padrão (f=1000 px em 1280x720)
 REAL_MARKER_SIZE_M = 0.05  # Tamanho real do marcador em metros
-CAMERA_MATRIX = np.array([[1000, 0, 640], [0, 1000, 360], [0, 0, 1]], dtype=np.float32)
-DIST_COEFFS = np.zeros((4, 1), dtype=np.float32)
+CALIBRACAO_DIR = DEFAULT_CALIBRATION_DIR
 
 # Cores
 COLOR_ARUCO = (0, 255, 0)  # Verde
 COLOR_TEXT = (255, 255, 255)  # Branco
 COLOR_BG = (0, 0, 0)  # Preto
 
-# Controle de envio
-ENVIO_INTERVALO = 2  # segundos entre envios da mesma tag
-tags_enviadas = {}  # {tag_id: timestamp_ultimo_envio}
+# Controle de envio: só quando a tag entra (vista em PRESENCA_FRAMES_ENTRADA frames)
+# ou, com ENVIAR_SAIDA, quando sai (não vista por PRESENCA_SAIDA_S); heartbeat opcional
+PRESENCA_FRAMES_ENTRADA = 2
+PRESENCA_SAIDA_S = 3.0  # segundos sem ver a tag até considerar que saiu
+PRESENCA_HEARTBEAT_S = 0  # reenvio periódico enquanto presente (0 = desligado)
+ENVIAR_SAIDA = False
+STATUS_SAIDA = "AUSENTE"
+PRESENCA = TagPresenceTracker(
+    PRESENCA_FRAMES_ENTRADA, PRESENCA_SAIDA_S, PRESENCA_HEARTBEAT_S
+)
+
+# Outbox durável: envios gravados num SQLite local e reenviados quando a API volta.
+# Opcional (cria um banco em disco ao lado do script): ative com USAR_OUTBOX = True
+USAR_OUTBOX = False
+OUTBOX_ARQUIVO = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "tag_outbox_desktop.db"
+)
+OUTBOX = None  # criada em run_detector
+
+# Envio em lote: agrupa tags por janela de tempo ou quantidade num único POST
+MODO_LOTE = False
+LOTE_JANELA_S = 0.25  # segundos
+LOTE_MAX_TAGS = 20
+
+
+# Sessão HTTP compartilhada (keep-alive, JWT renovado antes de expirar, retry após 401)
+JAVA = JavaApiClient(
+    "http://localhost:8080",
+    API_EMAIL,
+    API_SENHA,
+    timeout=API_TIMEOUT,
+    pool_size=HTTP_POOL_SIZE,
+    login_url=API_LOGIN_URL,
+    log_prefix="🔐",
+    breaker_failures=CIRCUITO_FALHAS,
+    breaker_reset_s=CIRCUITO_ESPERA_S,
+)
 
 
 class APIClient:
     """Cliente para comunicação com a API Java"""
 
     @staticmethod
-    def enviar_aruco_tag(tag_id, id_moto=None):
+    def enviar_aruco_tag(tag_id, id_moto=None, status="DETECTADO"):
         """
         Envia informações da tag ArUco para a API Java
 
         Args:
             tag_id: ID do marcador ArUco detectado
             id_moto: ID da moto associada (opcional)
+            status: Status da tag (DETECTADO na entrada, STATUS_SAIDA na saída)
 
         Returns:
-            dict: Resposta da API ou None em caso de erro
+            bool: True se a API aceitou a tag (HTTP 200/201, com ou sem corpo JSON)
         """
         try:
             # Dados a serem enviados (seguindo o DTO do Java)
             payload = {
                 "codigo": f"ARUCO-{tag_id}",
-                "status": "DETECTADO",
+                "status": status,
                 "idMoto": id_moto if id_moto else 1,  # Moto padrão se não especificado
             }
 
-            # Headers
-            headers = {"Content-Type": "application/json", "Accept": "application/json"}
-
-            # Faz a requisição POST
-            response = requests.post(
-                API_BASE_URL, json=payload, headers=headers, timeout=API_TIMEOUT
-            )
+            # Faz a requisição POST (sessão compartilhada com JWT)
+            response = JAVA.post(API_BASE_URL, json=payload)
 
+            # sucesso decidido pelo status: um 201 sem corpo JSON também foi gravado,
+            # e tratá-lo como falha faria a outbox reenviar (e duplicar) a tag
             if response.status_code == 201 or response.status_code == 200:
                 print(f"✅ Tag {tag_id} enviada com sucesso!")
-                return response.json()
+                return True
             else:
                 print(f"⚠️ Erro ao enviar tag {tag_id}: Status {response.status_code}")
                 print(f"Resposta: {response.text}")
-                return None
+                return False
 
+        except CircuitOpenError:
+            # API fora do ar: recusado na hora, sem esperar o timeout
+            return False
         except requests.exceptions.Timeout:
             print(f"⏰ Timeout ao enviar tag {tag_id}")
-            return None
+            return False
         except requests.exceptions.ConnectionError:
             print(f"🔌 Erro de conexão com a API. Verifique se o backend está rodando.")
-            return None
+            return False
         except Exception as e:
             print(f"❌ Erro inesperado ao enviar tag {tag_id}: {str(e)}")
-            return None
+            return False
+
+    @staticmethod
+    def enviar_lote_aruco_tags(itens, id_moto=None):
+        """
+        Envia várias tags ArUco numa única requisição ao endpoint de lote
+
+        Args:
+            itens: Lista de (ID do marcador ArUco, status)
+            id_moto: ID da moto associada (opcional)
+
+        Returns:
+            bool: True se o lote foi aceito pela API
+
+        Raises:
+            BulkNotSupported: se a API não tiver o endpoint de lote
+        """
+        payload = [
+            {
+                "codigo": f"ARUCO-{tag_id}",
+                "status": status,
+                "idMoto": id_moto if id_moto else 1,
+            }
+            for tag_id, status in itens
+        ]
+        try:
+            response = JAVA.post(API_BULK_URL, json=payload)
+        except Exception as e:
+            print(f"❌ Erro ao enviar lote de {len(itens)} tags: {str(e)}")
+            return False
+
+        if response.status_code in (404, 405, 501):
+            raise BulkNotSupported(response.status_code)
+        if response.status_code in (200, 201):
+            print(f"✅ Lote com {len(itens)} tags enviado com sucesso!")
+            return True
+        print(f"⚠️ Erro ao enviar lote: Status {response.status_code}")
+        return False
 
     @staticmethod
     def buscar_tags():
@@ -98,7 +192,7 @@ class APIClient:
             list: Lista de tags ou None em caso de erro
         """
         try:
-            response = requests.get(API_GET_URL, timeout=API_TIMEOUT)
+            response = JAVA.get(API_GET_URL)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -107,17 +201,46 @@ class APIClient:
             return None
 
 
-def pode_enviar_tag(tag_id):
-    """
-    Verifica se a tag pode ser enviada novamente
-    (evita spam de envios da mesma tag)
+BATCHER = TagBatcher(
+    APIClient.enviar_lote_aruco_tags,
+    lambda item: APIClient.enviar_aruco_tag(item[0], status=item[1]),
+    max_size=LOTE_MAX_TAGS,
+    window_s=LOTE_JANELA_S,
+)
+
+
+def enviar_eventos_presenca(eventos, enviar_para_api=True):
     """
-    agora = time.time()
-    if tag_id not in tags_enviadas:
-        return True
+    Envia à API os eventos de presença do frame (entrada/heartbeat e, com
+    ENVIAR_SAIDA, saída)
 
-    tempo_decorrido = agora - tags_enviadas[tag_id]
-    return tempo_decorrido >= ENVIO_INTERVALO
+    Returns:
+        set: IDs das tags enviadas (ou gravadas na outbox) neste frame
+    """
+    enviadas = set()
+    for evento in eventos:
+        if evento.kind == EXIT:
+            print(f"👋 Tag {evento.tag_id} saiu (visível por {evento.duration_s:.0f}s)")
+            if not ENVIAR_SAIDA:
+                continue
+        elif evento.kind == ENTER:
+            print(f"🆕 Tag {evento.tag_id} entrou")
+        if not enviar_para_api:
+            continue
+        status = STATUS_SAIDA if evento.kind == EXIT else "DETECTADO"
+        if OUTBOX is not None:
+            # a outbox reenvia até a API confirmar; a chave evita gravar duas vezes
+            chave = f"{evento.tag_id}:{evento.kind}:{evento.timestamp:.3f}"
+            OUTBOX.put([evento.tag_id, status], key=chave)
+            enviadas.add(evento.tag_id)
+        elif MODO_LOTE:
+            BATCHER.add((evento.tag_id, status), key=(evento.tag_id, status))
+        elif APIClient.enviar_aruco_tag(evento.tag_id, status=status):
+            enviadas.add(evento.tag_id)
+        elif evento.kind == ENTER:
+            # tenta de novo na próxima vez que a tag for vista
+            PRESENCA.retry(evento.tag_id)
+    return enviadas
 
 
 def processar_frame(frame, enviar_para_api=True):
@@ -139,27 +262,36 @@ def processar_frame(frame, enviar_para_api=True):
     # Detecta marcadores ArUco
     corners, ids, rejected = ARUCO_DETECTOR.detectMarkers(gray)
 
+    # Presença: só entradas/saídas (e heartbeats) viram envios
+    ids_vistos = [] if ids is None else [int(i) for i in ids.ravel()]
+    enviadas = enviar_eventos_presenca(PRESENCA.update(ids_vistos), enviar_para_api)
+
     if ids is not None:
         aruco_count = len(ids)
 
         # Desenha marcadores detectados
-        cv2.aruco.drawDetectedMarkers(frame, corners, ids, borderColor=COLOR_ARUCO)
+        cv2.aruco.drawDetectedMarkers(
+            frame, corners, ids.reshape(-1, 1), borderColor=COLOR_ARUCO
+        )
 
-        # Estima pose e distância
-        rvecs, tvecs, _ = cv2.aruco.estimatePoseSingleMarkers(
-            corners, REAL_MARKER_SIZE_M, CAMERA_MATRIX, DIST_COEFFS
+        # Estima pose e distância de todos os marcadores de uma vez
+        altura, largura = frame.shape[:2]
+        estimador = pose_estimator(
+            CAMERA_ID, (largura, altura), CALIBRACAO_DIR, REAL_MARKER_SIZE_M
         )
+        distancias = estimador.estimate(corners).distances
 
-        for i, marker_id in enumerate(ids):
-            tag_id = int(marker_id[0])
-            distancia = tvecs[i][0][2]
+        for i, tag_id in enumerate(ids_vistos):
+            distancia = distancias[i]
 
             # Posição para o texto
             canto_superior_esquerdo = tuple(corners[i][0][0].astype(int))
 
             # Informações do marcador
             id_texto = f"ID: {tag_id}"
-            dist_texto = f"Dist: {distancia:.2f}m"
+            dist_texto = (
+                f"Dist: {distancia:.2f}m" if np.isfinite(distancia) else "Dist: --"
+            )
 
             # Desenha informações
             cv2.putText(
@@ -181,21 +313,17 @@ def processar_frame(frame, enviar_para_api=True):
                 2,
             )
 
-            # Envia para API se habilitado e se passou o intervalo
-            if enviar_para_api and pode_enviar_tag(tag_id):
-                resultado = APIClient.enviar_aruco_tag(tag_id)
-                if resultado:
-                    tags_enviadas[tag_id] = time.time()
-                    # Feedback visual
-                    cv2.putText(
-                        frame,
-                        "ENVIADO!",
-                        (canto_superior_esquerdo[0], canto_superior_esquerdo[1] - 50),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 255, 255),
-                        2,
-                    )
+            if tag_id in enviadas:
+                # Feedback visual
+                cv2.putText(
+                    frame,
+                    "ENVIADO!",
+                    (canto_superior_esquerdo[0], canto_superior_esquerdo[1] - 50),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    (0, 255, 255),
+                    2,
+                )
 
     # Contador na tela
     contador_texto = f"ArUco Tags: {aruco_count}"
@@ -208,6 +336,9 @@ def processar_frame(frame, enviar_para_api=True):
     # Status da API
     status_texto = "API: Conectado" if enviar_para_api else "API: Desconectado"
     status_cor = (0, 255, 0) if enviar_para_api else (0, 0, 255)
+    if enviar_para_api and JAVA.breaker.state != CLOSED:
+        # circuit breaker aberto: envios ficam na outbox até a API voltar
+        status_texto, status_cor = "API: Fora do ar", (0, 165, 255)
     cv2.putText(
         frame, status_texto, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_cor, 2
     )
@@ -215,19 +346,28 @@ def processar_frame(frame, enviar_para_api=True):
     return frame
 
 
-def run_detector(enviar_para_api=True):
+def _enviar_item_outbox(item):
+    tag_id, status = item
+    return APIClient.enviar_aruco_tag(tag_id, status=status)
+
+
+def run_detector(enviar_para_api=True, fonte=None):
     """
     Inicia o detector de ArUco em tempo real
 
     Args:
         enviar_para_api: Se True, envia detecções para a API Java
+        fonte: Fonte de frames (padrão: FONTE ou a câmera CAMERA_ID)
     """
+    global OUTBOX
     print("=" * 60)
     print("🚀 MottuFlow - Detector ArUco IoT")
     print("=" * 60)
     print(f"📹 Câmera: {CAMERA_NAME}")
     print(f"🔗 API: {API_BASE_URL}")
     print(f"📊 Enviando para API: {'Sim' if enviar_para_api else 'Não'}")
+    if MODO_LOTE:
+        print(f"📦 Modo lote: até {LOTE_MAX_TAGS} tags a cada {LOTE_JANELA_S * 1000:.0f} ms")
     print("=" * 60)
     print("\n⌨️  Controles:")
     print("  [Q] - Sair")
@@ -235,27 +375,51 @@ def run_detector(enviar_para_api=True):
     print("  [L] - Listar tags cadastradas")
     print("=" * 60)
 
-    # Abre a câmera
-    cap = cv2.VideoCapture(CAMERA_ID)
+    # Abre a câmera (ou vídeo/pasta/sintético)
+    fonte = fonte if fonte is not None else FONTE
+    cap = open_source(fonte if fonte is not None else CAMERA_ID, USAR_GRABBER)
 
     if not cap.isOpened():
-        print(f"❌ Erro: Não foi possível abrir a câmera {CAMERA_ID}")
+        print(f"❌ Erro: Não foi possível abrir a fonte {cap.description}")
+        cap.release()
         return
 
     print("\n✅ Câmera iniciada. Aguardando detecções...")
+    if enviar_para_api:
+        JAVA.start_refresher()
+    if USAR_OUTBOX and OUTBOX is None:
+        OUTBOX = TagOutbox(
+            APIClient.enviar_lote_aruco_tags if MODO_LOTE else None,
+            _enviar_item_outbox,
+            path=OUTBOX_ARQUIVO,
+            batch_size=LOTE_MAX_TAGS,
+        )
+    if OUTBOX is not None:
+        OUTBOX.start()
+        pendentes = OUTBOX.pending()
+        if pendentes:
+            print(f"📬 Outbox: {pendentes} envios pendentes de execuções anteriores")
 
     enviar_api_ativo = enviar_para_api
+    idade_total = 0.0  # soma da idade dos frames processados (s)
+    frames_processados = 0
 
     try:
         while True:
             ret, frame = cap.read()
 
             if not ret:
-                print("❌ Erro ao capturar frame")
+                if cap.exhausted:
+                    print(f"\n🏁 Fim da fonte {cap.description}")
+                else:
+                    print("❌ Erro ao capturar frame")
                 break
 
             # Processa o frame
             processed_frame = processar_frame(frame, enviar_api_ativo)
+            if cap.last_frame_ts is not None:
+                idade_total += time.monotonic() - cap.last_frame_ts
+                frames_processados += 1
 
             # Mostra o resultado
             cv2.imshow("MottuFlow - ArUco Detector", processed_frame)
@@ -286,6 +450,20 @@ def run_detector(enviar_para_api=True):
     finally:
         cap.release()
         cv2.destroyAllWindows()
+        # tags ainda presentes saem junto com o detector
+        enviar_eventos_presenca(PRESENCA.flush(), enviar_api_ativo)
+        if frames_processados:
+            print(
+                f"⏱️ Idade média do frame processado: "
+                f"{idade_total / frames_processados * 1000:.1f} ms"
+            )
+        if OUTBOX is not None:
+            OUTBOX.stop()
+            if OUTBOX.pending():
+                print(f"📬 Outbox: {OUTBOX.pending()} envios ficam para a próxima execução")
+        if MODO_LOTE:
+            BATCHER.stop()
+            print(f"📦 Lotes: {BATCHER.stats()['batch_size']}")
         print("✅ Detector encerrado")
 
 
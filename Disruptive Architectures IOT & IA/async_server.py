@@ -0,0 +1,447 @@
+"""
+Modo de servidor asyncio para muitos espectadores simultâneos (SERVER_MODE=asyncio).
+
+No servidor threaded do Flask cada cliente de /stream prende uma thread do SO
+dormindo no ``mjpeg_generator``. Aqui cada espectador é uma corrotina:
+
+- /stream, /cameras/<id>/stream, /events e /cameras/<id>/events são atendidos direto
+  no event loop. Para cada (pipeline, perfil) existe um único ``_Feed``: uma thread do
+  executor de feeds espera o próximo frame no FrameBroadcaster (ou o próximo evento no
+  DetectionEvents) e acorda todas as corrotinas daquele perfil de uma vez. Threads =
+  número de perfis em uso, não de espectadores.
+- Espectadores lentos continuam pulando para o frame mais novo: o feed só guarda o
+  último item, e cada corrotina espera o ``drain()`` do seu socket antes de pedir o
+  próximo.
+- As demais rotas (/status, /start, /stop, /config, /metrics, /ui...) são repassadas
+  ao app Flask como WSGI, executadas num executor próprio, então o comportamento é o
+  mesmo do modo padrão.
+- Os dois executores são separados e com tamanho explícito (``feed_workers``,
+  ``wsgi_workers``): muitos feeds bloqueados esperando frame não deixam /status ou
+  /stop sem thread, e rajadas de WSGI não atrasam os frames.
+- As respostas de stream/events recebem os cabeçalhos extras de
+  ``response_headers(path, headers)`` (ex.: os de CORS que o app Flask aplicaria).
+
+Só stdlib (asyncio), sem dependência nova. HTTP/1.1 mínimo: uma requisição por
+conexão (``Connection: close``), suficiente para o navegador, curl e o teste de
+carga ``load_test_stream.py``.
+"""
+
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+import json
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from detection_events import EVENT_MODES
+from mjpeg_broadcaster import StreamProfile
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+FEED_WAIT_S = 1.0  # timeout de cada espera do feed no executor
+SSE_KEEPALIVE_S = 15.0
+
+_STREAM_ROUTE = re.compile(r"^(?:/cameras/(\d+))?/(stream|events)$")
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class _RequestError(Exception):
+    """Requisição malformada: respondida com ``status`` sem chegar ao app."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# camera_id (None = câmera selecionada) -> pipeline, ou None se não existir
+PipelineLookup = Callable[[Optional[int]], object]
+# (path, cabeçalhos da requisição) -> cabeçalhos extras da resposta
+HeaderHook = Callable[[str, Dict[str, str]], List[Tuple[str, str]]]
+
+
+def _mjpeg_part(item: Optional[Tuple[int, bytes]]) -> Optional[Tuple[int, bytes]]:
+    """(seq, jpeg) -> (seq, parte multipart pronta), montada uma vez por frame e
+    perfil (no executor), não uma vez por espectador."""
+    if item is None:
+        return None
+    seq, jpeg = item
+    return seq, b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
+
+
+def _sse_event(item: Optional[Tuple[int, str]]) -> Optional[Tuple[int, bytes]]:
+    if item is None:
+        return None
+    seq, data = item
+    return seq, f"id: {seq}\nevent: detection\ndata: {data}\n\n".encode()
+
+
+class _Feed:
+    """Último item de uma fonte bloqueante, entregue a N corrotinas.
+
+    ``fetch(last_seq)`` roda no executor e retorna (seq, payload) ou None no timeout.
+    O feed para sozinho quando não há mais assinantes.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[int], Optional[Tuple[int, object]]],
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.fetch = fetch
+        self.executor = executor  # None = executor padrão do loop
+        self.seq = 0
+        self.payload = None
+        self.subscribers = 0
+        self._event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> None:
+        self.subscribers += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self) -> None:
+        self.subscribers -= 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.subscribers > 0:
+            item = await loop.run_in_executor(self.executor, self.fetch, self.seq)
+            if item is None:
+                continue
+            self.seq, self.payload = item
+            # troca o Event: quem acordar agora vê o item novo, quem chegar depois
+            # espera o próximo
+            event, self._event = self._event, asyncio.Event()
+            event.set()
+
+    async def wait(
+        self, last_seq: int, timeout: Optional[float] = None
+    ) -> Optional[Tuple[int, object]]:
+        """Item mais novo que ``last_seq`` ou None no timeout (sem timeout, espera
+        direto no Event: nenhuma tarefa extra por frame e espectador)."""
+        if self.seq > last_seq:
+            return self.seq, self.payload
+        if timeout is None:
+            await self._event.wait()
+            return self.seq, self.payload
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.seq, self.payload
+
+
+class AsyncStreamServer:
+    """Servidor HTTP asyncio: streams como corrotinas, o resto via WSGI (Flask)."""
+
+    def __init__(
+        self,
+        wsgi_app,
+        pipeline_for: PipelineLookup,
+        response_headers: Optional[HeaderHook] = None,
+        feed_workers: int = 32,
+        wsgi_workers: int = 8,
+    ):
+        self.wsgi_app = wsgi_app
+        self.pipeline_for = pipeline_for
+        self.response_headers = response_headers
+        # cada feed ocupa uma thread enquanto espera (até FEED_WAIT_S): o limite de
+        # feeds é o de pares (pipeline, perfil) ativos ao mesmo tempo
+        self.feed_workers = max(1, int(feed_workers))
+        self.wsgi_workers = max(1, int(wsgi_workers))
+        self._feed_executor = ThreadPoolExecutor(
+            self.feed_workers, thread_name_prefix="feed"
+        )
+        self._wsgi_executor = ThreadPoolExecutor(
+            self.wsgi_workers, thread_name_prefix="wsgi"
+        )
+        self._feeds: Dict[tuple, _Feed] = {}
+        self.viewers = 0
+        self.subscribers = 0
+        self.requests = 0
+
+    # ------------------------------------------------------------------ feeds
+    def _subscribe(self, key: tuple, make_fetch: Callable) -> _Feed:
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = _Feed(make_fetch(), self._feed_executor)
+        feed.subscribe()
+        return feed
+
+    def _unsubscribe(self, key: tuple, feed: _Feed) -> None:
+        feed.unsubscribe()
+        if feed.subscribers == 0 and self._feeds.get(key) is feed:
+            del self._feeds[key]  # a tarefa do feed termina na próxima volta
+
+    # ------------------------------------------------------------------ conexões
+    async def handle(self, reader, writer) -> None:
+        try:
+            try:
+                request = await self._read_request(reader)
+            except _RequestError as e:
+                await self._send_json(writer, e.status, {"ok": False, "error": str(e)})
+                return
+            if request is None:
+                return
+            self.requests += 1
+            method, path, query, headers, body = request
+            match = _STREAM_ROUTE.match(path) if method == "GET" else None
+            if match:
+                cam_id = int(match.group(1)) if match.group(1) else None
+                pipe = self.pipeline_for(cam_id)
+                extra = (
+                    self.response_headers(path, headers)
+                    if self.response_headers is not None
+                    else []
+                )
+                if pipe is None:
+                    await self._send_json(
+                        writer,
+                        404,
+                        {"ok": False, "error": "Pipeline não encontrado"},
+                        extra,
+                    )
+                elif match.group(2) == "stream":
+                    await self._stream(writer, pipe, query, extra)
+                else:
+                    await self._events(writer, pipe, query, extra)
+            else:
+                await self._wsgi(writer, method, path, query, headers, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # cliente fechou a conexão
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.LimitOverrunError, asyncio.IncompleteReadError):
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        raw_length = headers.get("content-length") or "0"
+        # só dígitos ASCII: int() aceitaria "-1", "+5" e "1_000"
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            raise _RequestError(400, f"Content-Length inválido: {raw_length!r}")
+        length = int(raw_length)
+        if length > MAX_BODY_BYTES:
+            # não trunca: o app receberia um corpo incompleto como se fosse inteiro
+            raise _RequestError(413, f"Corpo maior que {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return method.upper(), unquote(url.path), url.query, headers, body
+
+    @staticmethod
+    def _head(status: int, headers: list) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        lines.append("Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(
+        self, writer, status: int, payload: dict, extra: Optional[list] = None
+    ) -> None:
+        body = json.dumps(payload).encode()
+        writer.write(
+            self._head(
+                status,
+                [("Content-Type", "application/json"), ("Content-Length", len(body))]
+                + (extra or []),
+            )
+            + body
+        )
+        await writer.drain()
+
+    # ------------------------------------------------------------------ /stream
+    async def _stream(self, writer, pipe, query: str, extra: list) -> None:
+        """Mesmo protocolo do ``mjpeg_generator``, como corrotina."""
+        try:
+            profile = StreamProfile.from_args(
+                dict(parse_qsl(query)), pipe.broadcaster.jpeg_quality
+            )
+        except ValueError as e:
+            await self._send_json(writer, 400, {"ok": False, "error": str(e)}, extra)
+            return
+        writer.write(
+            self._head(
+                200,
+                [
+                    ("Content-Type", "multipart/x-mixed-replace; boundary=frame"),
+                    ("Cache-Control", "no-cache, no-store, must-revalidate"),
+                    ("Pragma", "no-cache"),
+                    ("Expires", "0"),
+                ]
+                + extra,
+            )
+        )
+        broadcaster = pipe.broadcaster
+        key = ("stream", id(pipe), profile.encode_key)
+        feed = self._subscribe(
+            key,
+            lambda: lambda seq: _mjpeg_part(
+                broadcaster.wait_jpeg(seq, FEED_WAIT_S, profile)
+            ),
+        )
+        interval = 1.0 / profile.fps if profile.fps else 0.0
+        next_due = 0.0
+        last_seq = 0
+        self.viewers += 1
+        try:
+            # conta o cliente no broadcaster (o overlay só é desenhado com espectador)
+            with pipe.broadcaster.client(profile):
+                while True:
+                    if interval:
+                        now = time.monotonic()
+                        if next_due > now:
+                            await asyncio.sleep(next_due - now)
+                        next_due = max(next_due, now) + interval
+                    last_seq, part = await feed.wait(last_seq)
+                    writer.write(part)
+                    await writer.drain()
+        finally:
+            self.viewers -= 1
+            self._unsubscribe(key, feed)
+
+    # ------------------------------------------------------------------ /events
+    async def _events(self, writer, pipe, query: str, extra: list) -> None:
+        """Mesmo protocolo do ``event_generator``, como corrotina."""
+        mode = dict(parse_qsl(query)).get("mode", "change")
+        if mode not in EVENT_MODES:
+            await self._send_json(
+                writer,
+                400,
+                {"ok": False, "error": f"mode inválido (use {', '.join(EVENT_MODES)})"},
+                extra,
+            )
+            return
+        writer.write(
+            self._head(
+                200,
+                [
+                    ("Content-Type", "text/event-stream"),
+                    ("Cache-Control", "no-cache"),
+                    ("X-Accel-Buffering", "no"),
+                ]
+                + extra,
+            )
+            + b"retry: 2000\n\n"
+        )
+        await writer.drain()
+        events = pipe.events
+        key = ("events", id(pipe), mode)
+        feed = self._subscribe(
+            key,
+            lambda: lambda seq: _sse_event(events.wait_event(seq, mode, FEED_WAIT_S)),
+        )
+        last_seq = 0
+        self.subscribers += 1
+        try:
+            with pipe.events.client():
+                while True:
+                    item = await feed.wait(last_seq, SSE_KEEPALIVE_S)
+                    if item is None:
+                        writer.write(b": keepalive\n\n")
+                    else:
+                        last_seq, event = item
+                        writer.write(event)
+                    await writer.drain()
+        finally:
+            self.subscribers -= 1
+            self._unsubscribe(key, feed)
+
+    # ------------------------------------------------------------------ WSGI (Flask)
+    async def _wsgi(self, writer, method, path, query, headers, body) -> None:
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "asyncio",
+            "SERVER_PORT": "0",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "CONTENT_TYPE": headers.get("content-type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            if name not in ("content-type", "content-length"):
+                environ["HTTP_" + name.upper().replace("-", "_")] = value
+
+        def call():
+            started = {}
+
+            def start_response(status, response_headers, exc_info=None):
+                started["status"] = int(status.split(" ", 1)[0])
+                started["headers"] = response_headers
+
+            result = self.wsgi_app(environ, start_response)
+            try:
+                data = b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+            return started["status"], started["headers"], data
+
+        status, response_headers, data = (
+            await asyncio.get_running_loop().run_in_executor(self._wsgi_executor, call)
+        )
+        response_headers = [
+            (name, value)
+            for name, value in response_headers
+            if name.lower() not in ("content-length", "connection")
+        ]
+        response_headers.append(("Content-Length", len(data)))
+        writer.write(self._head(status, response_headers) + data)
+        await writer.drain()
+
+    # ------------------------------------------------------------------ métricas
+    def stats(self) -> dict:
+        return {
+            "viewers": self.viewers,
+            "event_subscribers": self.subscribers,
+            "feeds": len(self._feeds),
+            "feed_workers": self.feed_workers,
+            "wsgi_workers": self.wsgi_workers,
+            "requests": self.requests,
+        }
+
+
+async def _serve(server: AsyncStreamServer, host: str, port: int) -> None:
+    srv = await asyncio.start_server(
+        server.handle, host, port, limit=MAX_HEADER_BYTES, backlog=1024
+    )
+    async with srv:
+        await srv.serve_forever()
+
+
+def serve(server: AsyncStreamServer, host: str = "0.0.0.0", port: int = 5001) -> None:
+    """Roda o servidor até Ctrl+C."""
+    try:
+        asyncio.run(_serve(server, host, port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,229 @@
+"""
+Corpus de frames rotulados para benchmark e ajuste da detecção (sem câmera).
+
+Um corpus é uma lista de ``LabeledFrame`` (imagem BGR + ids esperados). Pode vir de:
+- ``synthetic_corpus``: cenas geradas com marcadores em perspectiva, escala e rotação
+  aleatórias, sob condições de luz variadas ("day", "night", "blur", "noise"); a
+  mesma ``seed`` gera sempre o mesmo corpus.
+- ``load_corpus``: pasta com imagens e um ``labels.json``
+  ({"dict": "DICT_6X6_250", "frames": [{"file": "0001.png", "ids": [3, 7]}, ...]}),
+  por exemplo frames gravados do pátio e rotulados à mão.
+
+``score`` compara ids detectados com os esperados (verdadeiros/falsos positivos).
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from detection import DEFAULT_DICT_NAME, DICT_MAP
+
+CONDITIONS = ("day", "night", "blur", "noise")
+LABELS_FILE = "labels.json"
+
+
+@dataclass
+class LabeledFrame:
+    image: np.ndarray
+    ids: List[int]
+    name: str = ""
+    condition: str = "day"
+    scene: int = 0  # frames da mesma cena (clipe) compartilham o número
+
+
+def _background(rng: np.random.Generator, w: int, h: int) -> np.ndarray:
+    """Fundo com gradiente e textura suave (piso do pátio), sem padrões de marcador."""
+    base = rng.uniform(90, 200)
+    gx = np.linspace(-30, 30, w, dtype=np.float32)[None, :]
+    gy = np.linspace(-20, 20, h, dtype=np.float32)[:, None]
+    noise = rng.normal(0, 12, (h // 8 + 1, w // 8 + 1)).astype(np.float32)
+    texture = cv2.resize(noise, (w, h), interpolation=cv2.INTER_LINEAR)
+    gray = np.clip(base + gx + gy + texture, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def _place_marker(
+    rng: np.random.Generator,
+    canvas: np.ndarray,
+    marker: np.ndarray,
+    occupied: List[tuple],
+) -> bool:
+    """Cola o marcador (com borda branca) em perspectiva num ponto livre do canvas."""
+    h, w = canvas.shape[:2]
+    side = int(rng.uniform(0.06, 0.28) * min(w, h))
+    quiet = max(4, side // 6)  # borda branca ao redor, como no marcador impresso
+    src_img = cv2.copyMakeBorder(
+        marker, quiet, quiet, quiet, quiet, cv2.BORDER_CONSTANT, value=255
+    )
+    s = src_img.shape[0]
+    src = np.float32([[0, 0], [s, 0], [s, s], [0, s]])
+
+    for _ in range(20):
+        cx = rng.uniform(side, w - side)
+        cy = rng.uniform(side, h - side)
+        if any(
+            abs(cx - ox) < (side + os_) * 0.75 and abs(cy - oy) < (side + os_) * 0.75
+            for ox, oy, os_ in occupied
+        ):
+            continue
+        angle = rng.uniform(0, 2 * np.pi)
+        half = (side + 2 * quiet) / 2
+        corners = []
+        for k in range(4):
+            a = angle + k * np.pi / 2 + np.pi / 4
+            # leve perspectiva: cada canto com raio um pouco diferente
+            r = half * np.sqrt(2) * rng.uniform(0.85, 1.15)
+            corners.append([cx + r * np.cos(a), cy + r * np.sin(a)])
+        dst = np.float32(corners)
+        m = cv2.getPerspectiveTransform(src, dst)
+        warped = cv2.warpPerspective(src_img, m, (w, h), borderValue=0)
+        mask = cv2.warpPerspective(
+            np.full((s, s), 255, np.uint8), m, (w, h), flags=cv2.INTER_NEAREST
+        )
+        canvas[mask > 0] = cv2.cvtColor(warped, cv2.COLOR_GRAY2BGR)[mask > 0]
+        occupied.append((cx, cy, side))
+        return True
+    return False
+
+
+def _apply_condition(
+    rng: np.random.Generator, img: np.ndarray, condition: str
+) -> np.ndarray:
+    if condition == "night":
+        img = cv2.convertScaleAbs(
+            img, alpha=rng.uniform(0.15, 0.35), beta=rng.uniform(0, 10)
+        )
+        noise = rng.normal(0, 4, img.shape).astype(np.float32)
+        return np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    if condition == "blur":
+        k = int(rng.choice([3, 5, 7]))
+        return cv2.GaussianBlur(img, (k, k), 0)
+    if condition == "noise":
+        noise = rng.normal(0, rng.uniform(10, 22), img.shape).astype(np.float32)
+        return np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    return img
+
+
+def synthetic_corpus(
+    frames: int = 60,
+    seed: int = 42,
+    size: tuple = (1280, 720),
+    dict_name: str = DEFAULT_DICT_NAME,
+    conditions: Sequence[str] = CONDITIONS,
+    max_markers: int = 4,
+    clip_len: int = 1,
+) -> List[LabeledFrame]:
+    """Gera ``frames`` frames rotulados (determinístico para a mesma ``seed``).
+
+    Com ``clip_len`` > 1, cada cena se repete por ``clip_len`` frames com pequeno
+    deslocamento (útil para o modo rastreamento, que depende de frames consecutivos).
+    """
+    rng = np.random.default_rng(seed)
+    dictionary = cv2.aruco.getPredefinedDictionary(DICT_MAP[dict_name])
+    n_ids = int(dictionary.bytesList.shape[0])
+    w, h = size
+    out: List[LabeledFrame] = []
+    scene = 0
+    while len(out) < frames:
+        condition = conditions[scene % len(conditions)]
+        canvas = _background(rng, w, h)
+        ids = [
+            int(i)
+            for i in rng.choice(
+                n_ids, size=int(rng.integers(0, max_markers + 1)), replace=False
+            )
+        ]
+        occupied: List[tuple] = []
+        placed = []
+        for marker_id in ids:
+            marker = cv2.aruco.generateImageMarker(dictionary, marker_id, 200)
+            if _place_marker(rng, canvas, marker, occupied):
+                placed.append(marker_id)
+        for k in range(clip_len):
+            if len(out) >= frames:
+                break
+            img = canvas
+            if k:
+                dx, dy = rng.uniform(-3, 3, 2)
+                shift = np.float32([[1, 0, dx], [0, 1, dy]])
+                img = cv2.warpAffine(
+                    canvas, shift, (w, h), borderMode=cv2.BORDER_REPLICATE
+                )
+            img = _apply_condition(rng, img, condition)
+            out.append(
+                LabeledFrame(
+                    image=img,
+                    ids=sorted(placed),
+                    name=f"{len(out):05d}.png",
+                    condition=condition,
+                    scene=scene,
+                )
+            )
+        scene += 1
+    return out
+
+
+def save_corpus(
+    corpus: Iterable[LabeledFrame], folder: str, dict_name: str = DEFAULT_DICT_NAME
+) -> str:
+    """Grava imagens PNG + labels.json; retorna o caminho do labels.json."""
+    os.makedirs(folder, exist_ok=True)
+    entries = []
+    for i, f in enumerate(corpus):
+        name = f.name or f"{i:05d}.png"
+        cv2.imwrite(os.path.join(folder, name), f.image)
+        entries.append(
+            {
+                "file": name,
+                "ids": list(f.ids),
+                "condition": f.condition,
+                "scene": f.scene,
+            }
+        )
+    path = os.path.join(folder, LABELS_FILE)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"dict": dict_name, "frames": entries}, fh, indent=2)
+    return path
+
+
+def load_corpus(folder: str, limit: Optional[int] = None) -> tuple:
+    """Carrega uma pasta rotulada. Retorna (frames, dict_name)."""
+    with open(os.path.join(folder, LABELS_FILE), encoding="utf-8") as fh:
+        labels = json.load(fh)
+    frames = []
+    for entry in labels.get("frames", [])[:limit]:
+        img = cv2.imread(os.path.join(folder, entry["file"]), cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"[BENCH] Aviso: não foi possível ler {entry['file']}")
+            continue
+        frames.append(
+            LabeledFrame(
+                image=img,
+                ids=[int(i) for i in entry.get("ids", [])],
+                name=entry["file"],
+                condition=entry.get("condition", "recorded"),
+                scene=int(entry.get("scene", 0)),
+            )
+        )
+    return frames, labels.get("dict", DEFAULT_DICT_NAME)
+
+
+def score(expected: Sequence[int], detected: Optional[Iterable]) -> tuple:
+    """Retorna (verdadeiros positivos, falsos positivos, esperados) de um frame.
+
+    Ids fora do esperado e detecções repetidas do mesmo id contam como falsos positivos.
+    """
+    remaining = list(expected)
+    tp = fp = 0
+    for i in ([] if detected is None else detected):
+        i = int(i)
+        if i in remaining:
+            remaining.remove(i)
+            tp += 1
+        else:
+            fp += 1
+    return tp, fp, len(expected)
@@ -0,0 +1,362 @@
+"""
+Benchmark offline da detecção ArUco (sem webcam e sem backend Java).
+
+Roda cada configuração de detector sobre um corpus de frames rotulados (sintético ou
+gravado, ver bench_corpus) e mede FPS, tempo por estágio (preprocess, detect, pose,
+overlay), recall e falsos positivos — no total e por condição de luz. O resultado vai
+para JSON, para comparar versões:
+
+    python benchmark_detection.py --frames 120 --output bench_atual.json
+    python benchmark_detection.py --corpus gravacoes/patio --configs desktop,service_adaptive
+    python benchmark_detection.py --output bench_novo.json --compare bench_atual.json
+
+Com ``--compare``, sai com código 1 se alguma configuração perder FPS ou recall além
+das tolerâncias (``--max-fps-drop`` / ``--max-recall-drop``).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from bench_corpus import LabeledFrame, load_corpus, save_corpus, score, synthetic_corpus
+from detection import DEFAULT_DICT_NAME, build_detector, detect_frame, timed
+from preprocess import PreprocessPipeline
+from roi_tracker import RoiTracker
+
+RESULTS_VERSION = 1
+
+# Uma configuração recebe o dict_name e devolve run(frame, timings) -> ids detectados
+Runner = Callable[[np.ndarray, dict], Optional[np.ndarray]]
+
+
+def _service(
+    preprocess_factory: Callable,
+    pyramid_scale: Optional[float] = None,
+    profile: Optional[str] = None,
+):
+    """Funções de detection.py como o serviço as usa (thread de captura)."""
+
+    def make(dict_name: str) -> Runner:
+        detector = build_detector(
+            dict_name, refine_corners=pyramid_scale is None, profile=profile
+        )[0]
+        preprocess = preprocess_factory()
+
+        def run(frame, timings):
+            _corners, ids, _tvecs = detect_frame(
+                detector,
+                frame,
+                pyramid_scale=pyramid_scale,
+                preprocess=preprocess,
+                timings=timings,
+            )
+            return ids
+
+        return run
+
+    return make
+
+
+def _tracking(dict_name: str) -> Runner:
+    """RoiTracker (melhor com corpus em clipes: --clip-len > 1)."""
+    frame_timings: dict = {}
+    preprocess = timed(PreprocessPipeline.adaptive(), frame_timings, "preprocess")
+    tracker = RoiTracker(build_detector(dict_name)[0], preprocess=preprocess)
+
+    def run(frame, timings):
+        frame_timings.clear()
+        t0 = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frame_timings["preprocess"] = time.perf_counter() - t0
+        _corners, ids = tracker.detect(gray)
+        frame_timings["detect"] = time.perf_counter() - t0 - frame_timings["preprocess"]
+        timings.update(frame_timings)
+        return ids
+
+    return run
+
+
+class _RecordingDetector:
+    """Repassa detectMarkers ao detector real guardando o resultado e o tempo."""
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.ids = None
+        self.seconds = 0.0
+
+    def detectMarkers(self, gray):  # pylint: disable=invalid-name
+        t0 = time.perf_counter()
+        result = self.detector.detectMarkers(gray)
+        self.seconds = time.perf_counter() - t0
+        self.ids = result[1]
+        return result
+
+
+def _desktop(dict_name: str) -> Runner:
+    """aruco_detector_api.processar_frame completo (parâmetros padrão, sem envio)."""
+    import aruco_detector_api as desktop
+
+    # o desktop usa DetectorParameters padrão: só o dicionário vem do build_detector
+    _detector, _params, dictionary = build_detector(dict_name)
+    recorder = _RecordingDetector(
+        cv2.aruco.ArucoDetector(dictionary, cv2.aruco.DetectorParameters())
+    )
+    desktop.ARUCO_DETECTOR = recorder
+
+    def run(frame, timings):
+        recorder.ids = None
+        t0 = time.perf_counter()
+        try:
+            desktop.processar_frame(frame, enviar_para_api=False)
+        except Exception as e:
+            # a detecção pode ter dado certo mesmo se a pose/desenho falhar depois
+            e.detected_ids = recorder.ids
+            raise
+        finally:
+            timings["detect"] = recorder.seconds
+            # cinza + pose + desenho (tudo que não é detectMarkers)
+            timings["overlay"] = time.perf_counter() - t0 - recorder.seconds
+        return recorder.ids
+
+    return run
+
+
+def _pipeline(dict_name: str, render: bool = True) -> Runner:
+    """CameraPipeline.process_frame do serviço (config via variáveis de ambiente),
+    com o overlay de quando há clientes no stream ou sem ele (headless)."""
+    os.environ.setdefault("OUTBOX_MODE", "0")  # sem SQLite: nada é enviado
+    import camera_web_service as service
+
+    pipe = service.CameraPipeline(0, dict_name)
+    pipe.agendar_envio = lambda *args: None  # benchmark não envia nada ao backend
+
+    def run(frame, timings):
+        pipe._timings.clear()
+        result = pipe.process_frame(frame)
+        if render:
+            pipe.render(frame, result)
+        timings.update(pipe._timings)
+        return result.ids
+
+    return run
+
+
+CONFIGS: Dict[str, Callable[[str], Runner]] = {
+    "desktop": _desktop,
+    "service_always": _service(PreprocessPipeline.always),
+    "service_adaptive": _service(PreprocessPipeline.adaptive),
+    "pyramid_0.5": _service(PreprocessPipeline.adaptive, pyramid_scale=0.5),
+    "profile_fast": _service(PreprocessPipeline.adaptive, profile="fast"),
+    "profile_low-light": _service(PreprocessPipeline.adaptive, profile="low-light"),
+    "tracking": _tracking,
+    "pipeline": _pipeline,
+    "pipeline_headless": lambda dict_name: _pipeline(dict_name, render=False),
+}
+DEFAULT_CONFIGS = ("desktop", "service_always", "service_adaptive", "pyramid_0.5")
+
+
+def _percentile_ms(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)) * 1000, 3)
+
+
+def run_config(
+    name: str, corpus: List[LabeledFrame], dict_name: str, warmup: int = 3
+) -> dict:
+    """Roda uma configuração sobre o corpus e devolve as métricas agregadas."""
+    run = CONFIGS[name](dict_name)
+    for f in corpus[:warmup]:
+        try:
+            run(f.image.copy(), {})
+        except Exception:
+            pass
+
+    stages: Dict[str, List[float]] = {}
+    per_condition: Dict[str, List[int]] = {}  # condição -> [tp, fp, esperados, frames]
+    frame_s: List[float] = []
+    tp = fp = expected = errors = 0
+    first_error = None
+    for f in corpus:
+        frame = f.image.copy()  # overlays desenham no próprio frame
+        timings: dict = {}
+        t0 = time.perf_counter()
+        try:
+            ids = run(frame, timings)
+        except Exception as e:
+            ids = getattr(e, "detected_ids", None)
+            errors += 1
+            first_error = first_error or f"{type(e).__name__}: {e}"
+        frame_s.append(time.perf_counter() - t0)
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds)
+
+        f_tp, f_fp, f_exp = score(f.ids, ids)
+        tp, fp, expected = tp + f_tp, fp + f_fp, expected + f_exp
+        acc = per_condition.setdefault(f.condition, [0, 0, 0, 0])
+        acc[0] += f_tp
+        acc[1] += f_fp
+        acc[2] += f_exp
+        acc[3] += 1
+
+    total = sum(frame_s)
+    return {
+        "frames": len(corpus),
+        "fps": round(len(corpus) / total, 2) if total else None,
+        "frame_ms": {
+            "avg": round(total / len(corpus) * 1000, 3) if corpus else None,
+            "p50": _percentile_ms(frame_s, 50) if frame_s else None,
+            "p95": _percentile_ms(frame_s, 95) if frame_s else None,
+        },
+        "stages_ms": {
+            stage: {
+                "avg": round(sum(v) / len(v) * 1000, 3),
+                "p95": _percentile_ms(v, 95),
+            }
+            for stage, v in stages.items()
+        },
+        "expected": expected,
+        "true_positives": tp,
+        "false_positives": fp,
+        "recall": round(tp / expected, 4) if expected else None,
+        "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+        "fp_per_frame": round(fp / len(corpus), 4) if corpus else None,
+        "by_condition": {
+            cond: {
+                "frames": n,
+                "recall": round(c_tp / c_exp, 4) if c_exp else None,
+                "false_positives": c_fp,
+            }
+            for cond, (c_tp, c_fp, c_exp, n) in per_condition.items()
+        },
+        "errors": errors,
+        "first_error": first_error,
+    }
+
+
+def compare(
+    current: dict, baseline: dict, max_fps_drop: float, max_recall_drop: float
+) -> List[str]:
+    """Imprime a diferença por configuração e retorna a lista de regressões."""
+    regressions = []
+    for name, res in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        fps, old_fps = res.get("fps"), old.get("fps")
+        rec, old_rec = res.get("recall"), old.get("recall")
+        fps_delta = (fps - old_fps) / old_fps if fps and old_fps else None
+        rec_delta = rec - old_rec if rec is not None and old_rec is not None else None
+        print(
+            f"[BENCH] {name:18s} fps {old_fps} -> {fps}"
+            + (f" ({fps_delta:+.1%})" if fps_delta is not None else "")
+            + f" | recall {old_rec} -> {rec}"
+        )
+        if fps_delta is not None and fps_delta < -max_fps_drop:
+            regressions.append(f"{name}: FPS caiu {fps_delta:.1%}")
+        if rec_delta is not None and rec_delta < -max_recall_drop:
+            regressions.append(f"{name}: recall caiu {rec_delta:+.4f}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", help="pasta com imagens + labels.json")
+    parser.add_argument("--frames", type=int, default=60, help="frames sintéticos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--size", default="1280x720", help="resolução sintética LxA")
+    parser.add_argument("--clip-len", type=int, default=1, help="frames por cena")
+    parser.add_argument("--dict", default=DEFAULT_DICT_NAME, dest="dict_name")
+    parser.add_argument("--save-corpus", help="grava o corpus sintético nesta pasta")
+    parser.add_argument(
+        "--configs",
+        default=",".join(DEFAULT_CONFIGS),
+        help=f"lista separada por vírgula de: {', '.join(CONFIGS)}",
+    )
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="JSON de uma execução anterior")
+    parser.add_argument("--max-fps-drop", type=float, default=0.10)
+    parser.add_argument("--max-recall-drop", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    configs = [c.strip() for c in args.configs.split(",") if c.strip()]
+    unknown = [c for c in configs if c not in CONFIGS]
+    if unknown:
+        parser.error(f"configuração desconhecida: {', '.join(unknown)}")
+
+    if args.corpus:
+        corpus, dict_name = load_corpus(args.corpus)
+        corpus_info = {"source": args.corpus}
+    else:
+        w, h = (int(v) for v in args.size.lower().split("x"))
+        dict_name = args.dict_name
+        corpus = synthetic_corpus(
+            args.frames, args.seed, (w, h), dict_name, clip_len=args.clip_len
+        )
+        corpus_info = {
+            "source": "synthetic",
+            "seed": args.seed,
+            "size": [w, h],
+            "clip_len": args.clip_len,
+        }
+        if args.save_corpus:
+            print(
+                f"[BENCH] Corpus salvo em {save_corpus(corpus, args.save_corpus, dict_name)}"
+            )
+    if not corpus:
+        print("[BENCH] Corpus vazio")
+        return 2
+    corpus_info.update({"frames": len(corpus), "dict": dict_name})
+
+    print(
+        f"[BENCH] {len(corpus)} frames ({corpus_info['source']}), "
+        f"OpenCV {cv2.__version__}, {len(configs)} configurações"
+    )
+    results = {}
+    for name in configs:
+        res = run_config(name, corpus, dict_name, args.warmup)
+        results[name] = res
+        stages = " ".join(f"{k}={v['avg']}ms" for k, v in res["stages_ms"].items())
+        print(
+            f"[BENCH] {name:18s} {res['fps']} fps | recall {res['recall']} | "
+            f"FP {res['false_positives']} | {stages}"
+            + (
+                f" | {res['errors']} erros ({res['first_error']})"
+                if res["errors"]
+                else ""
+            )
+        )
+
+    report = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "opencv": cv2.__version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "corpus": corpus_info,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"[BENCH] Resultados salvos em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.max_fps_drop, args.max_recall_drop)
+        for r in regressions:
+            print(f"[BENCH] REGRESSÃO: {r}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Inventário de câmeras para /cameras: sondagem paralela em background, resposta da
+memória.
+
+Abrir um dispositivo para ver se ele existe custa de dezenas de ms a segundos (e às
+vezes trava no driver). Em vez de sondar os índices um a um a cada requisição, o
+inventário:
+
+- sonda os índices em paralelo (``workers`` threads), com prazo por dispositivo
+  (``probe_timeout_s``); quem estoura o prazo fica como "timeout" e não é sondado de
+  novo enquanto a tentativa anterior não terminar
+- guarda o resultado por ``ttl_s`` e renova em background quando vence, ou antes disso
+  quando a lista de ``/dev/video*`` muda (hot-plug, Linux)
+- nunca abre um dispositivo em uso por um pipeline (``in_use``): ele é listado como
+  presente sem ser tocado, e o pipeline pode esperar uma sondagem em andamento no seu
+  índice terminar (``wait_idle``) antes de abrir a câmera
+
+No Linux, índices sem ``/dev/videoN`` correspondente são marcados ausentes sem abrir
+nada; nos outros sistemas todos os índices até ``max_index`` são sondados.
+"""
+
+import glob
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+PRESENT = "present"
+ABSENT = "absent"
+IN_USE = "in_use"
+TIMEOUT = "timeout"
+
+
+def video_nodes() -> Optional[frozenset]:
+    """Índices com /dev/videoN (Linux); None onde não dá para listar dispositivos."""
+    if not sys.platform.startswith("linux") or not os.path.isdir("/dev"):
+        return None
+    nodes = set()
+    for path in glob.glob("/dev/video*"):
+        suffix = path[len("/dev/video") :]
+        if suffix.isdigit():
+            nodes.add(int(suffix))
+    return frozenset(nodes)
+
+
+class CameraInventory:
+    """Cache dos dispositivos de câmera, renovado em background."""
+
+    def __init__(
+        self,
+        open_device: Callable[[int], object],
+        in_use: Callable[[], Iterable[int]] = frozenset,
+        max_index: int = 20,
+        ttl_s: float = 60.0,
+        probe_timeout_s: float = 3.0,
+        workers: int = 8,
+        poll_s: float = 2.0,
+    ):
+        self.open_device = open_device  # índice -> objeto com isOpened()/release()
+        self.in_use = in_use  # índices abertos pelos pipelines (não sondar)
+        self.max_index = max(1, int(max_index))
+        self.ttl_s = max(0.0, float(ttl_s))
+        self.probe_timeout_s = max(0.1, float(probe_timeout_s))
+        self.workers = max(1, int(workers))
+        self.poll_s = max(0.1, float(poll_s))
+
+        self._lock = threading.Lock()
+        self._devices: Dict[int, str] = {}
+        self._updated_at: Optional[float] = None
+        self._nodes: Optional[frozenset] = None
+        self._probing: Dict[int, threading.Event] = {}  # sondagens em andamento
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="sonda-camera")
+        self._wakeup = threading.Event()
+        self._ready = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._refresh_requested = False
+
+        self.refreshes = 0
+        self.probes = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.last_duration_s: Optional[float] = None
+
+    # ------------------------------------------------------------------ background
+    def start(self) -> None:
+        """Inicia a renovação em background (idempotente)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="inventario-cameras", daemon=True
+        )
+        self._thread.start()
+
+    def request_refresh(self) -> None:
+        """Pede uma nova sondagem sem esperar por ela."""
+        self._refresh_requested = True
+        self._wakeup.set()
+
+    def refresh(self, timeout: float) -> bool:
+        """Pede uma nova sondagem e espera ela terminar (False no timeout)."""
+        with self._ready:
+            target = self.refreshes + 1
+        self.request_refresh()
+        with self._ready:
+            return self._ready.wait_for(lambda: self.refreshes >= target, timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                nodes = video_nodes()
+                stale = (
+                    self._updated_at is None
+                    or time.monotonic() - self._updated_at >= self.ttl_s
+                )
+                if stale or self._refresh_requested or nodes != self._nodes:
+                    self._refresh_requested = False
+                    self._refresh(nodes)
+            except Exception as e:
+                # uma sondagem que falhou não pode matar a thread: /cameras ficaria
+                # servindo o último resultado para sempre
+                self.errors += 1
+                print(f"[PY CAM] Inventário de câmeras: erro na sondagem: {e}")
+            self._wakeup.wait(self.poll_s)
+            self._wakeup.clear()
+
+    def _probe(self, index: int, done: threading.Event) -> bool:
+        cap = None
+        try:
+            cap = self.open_device(index)
+            return cap is not None and cap.isOpened()
+        except Exception:
+            return False
+        finally:
+            try:
+                if cap is not None:
+                    cap.release()
+            except Exception:
+                pass
+            with self._lock:
+                self._probing.pop(index, None)
+            done.set()
+
+    def _refresh(self, nodes: Optional[frozenset]) -> None:
+        t0 = time.monotonic()
+        busy = set(self.in_use())
+        results: Dict[int, str] = {}
+        futures = {}
+        with self._lock:
+            for index in range(self.max_index):
+                if index in busy:
+                    results[index] = IN_USE
+                elif nodes is not None and index not in nodes:
+                    results[index] = ABSENT
+                elif index in self._probing:
+                    # sondagem anterior ainda presa no driver: não empilha outra
+                    results[index] = TIMEOUT
+                else:
+                    done = self._probing[index] = threading.Event()
+                    futures[self._pool.submit(self._probe, index, done)] = index
+        self.probes += len(futures)
+        if futures:
+            # prazo por dispositivo: cada "onda" de ``workers`` sondas tem o seu
+            rounds = math.ceil(len(futures) / self.workers)
+            finished, pending = wait(futures, timeout=self.probe_timeout_s * rounds)
+            for future in finished:
+                results[futures[future]] = PRESENT if future.result() else ABSENT
+            for future in pending:
+                results[futures[future]] = TIMEOUT
+                self.timeouts += 1
+        with self._ready:
+            self._devices = results
+            self._nodes = nodes
+            self._updated_at = time.monotonic()
+            self.refreshes += 1
+            self.last_duration_s = time.monotonic() - t0
+            self._ready.notify_all()
+
+    # ------------------------------------------------------------------ consulta
+    def wait_ready(self, timeout: float) -> bool:
+        """Espera a primeira sondagem (True se já existe um resultado)."""
+        with self._ready:
+            return self._ready.wait_for(lambda: self._updated_at is not None, timeout)
+
+    def wait_idle(self, index: int, timeout: float) -> bool:
+        """Espera a sondagem em andamento no ``index`` (se houver) liberar o
+        dispositivo. Chamado pelo pipeline antes de abrir a câmera."""
+        with self._lock:
+            done = self._probing.get(index)
+        return done is None or done.wait(timeout)
+
+    def cameras(self, max_index: Optional[int] = None) -> List[dict]:
+        """Dispositivos presentes (ou em uso) com índice < ``max_index``, da memória."""
+        limit = self.max_index if max_index is None else max_index
+        busy = set(self.in_use())
+        with self._lock:
+            devices = dict(self._devices)
+        listed = []
+        for index in sorted(set(devices) | busy):
+            state = devices.get(index)
+            if index >= limit or (index not in busy and state != PRESENT):
+                # TIMEOUT não entra: dispositivo que trava ao abrir não é utilizável
+                continue
+            listed.append(
+                {
+                    "id": index,
+                    "name": f"Câmera {index}",
+                    "detected": True,
+                    "in_use": index in busy,
+                }
+            )
+        return listed
+
+    def stats(self) -> dict:
+        with self._lock:
+            age = (
+                time.monotonic() - self._updated_at
+                if self._updated_at is not None
+                else None
+            )
+            return {
+                "age_s": round(age, 1) if age is not None else None,
+                "ttl_s": self.ttl_s,
+                "refreshes": self.refreshes,
+                "probes": self.probes,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "probing": sorted(self._probing),
+                "last_refresh_ms": (
+                    round(self.last_duration_s * 1000, 1)
+                    if self.last_duration_s is not None
+                    else None
+                ),
+                "hotplug": self._nodes is not None,
+            }
@@ -3,10 +3,25 @@ Camera Web Service (Flask) para integrar a captura de câmera (OpenCV) com o fro
 
 Funcionalidades:
 - /ui       : página simples com botões Start/Stop e preview ao vivo
-- /start    : inicia captura e detecção de ArUco (envia para API Java com JWT)
+- /start    : inicia captura e detecção de ArUco (envia para API Java com JWT);
+              aceita {"source": ...} com câmera, vídeo, pasta de imagens ou "synthetic"
 - /stop     : para a captura
-- /status   : status JSON
-- /stream   : stream MJPEG do último frame processado
+- /status   : status JSON (inclui profundidade/descartes da fila de envio)
+- /stream   : stream MJPEG do último frame processado (JPEG codificado uma vez por
+              frame e perfil; ?w=640&q=60&fps=10 ajusta resolução/qualidade/FPS)
+- /events   : detecções em JSON via Server-Sent Events (?mode=change|frame)
+- /metrics  : métricas no formato texto do Prometheus (latência por estágio, contadores)
+- /cameras  : câmeras disponíveis, do inventário em memória (?refresh=1 sonda de novo)
+
+SERVER_MODE=asyncio troca o servidor threaded do Flask por um servidor asyncio em que
+cada espectador de /stream e /events é uma corrotina (as demais rotas continuam sendo
+este app Flask); teste de carga em load_test_stream.py.
+
+Multi-câmera (um pipeline independente por câmera no mesmo processo):
+- /cameras/<id>/start, /cameras/<id>/stop, /cameras/<id>/status,
+  /cameras/<id>/config, /cameras/<id>/stream, /cameras/<id>/events
+- /pipelines : status de todos os pipelines
+As rotas sem <id> operam sobre a câmera selecionada (camera_id do último /start).
 
 Requisitos: pip install -r requirements.txt (inclui Flask, OpenCV, requests)
 """
@@ -18,10 +33,42 @@ from datetime import datetime
 from typing import Optional, Tuple
 
 import cv2
-import numpy as np
-import requests
 from flask import Flask, Response, jsonify, request, render_template_string
 
+from camera_inventory import CameraInventory
+from circuit_breaker import CLOSED, CircuitOpenError
+from detection import (
+    DICT_MAP,
+    build_detector,
+    detect_frame,
+    timed,
+)
+from detection_events import EVENT_MODES, DetectionEvents
+from detection_result import DetectionResult
+from detector_profiles import DEFAULT_PROFILE, available_profiles, resolve_profile
+from dispatch_queue import DispatchQueue
+from frame_ring import FrameRing
+from frame_scheduler import FrameScheduler
+from frame_sources import FrameSource, open_source, parse_descriptor
+from java_client import JavaApiClient
+from metrics import (
+    LATENCY_BUCKETS,
+    STAGE_BUCKETS,
+    CallbackMetric,
+    Counter,
+    Histogram,
+    render_prometheus,
+)
+from mjpeg_broadcaster import FrameBroadcaster, StreamProfile
+from overlay import render_overlay
+from pose import DEFAULT_CALIBRATION_DIR, REAL_MARKER_SIZE_M, pose_estimator
+from preprocess import PreprocessPipeline
+from roi_tracker import RoiTracker
+from tag_batcher import BulkNotSupported, TagBatcher
+from tag_outbox import DEFAULT_PATH as OUTBOX_DEFAULT_PATH
+from tag_outbox import PermanentFailure, TagOutbox
+from tag_presence import ENTER, EXIT, HEARTBEAT, PresenceEvent, TagPresenceTracker
+
 try:
     from flask_cors import CORS
 except Exception:
@@ -31,51 +78,105 @@ except Exception:
 JAVA_BASE = "http://localhost:8080"
 LOGIN_URL = f"{JAVA_BASE}/api/login"
 ARUCO_POST_URL = f"{JAVA_BASE}/api/aruco-tags/cadastrar"
+ARUCO_BULK_URL = f"{JAVA_BASE}/api/aruco-tags/cadastrar-lote"
 
 ADMIN_EMAIL = "admin@email.com"
 ADMIN_SENHA = "adminmottu"
 
 API_TIMEOUT = 8
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "4"))  # conexões keep-alive
+JWT_REFRESH_MARGIN_S = 60.0  # renova o token este tempo antes do exp
+# Circuit breaker do backend: abre após N falhas seguidas e testa de novo após X s
+CIRCUIT_FAILURES = int(os.environ.get("CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_S = float(os.environ.get("CIRCUIT_RESET_S", "15"))
 DEFAULT_CAMERA_ID = 0
-ENVIO_INTERVALO = 2.0  # seg entre envios da mesma tag
-
-# ArUco
-# ArUco dictionaries suportados (nome -> constante)
-DICT_MAP = {
-    "DICT_6X6_250": cv2.aruco.DICT_6X6_250,
-    "DICT_5X5_100": cv2.aruco.DICT_5X5_100,
-    "DICT_4X4_50": cv2.aruco.DICT_4X4_50,
-}
-
+FRAME_RING_SLOTS = int(os.environ.get("FRAME_RING_SLOTS", "4"))  # buffers pré-alocados
+
+# Ritmo do loop de captura: FPS alvo (0 = sem limite; replays com realtime=false
+# rodam sem limite) e orçamento de latência por frame; acima dele o agendador
+# descarta frames em vez de acumular atraso
+TARGET_FPS = float(os.environ.get("TARGET_FPS", "30"))
+LATENCY_BUDGET_MS = float(os.environ.get("LATENCY_BUDGET_MS", "100"))
+# Câmeras ao vivo: thread de grab() contínuo, processamento sempre no frame mais novo
+LATEST_FRAME_GRABBER = os.environ.get("LATEST_FRAME_GRABBER", "1") == "1"
+# Fontes de vídeo/pasta no /start só dentro de MEDIA_ROOT (caminhos relativos a ele);
+# sem MEDIA_ROOT elas ficam desativadas e só câmera/sintético são aceitos
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT") or None
+
+# Presença de tags (tag_presence.py): envia só quando a tag entra (visto em
+# PRESENCE_ENTER_FRAMES frames) ou sai (não vista por PRESENCE_EXIT_S), mais um
+# heartbeat opcional a cada PRESENCE_HEARTBEAT_S (0 = desligado) enquanto presente.
+# A saída só vai ao backend com PRESENCE_POST_EXIT=1 (status PRESENCE_EXIT_STATUS).
+PRESENCE_ENTER_FRAMES = int(os.environ.get("PRESENCE_ENTER_FRAMES", "2"))
+PRESENCE_EXIT_S = float(os.environ.get("PRESENCE_EXIT_S", "3"))
+PRESENCE_HEARTBEAT_S = float(os.environ.get("PRESENCE_HEARTBEAT_S", "0"))
+PRESENCE_POST_EXIT = os.environ.get("PRESENCE_POST_EXIT", "0") == "1"
+PRESENCE_EXIT_STATUS = os.environ.get("PRESENCE_EXIT_STATUS", "AUSENTE")
+
+# Fila de envio ao backend (o loop de captura nunca espera I/O de rede)
+DISPATCH_QUEUE_SIZE = int(os.environ.get("DISPATCH_QUEUE_SIZE", "256"))
+DISPATCH_WORKERS = int(os.environ.get("DISPATCH_WORKERS", "2"))
+DISPATCH_POLICY = os.environ.get("DISPATCH_POLICY", "coalesce")  # ou "drop_oldest"
+
+# Outbox durável (tag_outbox.py): todo envio passa por um SQLite local e é reenviado
+# em lotes com backoff quando o backend volta; limites de tamanho e idade.
+# Opcional (grava em disco): OUTBOX_MODE=1 ativa
+OUTBOX_MODE = os.environ.get("OUTBOX_MODE", "0") == "1"
+OUTBOX_PATH = os.environ.get("OUTBOX_PATH", OUTBOX_DEFAULT_PATH)
+OUTBOX_BATCH = int(os.environ.get("OUTBOX_BATCH", "20"))
+OUTBOX_RATE = float(os.environ.get("OUTBOX_RATE", "20"))  # itens/s na drenagem
+OUTBOX_MAX_ITEMS = int(os.environ.get("OUTBOX_MAX_ITEMS", "50000"))
+OUTBOX_MAX_AGE_H = float(os.environ.get("OUTBOX_MAX_AGE_H", "24"))
+# falhas transitórias seguidas antes de o item ir para a tabela dead_letter
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "10"))
+
+# Modo lote: agrupa tags por janela de tempo/tamanho num único POST
+BATCH_MODE = os.environ.get("BATCH_MODE", "0") == "1"
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "250"))
+BATCH_MAX_TAGS = int(os.environ.get("BATCH_MAX_TAGS", "20"))
+# backend sem endpoint de lote: sonda de novo após BATCH_REPROBE_S (novo deploy)
+BATCH_REPROBE_S = float(os.environ.get("BATCH_REPROBE_S", "300"))
+
+# Servidor HTTP: "flask" (threaded, uma thread por cliente de stream) ou "asyncio"
+# (espectadores de /stream e /events como corrotinas; ver async_server)
+SERVER_MODE = os.environ.get("SERVER_MODE", "flask")
+SERVER_PORT = int(os.environ.get("PORT", "5001"))
+# threads do modo asyncio: feeds (uma por pipeline+perfil em uso) e rotas WSGI
+ASYNC_FEED_WORKERS = int(os.environ.get("ASYNC_FEED_WORKERS", "32"))
+ASYNC_WSGI_WORKERS = int(os.environ.get("ASYNC_WSGI_WORKERS", "8"))
+
+# Pose: calibração por câmera em CALIBRATION_DIR/camera_<id>.npz (ver pose.py); sem
+# arquivo vale a matriz padrão. Só é calculada quando /events ou /status pedem.
+CALIBRATION_DIR = os.environ.get("CALIBRATION_DIR", DEFAULT_CALIBRATION_DIR)
+MARKER_SIZE_M = float(os.environ.get("MARKER_SIZE_M", str(REAL_MARKER_SIZE_M)))
+
+# Inventário de câmeras (/cameras): sondagem paralela em background com cache
+CAMERA_MAX_INDEX = int(os.environ.get("CAMERA_MAX_INDEX", "20"))
+CAMERA_INVENTORY_TTL_S = float(os.environ.get("CAMERA_INVENTORY_TTL_S", "60"))
+CAMERA_PROBE_TIMEOUT_S = float(os.environ.get("CAMERA_PROBE_TIMEOUT_S", "3"))
+
+# Backend de detecção: "thread" (na própria thread de captura) ou "process"
+# (pool de processos com frames em memória compartilhada; escala com nº de núcleos)
+DETECTION_BACKEND = os.environ.get("DETECTION_BACKEND", "thread")
+DETECTION_WORKERS = int(os.environ.get("DETECTION_WORKERS", str(os.cpu_count() or 1)))
+
+# Modo rastreamento: após uma detecção completa, varre só ROIs ao redor dos marcadores
+# conhecidos por N frames (rescan completo periódico ou quando algum marcador some)
+TRACKING_MODE = os.environ.get("TRACKING_MODE", "0") == "1"
+TRACK_RESCAN_FRAMES = int(os.environ.get("TRACK_RESCAN_FRAMES", "15"))
+
+# Modo pirâmide: candidatos achados numa cópia reduzida (fator PYRAMID_SCALE, ex.: 0.5)
+# e cantos refinados sub-pixel na resolução cheia; 1.0 desliga
+PYRAMID_SCALE = float(os.environ.get("PYRAMID_SCALE", "1.0"))
+
+# Pré-processamento: "adaptive" liga CLAHE/desfoque só quando a imagem precisa
+# (pouca luz/baixo contraste); "always" aplica os dois em todo frame
+PREPROCESS_MODE = os.environ.get("PREPROCESS_MODE", "adaptive")
+
+# ArUco (dicionários e parâmetros do detector ficam em detection.py)
 CURRENT_DICT_NAME = os.environ.get("ARUCO_DICT", "DICT_6X6_250")
-
-
-def build_detector(dict_name: str):
-    """Cria o detector com parâmetros otimizados e retorna (detector, params, dictionary)."""
-    dict_name = dict_name if dict_name in DICT_MAP else "DICT_6X6_250"
-    dictionary = cv2.aruco.getPredefinedDictionary(DICT_MAP[dict_name])
-    params = cv2.aruco.DetectorParameters()
-    # Afinando parâmetros para melhorar detecção em cenários de baixa luz/ruído
-    params.adaptiveThreshWinSizeMin = 3
-    params.adaptiveThreshWinSizeMax = 53
-    params.adaptiveThreshWinSizeStep = 4
-    params.adaptiveThreshConstant = 7
-    params.minMarkerPerimeterRate = 0.02  # aceitar marcadores menores
-    params.maxMarkerPerimeterRate = 4.0
-    params.polygonalApproxAccuracyRate = 0.03
-    params.minCornerDistanceRate = 0.05
-    params.minDistanceToBorder = 1
-    params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX  # melhora precisão
-    detector = cv2.aruco.ArucoDetector(dictionary, params)
-    return detector, params, dictionary
-
-
-ARUCO_DETECTOR, ARUCO_PARAMS, ARUCO_DICT = build_detector(CURRENT_DICT_NAME)
-
-# Pose estimation (básico)
-REAL_MARKER_SIZE_M = 0.05
-CAMERA_MATRIX = np.array([[1000, 0, 640], [0, 1000, 360], [0, 0, 1]], dtype=np.float32)
-DIST_COEFFS = np.zeros((4, 1), dtype=np.float32)
+# Perfil de DetectorParameters (detector_profiles.py / tune_detector.py), ex.: "fast"
+DETECTOR_PROFILE = os.environ.get("DETECTOR_PROFILE", DEFAULT_PROFILE)
 
 
 app = Flask(__name__)
@@ -95,250 +196,998 @@ if CORS:
         supports_credentials=False,
     )
 
-# Estado global simples
-running = False
-capture_thread: Optional[threading.Thread] = None
-latest_frame = None
-frame_lock = threading.Lock()
-last_sent = {}  # tag_id -> timestamp
-jwt_token: Optional[str] = None
-selected_camera_id = DEFAULT_CAMERA_ID  # câmera atual em uso
+# Sessão HTTP única (pool keep-alive + JWT renovado em background)
+JAVA = JavaApiClient(
+    JAVA_BASE,
+    ADMIN_EMAIL,
+    ADMIN_SENHA,
+    timeout=API_TIMEOUT,
+    pool_size=HTTP_POOL_SIZE,
+    refresh_margin_s=JWT_REFRESH_MARGIN_S,
+    login_url=LOGIN_URL,
+    breaker_failures=CIRCUIT_FAILURES,
+    breaker_reset_s=CIRCUIT_RESET_S,
+)
 
 
 def login_java() -> Optional[str]:
-    try:
-        r = requests.post(
-            LOGIN_URL,
-            json={"email": ADMIN_EMAIL, "senha": ADMIN_SENHA},
-            timeout=API_TIMEOUT,
-        )
-        if r.ok:
-            data = r.json()
-            return data.get("tokenAcesso")
-        else:
-            print(f"[PY CAM] Falha login Java: {r.status_code} {r.text[:200]}")
-    except Exception as e:
-        print(f"[PY CAM] Erro login Java: {e}")
-    return None
+    return JAVA.login()
 
 
-def pode_enviar(tag_id: int) -> bool:
-    t = time.time()
-    prev = last_sent.get(tag_id, 0)
-    return (t - prev) >= ENVIO_INTERVALO
+# Métricas do envio ao backend (compartilhadas por todas as câmeras)
+BACKEND_POST_SECONDS = {
+    endpoint: Histogram(
+        "aruco_backend_post_seconds",
+        LATENCY_BUCKETS,
+        "Duração do POST ao backend Java",
+        labels={"endpoint": endpoint},
+    )
+    for endpoint in ("single", "bulk")
+}
+BACKEND_ERRORS = Counter(
+    "aruco_backend_errors_total", "POSTs ao backend que falharam (rede ou status != 2xx)"
+)
+
 
+# Status enviado ao backend por tipo de evento de presença
+PRESENCE_STATUS = {ENTER: "DETECTADO", HEARTBEAT: "DETECTADO", EXIT: PRESENCE_EXIT_STATUS}
 
-def enviar_tag(tag_id: int):
-    global jwt_token
-    headers = {"Content-Type": "application/json", "Accept": "application/json"}
-    if jwt_token:
-        headers["Authorization"] = f"Bearer {jwt_token}"
 
-    payload = {"codigo": f"ARUCO-{tag_id}", "status": "DETECTADO", "idMoto": 1}
+def _payload(tag_id: int, kind: str = ENTER) -> dict:
+    return {"codigo": f"ARUCO-{tag_id}", "status": PRESENCE_STATUS[kind], "idMoto": 1}
 
+
+def _registrar_envio(camera_id: Optional[int], tag_id: int, kind: str, ok: bool) -> None:
+    """Sem outbox, entrada que falhou volta a ser candidata na câmera de origem: a
+    próxima vez que a tag for vista gera um novo envio. Com outbox, ela reenvia."""
+    if OUTBOX is not None:
+        return
+    pipe = REGISTRY.get(camera_id) if camera_id is not None else None
+    if pipe is not None and not ok and kind == ENTER:
+        pipe.presence.retry(tag_id)
+
+
+def _recusa_definitiva(status_code: int) -> bool:
+    """4xx que não melhora repetindo (401 reloga; 408/429 são passageiros)."""
+    return 400 <= status_code < 500 and status_code not in (401, 408, 429)
+
+
+def enviar_tag(
+    tag_id: int,
+    camera_id: Optional[int] = None,
+    kind: str = ENTER,
+    strict: bool = False,
+) -> bool:
+    """Envia o evento de presença da tag ao backend Java (executado pelos workers da
+    fila de envio). Em 401 o cliente reloga e repete o POST uma vez.
+    Com ``strict`` (outbox), recusa definitiva lança PermanentFailure e circuito
+    aberto propaga CircuitOpenError, em vez de virar False."""
+    ok = False
+    t0 = time.perf_counter()
     try:
-        r = requests.post(
-            ARUCO_POST_URL, json=payload, headers=headers, timeout=API_TIMEOUT
-        )
+        r = JAVA.post(ARUCO_POST_URL, json=_payload(tag_id, kind))
+        BACKEND_POST_SECONDS["single"].observe(time.perf_counter() - t0)
         if r.status_code in (200, 201):
-            last_sent[tag_id] = time.time()
-            print(f"[PY CAM] Tag {tag_id} enviada.")
-        elif r.status_code == 401:
-            # tentar relogar uma vez
-            print("[PY CAM] 401 - tentando relogar...")
-            jwt_token = login_java()
+            print(f"[PY CAM] Tag {tag_id} enviada (câmera {camera_id}).")
+            ok = True
         else:
             print(f"[PY CAM] Erro ao enviar {tag_id}: {r.status_code} {r.text[:200]}")
+        if not ok:
+            BACKEND_ERRORS.inc()
+            if strict and _recusa_definitiva(r.status_code):
+                raise PermanentFailure(f"HTTP {r.status_code}")
+    except CircuitOpenError:
+        if strict:
+            raise
+        # backend fora: recusado na hora, sem POST (contado no breaker)
+    except PermanentFailure:
+        raise
     except Exception as e:
         print(f"[PY CAM] Erro envio tag {tag_id}: {e}")
+        BACKEND_ERRORS.inc()
+    _registrar_envio(camera_id, tag_id, kind, ok)
+    return ok
 
 
-def preprocess_gray(gray: np.ndarray) -> np.ndarray:
-    """Aplica CLAHE e leve desfoque para melhorar contraste e reduzir ruído."""
+def enviar_lote(itens: list, strict: bool = False) -> bool:
+    """Envia vários eventos [(camera_id, tag_id, kind, ts), ...] num único POST.
+    Lança BulkNotSupported se o backend não tiver o endpoint de lote; ``strict`` como
+    em enviar_tag."""
+    t0 = time.perf_counter()
     try:
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        gray = clahe.apply(gray)
-    except Exception:
-        gray = cv2.equalizeHist(gray)
-    # leve desfoque para reduzir ruído sem perder bordas
-    gray = cv2.GaussianBlur(gray, (3, 3), 0)
-    return gray
+        r = JAVA.post(ARUCO_BULK_URL, json=[_payload(t, k) for _cam, t, k, _ts in itens])
+        BACKEND_POST_SECONDS["bulk"].observe(time.perf_counter() - t0)
+    except CircuitOpenError:
+        if strict:
+            raise
+        r = None  # backend fora: recusado na hora, sem POST (contado no breaker)
+    except Exception as e:
+        print(f"[PY CAM] Erro envio lote ({len(itens)} tags): {e}")
+        BACKEND_ERRORS.inc()
+        r = None
+
+    if r is not None and r.status_code in (404, 405, 501):
+        raise BulkNotSupported(r.status_code)
+    ok = r is not None and r.status_code in (200, 201)
+    if r is not None and not ok:
+        BACKEND_ERRORS.inc()
+    if ok:
+        print(f"[PY CAM] Lote com {len(itens)} tags enviado.")
+    elif r is not None:
+        print(f"[PY CAM] Erro ao enviar lote: {r.status_code} {r.text[:200]}")
+        if strict and _recusa_definitiva(r.status_code):
+            raise PermanentFailure(f"HTTP {r.status_code}")
+    for cam, t, k, _ts in itens:
+        _registrar_envio(cam, t, k, ok)
+    return ok
+
+
+def _enviar_item(item, strict: bool = False) -> bool:
+    camera_id, tag_id, kind, _ts = item
+    return enviar_tag(tag_id, camera_id, kind, strict=strict)
+
+
+OUTBOX = (
+    TagOutbox(
+        (lambda itens: enviar_lote(itens, strict=True)) if BATCH_MODE else None,
+        lambda item: _enviar_item(item, strict=True),
+        path=OUTBOX_PATH,
+        batch_size=OUTBOX_BATCH,
+        rate_per_s=OUTBOX_RATE,
+        max_items=OUTBOX_MAX_ITEMS,
+        max_age_s=OUTBOX_MAX_AGE_H * 3600.0,
+        max_attempts=OUTBOX_MAX_ATTEMPTS,
+        reprobe_s=BATCH_REPROBE_S,
+    )
+    if OUTBOX_MODE
+    else None
+)
+
+
+BATCHER = TagBatcher(
+    enviar_lote,
+    _enviar_item,
+    max_size=BATCH_MAX_TAGS,
+    window_s=BATCH_WINDOW_MS / 1000.0,
+    reprobe_s=BATCH_REPROBE_S,
+)
+
+
+def _despachar(item) -> None:
+    """Handler da fila: grava na outbox, ou envia direto / entrega ao agrupador no
+    modo lote quando a outbox está desligada."""
+    if OUTBOX is not None:
+        camera_id, tag_id, kind, ts = item
+        # chave de idempotência: o mesmo evento gravado de novo é ignorado
+        OUTBOX.put(list(item), key=f"{camera_id}:{tag_id}:{kind}:{ts:.3f}")
+    elif BATCH_MODE:
+        BATCHER.add(item, key=item)
+    else:
+        _enviar_item(item)
 
 
-def process_frame(frame):
-    # cv2 is a C-extension; pylint can't introspect its members reliably
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # pylint: disable=no-member
-    gray = preprocess_gray(gray)
+# Fila compartilhada por todas as câmeras; itens são (camera_id, tag_id, kind, ts)
+DISPATCH = DispatchQueue(
+    _despachar,
+    maxsize=DISPATCH_QUEUE_SIZE,
+    workers=DISPATCH_WORKERS,
+    policy=DISPATCH_POLICY,
+    name="envio-tags",
+)
 
-    # Detectar marcadores com segurança quanto ao retorno
-    try:
-        result = ARUCO_DETECTOR.detectMarkers(gray)
-    except Exception:
-        result = ([], None, [])
-
-    corners: list = []
-    ids = None
-    rejected = []
-    if isinstance(result, tuple):
-        if len(result) >= 1 and result[0] is not None:
-            corners = result[0]
-        if len(result) >= 2:
-            ids = result[1]
-        if len(result) >= 3 and result[2] is not None:
-            rejected = result[2]
-
-    # Desenhar marcadores detectados (quando houver)
-    if ids is not None and corners:
+
+_DETECTION_POOL = None
+_DETECTION_POOL_LOCK = threading.Lock()
+
+
+def detection_pool():
+    """Pool de processos de detecção, criado sob demanda e compartilhado pelas câmeras."""
+    global _DETECTION_POOL
+    with _DETECTION_POOL_LOCK:
+        if _DETECTION_POOL is None:
+            from detect_pool import DetectionPool
+
+            _DETECTION_POOL = DetectionPool(DETECTION_WORKERS)
+            print(
+                f"[PY CAM] Pool de detecção iniciado com {_DETECTION_POOL.workers} processos"
+            )
+        return _DETECTION_POOL
+
+
+# Estágios medidos por frame em aruco_stage_seconds{camera, stage}
+PIPELINE_STAGES = (
+    "capture_read",
+    "preprocess",
+    "detect",
+    "pose",
+    "overlay",
+    "jpeg_encode",
+)
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class CameraPipeline:
+    """Captura + detecção + stream de uma câmera, com estado próprio.
+
+    Cada pipeline tem seu detector, presença de tags (eventos de envio), ring de frames,
+    broadcaster MJPEG e contadores; a fila de envio e o cliente Java são compartilhados.
+    """
+
+    def __init__(self, camera_id: int, dict_name: Optional[str] = None):
+        self.camera_id = int(camera_id)
+        dict_name = dict_name or CURRENT_DICT_NAME
+        self.dict_name = dict_name if dict_name in DICT_MAP else "DICT_6X6_250"
+        self.profile = (
+            DETECTOR_PROFILE if resolve_profile(DETECTOR_PROFILE) else DEFAULT_PROFILE
+        )
+        self.detector, self.params, self.dictionary = build_detector(
+            self.dict_name, profile=self.profile
+        )
+        self.coarse_detector = self._build_coarse()
+        self.preprocess = PreprocessPipeline.from_mode(PREPROCESS_MODE)
+        # Latência por estágio: a thread de captura preenche _timings a cada frame
+        self.stage_seconds = {
+            stage: Histogram(
+                "aruco_stage_seconds",
+                STAGE_BUCKETS,
+                "Duração de cada estágio do pipeline por frame",
+                labels={"camera": str(self.camera_id), "stage": stage},
+            )
+            for stage in PIPELINE_STAGES
+        }
+        self._timings = {}
+        self.tracker = (
+            RoiTracker(
+                self.detector,
+                rescan_every=TRACK_RESCAN_FRAMES,
+                preprocess=timed(self.preprocess, self._timings, "preprocess"),
+            )
+            if TRACKING_MODE
+            else None
+        )
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        # Fonte de frames (frame_sources): câmera física por padrão
+        self.source_descriptor = parse_descriptor(self.camera_id)
+        self.source: Optional[FrameSource] = None
+        # entrada/saída de tags: só mudanças de presença vão ao backend
+        self.presence = TagPresenceTracker(
+            PRESENCE_ENTER_FRAMES, PRESENCE_EXIT_S, PRESENCE_HEARTBEAT_S
+        )
+        # Frames vivem num ring de buffers reaproveitados (sem cópia por frame/consumidor)
+        self.ring = FrameRing(FRAME_RING_SLOTS)
+        # encode-once + fan-out para /stream
+        self.broadcaster = FrameBroadcaster(
+            encode_hist=self.stage_seconds["jpeg_encode"]
+        )
+        # resultados estruturados para /events (SSE)
+        self.events = DetectionEvents()
+        self.scheduler = FrameScheduler(TARGET_FPS, LATENCY_BUDGET_MS / 1000.0)
+        # Idade do frame: da captura (last_frame_ts da fonte) até a publicação
+        self.frame_age = Histogram(
+            "aruco_frame_age_seconds",
+            LATENCY_BUCKETS,
+            "Idade do frame ao ser publicado (captura até fim do processamento)",
+            labels={"camera": str(self.camera_id)},
+        )
+        self.last_frame_age: Optional[float] = None
+        self.last_result: Optional[DetectionResult] = None
+        self.started_at: Optional[float] = None
+        self.frames = 0
+        self.detections = 0
+        self.read_failures = 0
+
+    # ------------------------------------------------------------------ controle
+    def set_dict(self, dict_name: str) -> bool:
+        """Troca o dicionário ArUco (vale a partir do próximo frame)."""
+        if not isinstance(dict_name, str) or dict_name not in DICT_MAP:
+            return False
+        self.dict_name = dict_name
+        self._rebuild()
+        return True
+
+    def set_profile(self, profile: str) -> bool:
+        """Troca o perfil de DetectorParameters (vale a partir do próximo frame)."""
+        if not isinstance(profile, str) or resolve_profile(profile) is None:
+            return False
+        self.profile = profile
+        self._rebuild()
+        return True
+
+    def _rebuild(self) -> None:
+        self.detector, self.params, self.dictionary = build_detector(
+            self.dict_name, profile=self.profile
+        )
+        self.coarse_detector = self._build_coarse()
+        if self.tracker is not None:
+            self.tracker.detector = self.detector
+            self.tracker.reset()
+
+    def _build_coarse(self):
+        """Detector da etapa grossa da pirâmide (sem refinamento interno de cantos)."""
+        if PYRAMID_SCALE >= 1.0:
+            return None
+        return build_detector(
+            self.dict_name, refine_corners=False, profile=self.profile
+        )[0]
+
+    def is_alive(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, source=None) -> bool:
+        """Inicia a thread de captura. Retorna False se já estava rodando.
+        ``source`` troca a fonte de frames (descritor de frame_sources.open_source;
+        ValueError se inválido)."""
+        if self.running and self.is_alive():
+            return False
+        if source is not None:
+            self.source_descriptor = parse_descriptor(
+                source, media_root=MEDIA_ROOT, allow_paths=MEDIA_ROOT is not None
+            )
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.capture_loop, name=f"captura-{self.camera_id}", daemon=True
+        )
+        self.thread.start()
+        return True
+
+    def stop(self) -> None:
+        self.running = False
+
+    # ------------------------------------------------------------------ envio
+    def agendar_envio(
+        self, tag_id: int, kind: str = ENTER, ts: Optional[float] = None
+    ) -> None:
+        """Entrega o evento de presença da tag à fila de envio (não bloqueia)."""
+        item = (self.camera_id, tag_id, kind, ts if ts is not None else time.time())
+        DISPATCH.submit(item, key=item[:3])
+
+    def on_presence(self, event: PresenceEvent) -> None:
+        """Encaminha um evento de presença ao backend (saída só com PRESENCE_POST_EXIT)."""
+        if event.kind == ENTER:
+            print(f"[PY CAM] Tag {event.tag_id} entrou (câmera {self.camera_id})")
+        elif event.kind == EXIT:
+            print(
+                f"[PY CAM] Tag {event.tag_id} saiu (câmera {self.camera_id}, "
+                f"visível por {event.duration_s:.0f}s)"
+            )
+            if not PRESENCE_POST_EXIT:
+                return
         try:
-            cv2.aruco.drawDetectedMarkers(
-                frame, corners, ids, borderColor=(0, 255, 0)
-            )  # pylint: disable=no-member
+            self.agendar_envio(event.tag_id, event.kind, event.timestamp)
         except Exception:
             pass
+
+    # ------------------------------------------------------------------ frame
+    def detect(self, frame):
+        """cinza -> preprocess -> detectMarkers, na thread ou no pool de processos.
+        No modo rastreamento a detecção roda na thread, só nas ROIs dos marcadores.
+        A pose fica para depois (ver ``pose_fn``). Os tempos de cada estágio ficam em
+        ``self._timings``."""
+        timings = self._timings
+        if self.tracker is not None:
+            t0 = time.perf_counter()
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # pylint: disable=no-member
+            timings["preprocess"] = time.perf_counter() - t0
+            corners, ids = self.tracker.detect(gray)  # soma o preprocess das ROIs
+            timings["detect"] = time.perf_counter() - t0 - timings["preprocess"]
+            return corners, ids, None
+        scale = PYRAMID_SCALE if PYRAMID_SCALE < 1.0 else None
+        if DETECTION_BACKEND == "process":
+            return detection_pool().detect(
+                frame,
+                self.dict_name,
+                with_pose=False,
+                pyramid_scale=scale,
+                preprocess_mode=PREPROCESS_MODE,
+                timings=timings,
+                profile=self.profile,
+            )
+        detector = self.coarse_detector if scale is not None else self.detector
+        return detect_frame(
+            detector,
+            frame,
+            with_pose=False,
+            pyramid_scale=scale,
+            preprocess=self.preprocess,
+            timings=timings,
+        )
+
+    def _observe_timings(self) -> None:
+        for stage, seconds in self._timings.items():
+            self.stage_seconds[stage].observe(seconds)
+        self._timings.clear()
+
+    def pose_fn(self, frame):
+        """Estimador de pose em lote para o tamanho deste frame, medido no estágio
+        "pose". Só roda se alguém ler a pose do resultado (eventos, status)."""
+        h, w = frame.shape[:2]
+        estimator = pose_estimator(
+            self.camera_id, (w, h), CALIBRATION_DIR, MARKER_SIZE_M
+        )
+        hist = self.stage_seconds["pose"]
+
+        def run(corners):
+            t0 = time.perf_counter()
+            try:
+                return estimator.estimate(corners)
+            finally:
+                hist.observe(time.perf_counter() - t0)
+
+        return run
+
+    def process_frame(self, frame, captured_at: Optional[float] = None):
+        """Detecta os marcadores do frame e atualiza a presença das tags (que agenda os
+        envios); não desenha nada nem calcula pose.
+        ``captured_at`` é o instante (epoch) da captura (padrão: agora)."""
+        corners, ids, tvecs = self.detect(frame)
+        result = DetectionResult(
+            self.camera_id,
+            self.frames + 1,
+            captured_at if captured_at is not None else time.time(),
+            corners,
+            ids,
+            tvecs,
+            self.pose_fn(frame) if ids is not None and tvecs is None else None,
+        )
+        self.detections += result.count
+        # só entradas/saídas (e heartbeats) viram envios ao backend
+        for event in self.presence.update(result.tag_ids, result.timestamp):
+            self.on_presence(event)
+        return result
+
+    def render(self, frame, result: DetectionResult) -> None:
+        """Desenha o overlay do resultado direto no frame (só com clientes no stream)."""
+        t0 = time.perf_counter()
+        header = (
+            f"Cam {self.camera_id} | ArUco: {result.count} | Dict: {self.dict_name} | "
+            f"API: {'ON' if JAVA.token else 'LOGIN?'}"
+        )
+        render_overlay(frame, result, header)
+        self._timings["overlay"] = time.perf_counter() - t0
+
+    def capture_loop(self):
+        cam = self.camera_id
+        cap = None
         try:
-            _rvecs, _tvecs, _ = (
-                cv2.aruco.estimatePoseSingleMarkers(  # pylint: disable=no-member
-                    corners, REAL_MARKER_SIZE_M, CAMERA_MATRIX, DIST_COEFFS
+            if self.source_descriptor.get("type") == "device":
+                # uma sondagem do /cameras pode estar com o dispositivo aberto agora
+                INVENTORY.wait_idle(
+                    self.source_descriptor.get("index", 0), CAMERA_PROBE_TIMEOUT_S
                 )
+            cap = self.source = open_source(
+                self.source_descriptor, latest_only=LATEST_FRAME_GRABBER
             )
-        except Exception:
-            _rvecs, _tvecs = None, None
+            if not cap.isOpened():
+                print(f"[PY CAM] Não foi possível abrir a fonte {cap.description}")
+                cap.release()
+                cap = None
+        except Exception as e:
+            print(f"[PY CAM] ERRO ao abrir a fonte da câmera {cam}: {e}")
+        finally:
+            # sem fonte aberta a thread termina aqui: /status não pode ficar "rodando"
+            if cap is None:
+                self.running = False
+        if cap is None:
+            return
+
+        print(f"[PY CAM] Captura iniciada: {cap.description} (pipeline {cam})")
+        DISPATCH.start()
+        if OUTBOX is not None:
+            OUTBOX.start()
+        # Login/renovação do token em background (não trava o início da captura)
+        JAVA.start_refresher()
+
+        self.started_at = time.time()
+        # replays ritmados: o agendador assume o ritmo (senão a fonte e o agendador
+        # dormem cada um o seu período); replays sem ritmo ignoram o TARGET_FPS
+        self.scheduler.reset(source_fps=cap.take_pacing(), unpaced=cap.unpaced)
+        frame_count = 0
+        try:
+            while self.running:
+                self.scheduler.frame_start()
+                reserved = self.ring.acquire_write()
+                if reserved is None:
+                    # todos os buffers ainda em uso pelos consumidores: descarta este frame
+                    cap.grab()
+                    continue
+                slot, buf = reserved
+                # lê direto no buffer pré-alocado do slot (no primeiro uso o OpenCV aloca)
+                t0 = time.perf_counter()
+                ok, frame = cap.read(buf)
+                self.stage_seconds["capture_read"].observe(time.perf_counter() - t0)
+                if not ok:
+                    self.ring.abort(slot)
+                    if cap.exhausted:
+                        print(f"[PY CAM] Fim da fonte {cap.description}")
+                        break
+                    self.read_failures += 1
+                    print(f"[PY CAM] AVISO: Falha ao ler frame da câmera {cam}")
+                    time.sleep(0.05)
+                    continue
+
+                captured = cap.last_frame_ts or time.monotonic()
+                result = self.process_frame(
+                    frame, time.time() - (time.monotonic() - captured)
+                )
+                # overlay só com alguém assistindo (desenhado no próprio buffer)
+                if self.broadcaster.clients:
+                    self.render(frame, result)
+                self.last_result = result
+                self.events.publish(result)
+                self._observe_timings()
+                self.broadcaster.publish(self.ring.commit(slot, frame))
+                self.last_frame_age = time.monotonic() - captured
+                self.frame_age.observe(self.last_frame_age)
+
+                frame_count += 1
+                self.frames += 1
+                if frame_count % 100 == 0:  # Log a cada 100 frames
+                    print(f"[PY CAM] Processados {frame_count} frames (câmera {cam})")
+
+                # dorme só o que sobrou do período; atrasado, descarta frames velhos
+                # (com o grabber o próximo read já é o frame mais novo)
+                skip = self.scheduler.frame_done()
+                if cap.always_fresh:
+                    skip = 0
+                for _ in range(skip):
+                    cap.grab()
+                if skip:
+                    self.scheduler.note_skipped(skip)
+        finally:
+            cap.release()
+            self.running = False
+            print(
+                f"[PY CAM] Captura encerrada (câmera {cam}). "
+                f"Total de frames processados: {frame_count}"
+            )
+            # Limpar o último frame ao parar
+            self.ring.reset()
+            self.broadcaster.clear()
+            self.events.clear()
+            for event in self.presence.flush():
+                self.on_presence(event)
+
+    # ------------------------------------------------------------------ stream/status
+    def mjpeg_generator(self, profile: Optional[StreamProfile] = None):
+        """Gera stream MJPEG contínuo a partir dos frames capturados.
+        Espera cada frame novo no broadcaster (sem sleep fixo); se o cliente for lento,
+        pula direto para o frame mais recente. ``profile`` define largura, qualidade e
+        FPS máximo deste cliente (padrão: resolução cheia, todo frame)."""
+        profile = profile or self.broadcaster.default_profile
+        print(
+            f"[PY CAM] Stream MJPEG iniciado (câmera {self.camera_id}, {profile.label}"
+            f"{f' @ {profile.fps:g} fps' if profile.fps else ''})"
+        )
+        interval = 1.0 / profile.fps if profile.fps else 0.0
+        next_due = 0.0
+        frame_counter = 0
+        last_seq = 0
+        with self.broadcaster.client(profile):
+            while True:
+                if interval:
+                    # FPS máximo do cliente: espera o próximo envio antes de pegar frame
+                    now = time.monotonic()
+                    if next_due > now:
+                        time.sleep(next_due - now)
+                    next_due = max(next_due, now) + interval
+                item = self.broadcaster.wait_jpeg(last_seq, timeout=1.0, profile=profile)
+                if item is None:
+                    continue
+                last_seq, buf = item
+
+                frame_counter += 1
+                if frame_counter % 100 == 0:
+                    print(f"[PY CAM] Stream: {frame_counter} frames enviados")
+
+                yield (
+                    b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + buf + b"\r\n"
+                )
 
-        for i, marker_id in enumerate(ids or []):
-            try:
-                tag_id = int(marker_id[0])
-            except Exception:
-                continue
-            # draw info (com fallback de coordenada caso corners não esteja no formato esperado)
-            try:
-                pt_arr = corners[i][0][0]
-                pt = tuple(np.array(pt_arr).astype(int))
-            except Exception:
-                pt = (10, 30)
-            cv2.putText(
-                frame,
-                f"ID: {tag_id}",
-                (pt[0], pt[1] - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                (0, 255, 0),
-                2,
+    def event_generator(self, mode: str = "change"):
+        """Gera o stream SSE de detecções (JSON compacto por evento). Sem eventos,
+        manda um comentário a cada 15 s para proxies não fecharem a conexão."""
+        last_seq = 0
+        with self.events.client():
+            yield "retry: 2000\n\n"
+            while True:
+                item = self.events.wait_event(last_seq, mode, timeout=15.0)
+                if item is None:
+                    yield ": keepalive\n\n"
+                    continue
+                last_seq, data = item
+                yield f"id: {last_seq}\nevent: detection\ndata: {data}\n\n"
+
+    def status(self) -> dict:
+        uptime = time.time() - self.started_at if self.started_at else None
+        return {
+            "camera_id": self.camera_id,
+            "running": self.running,
+            "has_frame": self.ring.has_frame(),
+            "dict": self.dict_name,
+            "profile": self.profile,
+            "thread_alive": self.is_alive(),
+            "source": (
+                self.source.stats() if self.source is not None else self.source_descriptor
+            ),
+            "frames": self.frames,
+            "detections": self.detections,
+            "read_failures": self.read_failures,
+            "fps_avg": round(self.frames / uptime, 2) if uptime else None,
+            "presence": self.presence.stats(),
+            "stream": self.broadcaster.stats(),
+            "events": self.events.stats(),
+            "frame_ring": self.ring.stats(),
+            "scheduler": self.scheduler.stats(),
+            "last_detection": (
+                self.last_result.to_dict() if self.last_result is not None else None
+            ),
+            "frame_age_ms": {
+                "last": _ms(self.last_frame_age),
+                "avg": _ms(self.frame_age.snapshot()["avg"]),
+            },
+            "pyramid_scale": PYRAMID_SCALE if PYRAMID_SCALE < 1.0 else None,
+            "preprocess": self.preprocess.stats(),
+            "tracking": self.tracker.stats() if self.tracker is not None else None,
+        }
+
+    def metrics(self) -> list:
+        """Métricas deste pipeline para /metrics (contadores lidos só na coleta)."""
+        labels = {"camera": str(self.camera_id)}
+        return list(self.stage_seconds.values()) + [
+            self.frame_age,
+            CallbackMetric(
+                "aruco_frames_total",
+                "counter",
+                lambda: self.frames,
+                "Frames processados",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_detections_total",
+                "counter",
+                lambda: self.detections,
+                "Marcadores detectados (soma por frame)",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_tags_present",
+                "gauge",
+                lambda: len(self.presence.present()),
+                "Tags presentes (já confirmadas e ainda não expiradas)",
+                labels,
+            ),
+        ] + [
+            CallbackMetric(
+                "aruco_presence_events_total",
+                "counter",
+                lambda attr=attr: getattr(self.presence, attr),
+                "Eventos de presença de tags (entrada, saída, heartbeat)",
+                {**labels, "event": event},
             )
-            # enviar para backend (com rate limit simples)
-            try:
-                if pode_enviar(tag_id):
-                    enviar_tag(tag_id)
-            except Exception:
-                pass
+            for event, attr in (
+                (ENTER, "enters"),
+                (EXIT, "exits"),
+                (HEARTBEAT, "heartbeats"),
+            )
+        ] + [
+            CallbackMetric(
+                "aruco_frames_dropped_total",
+                "counter",
+                lambda: self.ring.stalls,
+                "Frames descartados por falta de slot livre no ring",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_read_failures_total",
+                "counter",
+                lambda: self.read_failures,
+                "Falhas de leitura da câmera",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_frames_skipped_total",
+                "counter",
+                lambda: self.scheduler.skipped,
+                "Frames descartados pelo agendador por atraso",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_fps_actual",
+                "gauge",
+                lambda: self.scheduler.actual_fps() or 0.0,
+                "FPS real do loop de captura (janela recente)",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_fps_target",
+                "gauge",
+                lambda: self.scheduler.target_fps,
+                "FPS alvo do loop de captura (0 = sem limite)",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_stream_clients",
+                "gauge",
+                lambda: self.broadcaster.clients,
+                "Clientes conectados ao stream MJPEG",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_event_clients",
+                "gauge",
+                lambda: self.events.clients,
+                "Clientes conectados a /events (SSE)",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_jpeg_encodes_total",
+                "counter",
+                lambda: self.broadcaster.encodes,
+                "Frames codificados em JPEG",
+                labels,
+            ),
+            CallbackMetric(
+                "aruco_pipeline_running",
+                "gauge",
+                lambda: 1 if self.running else 0,
+                "1 se a captura está rodando",
+                labels,
+            ),
+        ]
 
-    # overlay contador
-    count = 0 if ids is None else len(ids)
-    txt = f"ArUco: {count} | Dict: {CURRENT_DICT_NAME} | API: {'ON' if jwt_token else 'LOGIN?'}"
-    (w, h), _ = cv2.getTextSize(txt, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-    cv2.rectangle(frame, (5, 5), (15 + w, 30 + h), (0, 0, 0), -1)
-    cv2.putText(frame, txt, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-    return frame
 
+class PipelineRegistry:
+    """Registro thread-safe dos pipelines por camera_id."""
 
-def _apply_camera_preferences(cap) -> None:
-    """Tenta aplicar resolução e expo auto desabilitado para estabilidade (ignorando falhas)."""
-    try:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        cap.set(cv2.CAP_PROP_FPS, 30)
-        # Tentar desabilitar auto-exposição (valores variam por backend)
-        cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)  # DSHOW/MSMF
-    except Exception:
-        pass
+    def __init__(self):
+        self._pipelines = {}
+        self._lock = threading.Lock()
 
+    def get(self, camera_id: int, create: bool = False) -> Optional[CameraPipeline]:
+        with self._lock:
+            pipe = self._pipelines.get(int(camera_id))
+            if pipe is None and create:
+                pipe = CameraPipeline(camera_id)
+                self._pipelines[int(camera_id)] = pipe
+            return pipe
+
+    def all(self) -> list:
+        with self._lock:
+            return list(self._pipelines.values())
+
+    def running(self) -> list:
+        return [p for p in self.all() if p.running]
 
-def capture_loop():
-    global running, latest_frame, jwt_token
-    cap = cv2.VideoCapture(selected_camera_id)
-    if not cap.isOpened():
-        print(f"[PY CAM] Não foi possível abrir a câmera {selected_camera_id}")
-        running = False
-        return
 
-    print(f"[PY CAM] Captura iniciada na câmera {selected_camera_id}")
-    _apply_camera_preferences(cap)
-    # Garantir token no início
-    if not jwt_token:
-        jwt_token = login_java()
+REGISTRY = PipelineRegistry()
+selected_camera_id = DEFAULT_CAMERA_ID  # câmera usada pelas rotas sem <id> (/start, /stream...)
 
-    frame_count = 0
+
+def default_pipeline() -> CameraPipeline:
+    return REGISTRY.get(selected_camera_id, create=True)
+
+
+def pipeline_for(camera_id: Optional[int]) -> Optional[CameraPipeline]:
+    """Pipeline das rotas de stream: None = câmera selecionada (como /stream)."""
+    return default_pipeline() if camera_id is None else REGISTRY.get(camera_id)
+
+
+ASYNC_SERVER = None  # AsyncStreamServer quando SERVER_MODE=asyncio
+
+
+def stream_cors_headers(path: str, headers: dict) -> list:
+    """Cabeçalhos CORS que o Flask (flask_cors) poria numa resposta de ``path``, para
+    as rotas de stream atendidas direto pelo servidor asyncio."""
+    environ = {"HTTP_" + k.upper().replace("-", "_"): v for k, v in headers.items()}
+    with app.test_request_context(path, environ_base=environ):
+        response = app.process_response(Response())
+    return [
+        (name, value)
+        for name, value in response.headers.items()
+        if name.lower().startswith("access-control-") or name.lower() == "vary"
+    ]
+
+
+def _stream_response(pipe: CameraPipeline):
+    """Stream MJPEG - sem cache para garantir vídeo ao vivo.
+    Query opcional: w (largura), q (qualidade JPEG) e fps (máximo) por cliente."""
     try:
-        while running:
-            ok, frame = cap.read()
-            if not ok:
-                print(
-                    f"[PY CAM] AVISO: Falha ao ler frame da câmera {selected_camera_id}"
-                )
-                time.sleep(0.05)
-                continue
-
-            frame = process_frame(frame)
-            # atualiza frame
-            with frame_lock:
-                latest_frame = frame.copy()
-
-            frame_count += 1
-            if frame_count % 100 == 0:  # Log a cada 100 frames
-                print(
-                    f"[PY CAM] Processados {frame_count} frames (câmera {selected_camera_id})"
-                )
+        profile = StreamProfile.from_args(request.args, pipe.broadcaster.jpeg_quality)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    response = Response(
+        pipe.mjpeg_generator(profile),
+        mimetype="multipart/x-mixed-replace; boundary=frame",
+    )
+    # Desabilitar cache completamente
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
+    return response
+
+
+def _events_response(pipe: CameraPipeline):
+    """Stream SSE de detecções; ?mode=change (padrão) ou ?mode=frame."""
+    mode = request.args.get("mode", "change")
+    if mode not in EVENT_MODES:
+        return (
+            jsonify(
+                {"ok": False, "error": f"mode inválido (use {', '.join(EVENT_MODES)})"}
+            ),
+            400,
+        )
+    response = Response(pipe.event_generator(mode), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # nginx: não bufferizar o stream
+    return response
+
+
+def _detector_params(params) -> dict:
+    return {
+        "adaptiveThreshWinSizeMin": int(params.adaptiveThreshWinSizeMin),
+        "adaptiveThreshWinSizeMax": int(params.adaptiveThreshWinSizeMax),
+        "adaptiveThreshWinSizeStep": int(params.adaptiveThreshWinSizeStep),
+        "adaptiveThreshConstant": float(params.adaptiveThreshConstant),
+        "minMarkerPerimeterRate": float(params.minMarkerPerimeterRate),
+        "polygonalApproxAccuracyRate": float(params.polygonalApproxAccuracyRate),
+        "cornerRefinementMethod": int(params.cornerRefinementMethod),
+    }
+
+
+def _apply_config(pipe: CameraPipeline, data: dict) -> Optional[str]:
+    """Aplica {"aruco_dict", "profile"} do POST /config; retorna a mensagem de erro."""
+    dict_name, profile = data.get("aruco_dict"), data.get("profile")
+    if "profile" in data and (
+        not isinstance(profile, str) or resolve_profile(profile) is None
+    ):
+        return "Perfil inválido"
+    if "aruco_dict" in data or "profile" not in data:
+        if not pipe.set_dict(dict_name):
+            return "Dicionário inválido"
+    if "profile" in data:
+        pipe.set_profile(profile)
+    return None
 
-            # Pequeno delay para não sobrecarregar
-            time.sleep(0.01)
-    finally:
-        cap.release()
-        print(f"[PY CAM] Captura encerrada. Total de frames processados: {frame_count}")
-        # Limpar o último frame ao parar
-        with frame_lock:
-            latest_frame = None
+
+def _config_payload(pipe: CameraPipeline) -> dict:
+    return {
+        "ok": True,
+        "dict": pipe.dict_name,
+        "available_dicts": list(DICT_MAP.keys()),
+        "profile": pipe.profile,
+        "available_profiles": sorted(available_profiles()),
+        "detector_params": _detector_params(pipe.params),
+    }
 
 
 @app.route("/status")
 def status():
-    return jsonify(
+    pipe = default_pipeline()
+    data = pipe.status()
+    data.update(
         {
-            "running": running,
-            "has_frame": latest_frame is not None,
-            "camera_id": selected_camera_id,
-            "dict": CURRENT_DICT_NAME,
-            "thread_alive": (
-                capture_thread is not None and capture_thread.is_alive()
-                if capture_thread
-                else False
+            "dispatch": DISPATCH.stats(),
+            "backend_circuit": JAVA.breaker.stats(),
+            "outbox": OUTBOX.stats() if OUTBOX is not None else None,
+            "batch": BATCHER.stats() if BATCH_MODE and OUTBOX is None else None,
+            "pipelines_running": [p.camera_id for p in REGISTRY.running()],
+            "server": {
+                "mode": SERVER_MODE,
+                **(ASYNC_SERVER.stats() if ASYNC_SERVER is not None else {}),
+            },
+            "detection_backend": DETECTION_BACKEND,
+            "detection_pool": (
+                _DETECTION_POOL.stats() if _DETECTION_POOL is not None else None
             ),
         }
     )
+    return jsonify(data)
+
+
+_SERVICE_METRICS = [
+    CallbackMetric(
+        "aruco_dispatch_queue_depth",
+        "gauge",
+        DISPATCH.depth,
+        "Itens aguardando na fila de envio",
+    ),
+    CallbackMetric(
+        "aruco_dispatch_dropped_total",
+        "counter",
+        lambda: DISPATCH.stats()["dropped"],
+        "Envios descartados com a fila cheia",
+    ),
+    CallbackMetric(
+        "aruco_dispatch_coalesced_total",
+        "counter",
+        lambda: DISPATCH.stats()["coalesced"],
+        "Envios repetidos fundidos na fila",
+    ),
+    *BACKEND_POST_SECONDS.values(),
+    BACKEND_ERRORS,
+    CallbackMetric(
+        "aruco_backend_circuit_open",
+        "gauge",
+        lambda: 0 if JAVA.breaker.state == CLOSED else 1,
+        "1 se o circuit breaker do backend está aberto ou meio-aberto",
+    ),
+    CallbackMetric(
+        "aruco_backend_circuit_rejected_total",
+        "counter",
+        lambda: JAVA.breaker.rejected,
+        "Chamadas ao backend recusadas na hora pelo circuit breaker",
+    ),
+    BATCHER.batch_size,
+    BATCHER.flush_latency,
+]
+if OUTBOX is not None:
+    _SERVICE_METRICS += [
+        CallbackMetric(
+            "aruco_outbox_pending",
+            "gauge",
+            OUTBOX.pending,
+            "Envios gravados na outbox aguardando confirmação do backend",
+        ),
+        CallbackMetric(
+            "aruco_outbox_oldest_age_seconds",
+            "gauge",
+            lambda: OUTBOX.oldest_age_s() or 0.0,
+            "Idade do envio mais antigo na outbox",
+        ),
+        CallbackMetric(
+            "aruco_outbox_sent_total",
+            "counter",
+            lambda: OUTBOX.sent,
+            "Envios da outbox confirmados pelo backend",
+        ),
+        CallbackMetric(
+            "aruco_outbox_discarded_total",
+            "counter",
+            lambda: OUTBOX.dropped + OUTBOX.expired,
+            "Envios descartados da outbox por limite de tamanho ou idade",
+        ),
+        CallbackMetric(
+            "aruco_outbox_dead_letter_total",
+            "counter",
+            lambda: OUTBOX.dead_lettered,
+            "Envios movidos para dead_letter (recusa definitiva ou tentativas demais)",
+        ),
+    ]
+
+
+@app.route("/metrics")
+def metrics():
+    """Métricas no formato texto do Prometheus (todas as câmeras + envio)."""
+    collected = list(_SERVICE_METRICS)
+    for pipe in REGISTRY.all():
+        collected.extend(pipe.metrics())
+    return Response(
+        render_prometheus(collected), mimetype="text/plain; version=0.0.4"
+    )
 
 
 @app.route("/debug")
 def debug():
     """Endpoint de debug para diagnóstico."""
+    pipe = default_pipeline()
     return jsonify(
         {
-            "running": running,
-            "has_frame": latest_frame is not None,
-            "camera_id": selected_camera_id,
-            "dict": CURRENT_DICT_NAME,
-            "detector_params": {
-                "adaptiveThreshWinSizeMin": int(ARUCO_PARAMS.adaptiveThreshWinSizeMin),
-                "adaptiveThreshWinSizeMax": int(ARUCO_PARAMS.adaptiveThreshWinSizeMax),
-                "adaptiveThreshWinSizeStep": int(
-                    ARUCO_PARAMS.adaptiveThreshWinSizeStep
-                ),
-                "adaptiveThreshConstant": float(ARUCO_PARAMS.adaptiveThreshConstant),
-                "minMarkerPerimeterRate": float(ARUCO_PARAMS.minMarkerPerimeterRate),
-                "cornerRefinementMethod": int(ARUCO_PARAMS.cornerRefinementMethod),
-            },
-            "jwt_token_exists": jwt_token is not None,
-            "capture_thread_alive": (
-                capture_thread.is_alive() if capture_thread else False
+            "running": pipe.running,
+            "has_frame": pipe.ring.has_frame(),
+            "camera_id": pipe.camera_id,
+            "dict": pipe.dict_name,
+            "detector_params": _detector_params(pipe.params),
+            "jwt_token_exists": JAVA.token is not None,
+            "java_client": JAVA.stats(),
+            "capture_thread_alive": pipe.is_alive(),
+            "frame_shape": pipe.ring.shape,
+            "outbox_dead_letter": (
+                OUTBOX.dead_letters(20) if OUTBOX is not None else None
             ),
-            "frame_shape": latest_frame.shape if latest_frame is not None else None,
         }
     )
 
@@ -375,11 +1224,34 @@ def _open_capture(index: int):
     return cap
 
 
+def _devices_in_use() -> set:
+    """Índices de câmera abertos pelos pipelines rodando (o inventário não os toca)."""
+    indices = set()
+    for p in REGISTRY.running():
+        if p.source_descriptor.get("type") != "device":
+            continue
+        try:
+            indices.add(int(p.source_descriptor.get("index", 0)))
+        except (TypeError, ValueError):
+            continue
+    return indices
+
+
+INVENTORY = CameraInventory(
+    _open_capture,
+    in_use=_devices_in_use,
+    max_index=CAMERA_MAX_INDEX,
+    ttl_s=CAMERA_INVENTORY_TTL_S,
+    probe_timeout_s=CAMERA_PROBE_TIMEOUT_S,
+)
+
+
 @app.route("/cameras")
 def list_cameras():
-    """Enumera câmeras disponíveis rapidamente sem capturar frames.
-    Evita bloqueios de read() e sempre libera o dispositivo.
-    Usa no máximo 5 índices por padrão (0..4) para rapidez; ajuste com ?max=10.
+    """Lista as câmeras a partir do inventário em memória (sondado em paralelo e em
+    background, sem tocar câmeras em uso; ver camera_inventory).
+    Usa no máximo 5 índices por padrão (0..4); ajuste com ?max=10. ?refresh=1 força
+    uma nova sondagem e espera por ela.
     Quando nenhuma câmera for detectada, fornece sugestões de IDs (0..2) para tentativa manual.
     """
     try:
@@ -387,21 +1259,15 @@ def list_cameras():
     except Exception:
         max_idx = 5
 
-    max_idx = max(1, min(max_idx, 20))  # limitar entre 1 e 20
+    max_idx = max(1, min(max_idx, CAMERA_MAX_INDEX))  # limitar entre 1 e o máximo
 
-    available = []
-    for i in range(max_idx):
-        cap = None
-        try:
-            cap = _open_capture(i)
-            if cap is not None and cap.isOpened():
-                available.append({"id": i, "name": f"Câmera {i}", "detected": True})
-        finally:
-            try:
-                if cap is not None:
-                    cap.release()
-            except Exception:
-                pass
+    INVENTORY.start()
+    if request.args.get("refresh") == "1":
+        INVENTORY.refresh(timeout=CAMERA_PROBE_TIMEOUT_S * 2)
+    else:
+        # só a primeira chamada espera (a sondagem inicial); depois responde da memória
+        INVENTORY.wait_ready(CAMERA_PROBE_TIMEOUT_S * 2)
+    available = INVENTORY.cameras(max_idx)
 
     # Fallback: sugerir IDs comuns se nada foi detectado (permite usuário tentar mesmo assim)
     if len(available) == 0:
@@ -414,16 +1280,23 @@ def list_cameras():
                 "cameras": suggested,
                 "selected": selected_camera_id,
                 "note": "Nenhuma câmera detectada; exibindo sugestões para tentativa manual.",
+                "inventory": INVENTORY.stats(),
             }
         )
 
-    return jsonify({"cameras": available, "selected": selected_camera_id})
+    return jsonify(
+        {
+            "cameras": available,
+            "selected": selected_camera_id,
+            "inventory": INVENTORY.stats(),
+        }
+    )
 
 
 @app.route("/start", methods=["POST"])
 def start():
-    global running, capture_thread, selected_camera_id, CURRENT_DICT_NAME, ARUCO_DETECTOR, ARUCO_PARAMS, ARUCO_DICT
-    if running:
+    global selected_camera_id, CURRENT_DICT_NAME
+    if default_pipeline().running:
         return jsonify({"ok": True, "message": "Já está rodando"})
 
     # Aceita camera_id no body JSON
@@ -431,88 +1304,153 @@ def start():
     cam_id = data.get("camera_id")
     if cam_id is not None:
         selected_camera_id = int(cam_id)
+    pipe = default_pipeline()
 
     # Aceita aruco_dict opcional (ex.: "DICT_6X6_250")
     dict_name = data.get("aruco_dict")
-    if isinstance(dict_name, str) and dict_name in DICT_MAP:
+    if pipe.set_dict(dict_name):
         CURRENT_DICT_NAME = dict_name
-        ARUCO_DETECTOR, ARUCO_PARAMS, ARUCO_DICT = build_detector(CURRENT_DICT_NAME)
 
-    running = True
-    t = threading.Thread(target=capture_loop, daemon=True)
-    t.start()
-    capture_thread = t
+    # Aceita source opcional: índice da câmera, "synthetic", caminho de vídeo/pasta ou
+    # {"type": "video", "path": "...", "realtime": false, "loop": true}
+    try:
+        pipe.start(data.get("source"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     return jsonify(
-        {"ok": True, "camera_id": selected_camera_id, "dict": CURRENT_DICT_NAME}
+        {
+            "ok": True,
+            "camera_id": pipe.camera_id,
+            "dict": pipe.dict_name,
+            "source": pipe.source_descriptor,
+        }
     )
 
 
 @app.route("/stop", methods=["POST"])
 def stop():
-    global running
-    running = False
+    default_pipeline().stop()
     return jsonify({"ok": True})
 
 
 @app.route("/config", methods=["GET", "POST"])
 def config():
-    """GET: retorna config atual. POST: altera dicionário atual via {"aruco_dict": "DICT_*"}."""
-    global CURRENT_DICT_NAME, ARUCO_DETECTOR, ARUCO_PARAMS, ARUCO_DICT
+    """GET: retorna config atual. POST: altera dicionário e/ou perfil do detector via
+    {"aruco_dict": "DICT_*", "profile": "fast"}."""
+    global CURRENT_DICT_NAME
+    pipe = default_pipeline()
     if request.method == "POST":
         data = request.get_json(silent=True) or {}
-        dict_name = data.get("aruco_dict")
-        if isinstance(dict_name, str) and dict_name in DICT_MAP:
-            CURRENT_DICT_NAME = dict_name
-            ARUCO_DETECTOR, ARUCO_PARAMS, ARUCO_DICT = build_detector(CURRENT_DICT_NAME)
-            return jsonify({"ok": True, "dict": CURRENT_DICT_NAME})
-        return jsonify({"ok": False, "error": "Dicionário inválido"}), 400
+        error = _apply_config(pipe, data)
+        if error:
+            return jsonify({"ok": False, "error": error}), 400
+        CURRENT_DICT_NAME = pipe.dict_name
+        return jsonify({"ok": True, "dict": CURRENT_DICT_NAME, "profile": pipe.profile})
     else:
-        return jsonify(
-            {
-                "ok": True,
-                "dict": CURRENT_DICT_NAME,
-                "available_dicts": list(DICT_MAP.keys()),
-            }
-        )
+        return jsonify(_config_payload(pipe))
 
 
-def mjpeg_generator():
-    """Gera stream MJPEG contínuo a partir dos frames capturados."""
-    print("[PY CAM] Stream MJPEG iniciado")
-    frame_counter = 0
-    while True:
-        with frame_lock:
-            frame = None if latest_frame is None else latest_frame.copy()
-        if frame is None:
-            time.sleep(0.05)
-            continue
+@app.route("/stream")
+def stream():
+    """Stream MJPEG da câmera padrão - sem cache para garantir vídeo ao vivo."""
+    return _stream_response(default_pipeline())
 
-        ret, jpeg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-        if not ret:
-            continue
 
-        buf = jpeg.tobytes()
-        frame_counter += 1
-        if frame_counter % 100 == 0:
-            print(f"[PY CAM] Stream: {frame_counter} frames enviados")
+@app.route("/events")
+def events():
+    """Detecções da câmera padrão como Server-Sent Events (JSON por evento)."""
+    return _events_response(default_pipeline())
 
-        yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + buf + b"\r\n")
 
-        # Pequeno delay para controlar taxa de frames (30 FPS)
-        time.sleep(0.033)
+# ===================== MULTI-CÂMERA =====================
+# Rotas por câmera: um processo controla vários pipelines ao mesmo tempo.
 
 
-@app.route("/stream")
-def stream():
-    """Stream MJPEG - sem cache para garantir vídeo ao vivo."""
-    response = Response(
-        mjpeg_generator(), mimetype="multipart/x-mixed-replace; boundary=frame"
+@app.route("/pipelines")
+def list_pipelines():
+    """Lista o status de todos os pipelines criados neste processo."""
+    return jsonify(
+        {
+            "pipelines": [p.status() for p in REGISTRY.all()],
+            "dispatch": DISPATCH.stats(),
+        }
     )
-    # Desabilitar cache completamente
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    return response
+
+
+@app.route("/cameras/<int:cam_id>/start", methods=["POST"])
+def camera_start(cam_id: int):
+    pipe = REGISTRY.get(cam_id, create=True)
+    data = request.get_json(silent=True) or {}
+    if data.get("aruco_dict") is not None and not pipe.set_dict(data.get("aruco_dict")):
+        return jsonify({"ok": False, "error": "Dicionário inválido"}), 400
+    try:
+        started = pipe.start(data.get("source"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if not started:
+        return jsonify({"ok": True, "camera_id": cam_id, "message": "Já está rodando"})
+    return jsonify(
+        {
+            "ok": True,
+            "camera_id": cam_id,
+            "dict": pipe.dict_name,
+            "source": pipe.source_descriptor,
+        }
+    )
+
+
+@app.route("/cameras/<int:cam_id>/stop", methods=["POST"])
+def camera_stop(cam_id: int):
+    pipe = REGISTRY.get(cam_id)
+    if pipe is None:
+        return jsonify({"ok": False, "error": "Pipeline não encontrado"}), 404
+    pipe.stop()
+    return jsonify({"ok": True, "camera_id": cam_id})
+
+
+@app.route("/cameras/<int:cam_id>/status")
+def camera_status(cam_id: int):
+    pipe = REGISTRY.get(cam_id)
+    if pipe is None:
+        return jsonify({"ok": False, "error": "Pipeline não encontrado"}), 404
+    return jsonify(pipe.status())
+
+
+@app.route("/cameras/<int:cam_id>/config", methods=["GET", "POST"])
+def camera_config(cam_id: int):
+    pipe = REGISTRY.get(cam_id, create=request.method == "POST")
+    if pipe is None:
+        return jsonify({"ok": False, "error": "Pipeline não encontrado"}), 404
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        error = _apply_config(pipe, data)
+        if error:
+            return jsonify({"ok": False, "error": error}), 400
+        return jsonify(
+            {
+                "ok": True,
+                "camera_id": cam_id,
+                "dict": pipe.dict_name,
+                "profile": pipe.profile,
+            }
+        )
+    return jsonify({"camera_id": cam_id, **_config_payload(pipe)})
+
+
+@app.route("/cameras/<int:cam_id>/stream")
+def camera_stream(cam_id: int):
+    pipe = REGISTRY.get(cam_id)
+    if pipe is None:
+        return jsonify({"ok": False, "error": "Pipeline não encontrado"}), 404
+    return _stream_response(pipe)
+
+
+@app.route("/cameras/<int:cam_id>/events")
+def camera_events(cam_id: int):
+    pipe = REGISTRY.get(cam_id)
+    if pipe is None:
+        return jsonify({"ok": False, "error": "Pipeline não encontrado"}), 404
+    return _events_response(pipe)
 
 
 UI_HTML = """
@@ -569,5 +1507,19 @@ def ui():
 
 
 if __name__ == "__main__":
-    print("Camera Web Service ouvindo em http://localhost:5001/ui")
-    app.run(host="0.0.0.0", port=5001, debug=False)
+    print(f"Camera Web Service ouvindo em http://localhost:{SERVER_PORT}/ui")
+    INVENTORY.start()  # /cameras já responde da memória na primeira chamada
+    if SERVER_MODE == "asyncio":
+        from async_server import AsyncStreamServer, serve
+
+        print("[PY CAM] Servidor asyncio (streams como corrotinas)")
+        ASYNC_SERVER = AsyncStreamServer(
+            app,
+            pipeline_for,
+            stream_cors_headers,
+            feed_workers=ASYNC_FEED_WORKERS,
+            wsgi_workers=ASYNC_WSGI_WORKERS,
+        )
+        serve(ASYNC_SERVER, host="0.0.0.0", port=SERVER_PORT)
+    else:
+        app.run(host="0.0.0.0", port=SERVER_PORT, debug=False, threaded=True)
@@ -0,0 +1,119 @@
+"""
+Circuit breaker para as chamadas ao backend Java.
+
+Com o backend fora do ar, cada chamada custaria um timeout inteiro (5-8 s). O breaker
+conta falhas consecutivas (erro de rede, timeout ou 5xx) e, ao chegar em
+``failure_threshold``, abre: as chamadas seguintes falham na hora com
+``CircuitOpenError``, sem tocar a rede. Depois de ``reset_timeout_s`` ele fica
+meio-aberto e deixa passar até ``half_open_max`` chamadas de prova; sucesso fecha o
+circuito, falha reabre por mais ``reset_timeout_s``.
+
+``CircuitOpenError`` herda de ``requests.exceptions.ConnectionError``, então quem já
+trata "backend fora do ar" continua funcionando sem mudanças.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Chamada recusada sem tentar: o circuito está aberto."""
+
+
+class CircuitBreaker:
+    """Estado closed/open/half_open compartilhado por todas as chamadas a um backend."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 15.0,
+        half_open_max: int = 1,
+        on_change: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout_s = max(0.0, float(reset_timeout_s))
+        self.half_open_max = max(1, int(half_open_max))
+        self.on_change = on_change  # (estado_anterior, novo_estado)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0  # chamadas de prova em andamento no meio-aberto
+
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if (
+            self._state == OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout_s
+        ):
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        previous, self._state = self._state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.opens += 1
+        if state != CLOSED:
+            self._probes = 0
+        if previous != state and self.on_change is not None:
+            self.on_change(previous, state)
+
+    def allow(self) -> bool:
+        """True se a chamada pode seguir (registre o resultado depois)."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_max:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self) -> None:
+        """Como ``allow``, mas lança ``CircuitOpenError`` se a chamada for recusada."""
+        if not self.allow():
+            raise CircuitOpenError("Backend indisponível (circuit breaker aberto)")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._transition(OPEN)
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.reset_timeout_s - (time.monotonic() - self._opened_at)
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_s": self.reset_timeout_s,
+                "retry_in_s": round(retry_in, 1) if state == OPEN else None,
+                "opens": self.opens,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,233 @@
+"""
+Backend opcional de detecção em pool de processos.
+
+Pré-processamento, ``detectMarkers`` e pose rodam em processos filhos, fora do GIL do
+processo do serviço. Os frames vão por ``multiprocessing.shared_memory``: o pai copia o
+frame uma vez para um slot de memória compartilhada e envia só (nome, shape, dtype) —
+nada de pickle de pixels. Os resultados (cantos, ids, tvecs) são pequenos e voltam por
+pickle, na ordem de submissão.
+
+Uso: DETECTION_BACKEND=process (ver camera_web_service).
+"""
+
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from detection import build_detector, detect_frame
+from preprocess import PreprocessPipeline
+
+# ===================== LADO DO WORKER (processo filho) =====================
+_WORKER_SHM = {}  # slot -> SharedMemory anexada (reaproveitada entre frames)
+_WORKER_DETECTORS = {}  # (dict_name, refine_corners, profile) -> ArucoDetector
+_WORKER_PREPROCESS = {}  # modo -> PreprocessPipeline (um por processo, single-thread)
+
+
+def _attach(slot: int, shm_name: str) -> shared_memory.SharedMemory:
+    """Anexa o segmento do ``slot``. Quando o pai recria o slot (frame maior), o nome
+    muda: o anexo antigo é fechado, senão o segmento já removido pelo pai continuaria
+    mapeado no filho. No máximo um anexo por slot."""
+    shm = _WORKER_SHM.get(slot)
+    if shm is not None and shm.name.lstrip("/") == shm_name.lstrip("/"):
+        return shm
+    if shm is not None:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # ainda há view viva; o mapeamento sai com o coletor de lixo
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:
+        # Python < 3.13: sem ``track``. O filho usa o mesmo resource_tracker do
+        # pai, então o registro repetido é inofensivo; quem faz unlink é o pai.
+        shm = shared_memory.SharedMemory(name=shm_name)
+    _WORKER_SHM[slot] = shm
+    return shm
+
+
+def _worker_detect(
+    slot: int,
+    shm_name: str,
+    shape: tuple,
+    dtype: str,
+    dict_name: str,
+    with_pose: bool,
+    pyramid_scale: Optional[float] = None,
+    preprocess_mode: str = "always",
+    profile: Optional[str] = None,
+):
+    shm = _attach(slot, shm_name)
+    frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    # na pirâmide o detector é o grosso (cantos refinados depois em resolução cheia)
+    key = (dict_name, not (pyramid_scale and pyramid_scale < 1.0), profile)
+    detector = _WORKER_DETECTORS.get(key)
+    if detector is None:
+        detector = build_detector(dict_name, refine_corners=key[1], profile=profile)[0]
+        _WORKER_DETECTORS[key] = detector
+    preprocess = _WORKER_PREPROCESS.get(preprocess_mode)
+    if preprocess is None:
+        preprocess = PreprocessPipeline.from_mode(preprocess_mode)
+        _WORKER_PREPROCESS[preprocess_mode] = preprocess
+    timings = {}
+    corners, ids, tvecs = detect_frame(
+        detector, frame, with_pose, pyramid_scale, preprocess, timings
+    )
+    return [np.asarray(c) for c in corners], ids, tvecs, timings
+
+
+# ===================== LADO DO PAI =====================
+class DetectionPool:
+    """Pool de processos de detecção alimentado por slots de memória compartilhada."""
+
+    def __init__(self, workers: Optional[int] = None, slots: Optional[int] = None):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.num_slots = max(self.workers, int(slots or self.workers * 2))
+        # spawn: seguro com as threads de captura/Flask do processo pai
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=mp.get_context("spawn")
+        )
+        self._shms: List[Optional[shared_memory.SharedMemory]] = [None] * self.num_slots
+        self._free = list(range(self.num_slots))
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self._busy_s = 0.0
+
+    def _acquire_slot(self, nbytes: int) -> int:
+        with self._cond:
+            while not self._free:
+                self._cond.wait()
+            slot = self._free.pop()
+        shm = self._shms[slot]
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self._shms[slot] = shared_memory.SharedMemory(create=True, size=nbytes)
+        return slot
+
+    def _release_slot(self, slot: int) -> None:
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify()
+
+    def submit(
+        self,
+        frame: np.ndarray,
+        dict_name: str,
+        with_pose: bool = True,
+        pyramid_scale: Optional[float] = None,
+        preprocess_mode: str = "always",
+        profile: Optional[str] = None,
+    ) -> Future:
+        """Copia o frame para um slot livre (bloqueia se todos estiverem ocupados) e
+        agenda a detecção. O Future resolve para (corners, ids, tvecs, timings), com
+        a duração de cada estágio medida no processo filho."""
+        if self._closed:
+            raise RuntimeError("DetectionPool encerrado")
+        frame = np.ascontiguousarray(frame)
+        slot = self._acquire_slot(frame.nbytes)
+        shm = self._shms[slot]
+        np.copyto(np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf), frame)
+
+        t0 = time.perf_counter()
+        fut = self._executor.submit(
+            _worker_detect,
+            slot,
+            shm.name,
+            frame.shape,
+            frame.dtype.str,
+            dict_name,
+            with_pose,
+            pyramid_scale,
+            preprocess_mode,
+            profile,
+        )
+        self.submitted += 1
+
+        def _done(f: Future) -> None:
+            self._release_slot(slot)
+            with self._cond:
+                self.completed += 1
+                self._busy_s += time.perf_counter() - t0
+                if f.exception() is not None:
+                    self.errors += 1
+
+        fut.add_done_callback(_done)
+        return fut
+
+    def detect(
+        self,
+        frame: np.ndarray,
+        dict_name: str,
+        with_pose: bool = True,
+        pyramid_scale: Optional[float] = None,
+        preprocess_mode: str = "always",
+        timings: Optional[dict] = None,
+        profile: Optional[str] = None,
+    ):
+        """Detecção síncrona (a thread chamadora espera, mas sem segurar o GIL).
+        Retorna (corners, ids, tvecs); ``timings`` recebe os tempos do filho."""
+        try:
+            corners, ids, tvecs, worker_timings = self.submit(
+                frame, dict_name, with_pose, pyramid_scale, preprocess_mode, profile
+            ).result()
+            if timings is not None:
+                timings.update(worker_timings)
+            return corners, ids, tvecs
+        except Exception as e:
+            print(f"[PY CAM] Erro no pool de detecção: {e}")
+            return [], None, None
+
+    def map_ordered(
+        self, frames: Iterable[np.ndarray], dict_name: str, with_pose: bool = True
+    ) -> Iterator:
+        """Processa uma sequência de frames em paralelo, devolvendo resultados na ordem.
+
+        Mantém até ``num_slots`` frames em voo.
+        """
+        pending = deque()
+        for frame in frames:
+            pending.append(self.submit(frame, dict_name, with_pose))
+            if len(pending) >= self.num_slots:
+                yield pending.popleft().result()[:3]
+        while pending:
+            yield pending.popleft().result()[:3]
+
+    def shutdown(self) -> None:
+        self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for shm in self._shms:
+            if shm is not None:
+                try:
+                    shm.close()
+                    shm.unlink()
+                except Exception:
+                    pass
+        self._shms = [None] * self.num_slots
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "slots": self.num_slots,
+                "slots_free": len(self._free),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "errors": self.errors,
+                "avg_latency_ms": (
+                    round(self._busy_s / self.completed * 1000, 2)
+                    if self.completed
+                    else None
+                ),
+            }
@@ -0,0 +1,183 @@
+"""
+Funções de detecção ArUco compartilhadas (sem Flask, sem estado global de câmera).
+
+Usadas pelo camera_web_service (thread de captura) e pelos processos do
+``detect_pool`` — por isso ficam num módulo leve, importável em processos filhos.
+"""
+
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detector_profiles import BASE_PARAMS, DEFAULT_PROFILE, apply_params, resolve_profile
+from pose import PoseBatch, pose_estimator
+
+# ArUco dictionaries suportados (nome -> constante)
+DICT_MAP = {
+    "DICT_6X6_250": cv2.aruco.DICT_6X6_250,
+    "DICT_5X5_100": cv2.aruco.DICT_5X5_100,
+    "DICT_4X4_50": cv2.aruco.DICT_4X4_50,
+}
+DEFAULT_DICT_NAME = "DICT_6X6_250"
+
+# Refinamento sub-pixel dos cantos no modo pirâmide (mesmos critérios do CORNER_REFINE_SUBPIX)
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+
+
+def build_detector(
+    dict_name: str,
+    refine_corners: bool = True,
+    profile: Optional[str] = None,
+    values: Optional[dict] = None,
+):
+    """Cria o detector com parâmetros otimizados e retorna (detector, params, dictionary).
+    ``refine_corners=False`` desliga o refinamento interno (usado na etapa grossa da
+    pirâmide, que refina os cantos depois na resolução cheia).
+    ``profile`` escolhe um perfil de detector_profiles (perfil desconhecido = default);
+    ``values`` passa os parâmetros diretamente (usado pelo tune_detector)."""
+    dict_name = dict_name if dict_name in DICT_MAP else DEFAULT_DICT_NAME
+    dictionary = cv2.aruco.getPredefinedDictionary(DICT_MAP[dict_name])
+    params = cv2.aruco.DetectorParameters()
+    if values is None:
+        values = resolve_profile(profile) or resolve_profile(DEFAULT_PROFILE)
+    apply_params(params, {**BASE_PARAMS, **values})
+    params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX  # melhora precisão
+    if not refine_corners:
+        params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_NONE
+    detector = cv2.aruco.ArucoDetector(dictionary, params)
+    return detector, params, dictionary
+
+
+_LOCAL = threading.local()  # CLAHE reaproveitado por thread (o objeto não é thread-safe)
+
+
+def preprocess_gray(gray: np.ndarray) -> np.ndarray:
+    """Aplica CLAHE e leve desfoque para melhorar contraste e reduzir ruído.
+    Versão fixa (sempre os dois estágios); ver preprocess.PreprocessPipeline."""
+    try:
+        clahe = getattr(_LOCAL, "clahe", None)
+        if clahe is None:
+            clahe = _LOCAL.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        gray = clahe.apply(gray)
+    except Exception:
+        gray = cv2.equalizeHist(gray)
+    # leve desfoque para reduzir ruído sem perder bordas
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    return gray
+
+
+def detect_markers(detector, gray: np.ndarray) -> Tuple[list, Optional[np.ndarray]]:
+    """Roda ``detectMarkers`` com segurança quanto ao retorno.
+
+    Retorna (corners, ids) com ids achatado em (N,) — o OpenCV 4.x devolve (N, 1)
+    e versões mais novas (N,) — ou None quando nada foi detectado.
+    """
+    try:
+        result = detector.detectMarkers(gray)
+    except Exception:
+        return [], None
+
+    corners: list = []
+    ids = None
+    if isinstance(result, tuple):
+        if len(result) >= 1 and result[0] is not None:
+            corners = list(result[0])
+        if len(result) >= 2 and result[1] is not None:
+            ids = np.asarray(result[1]).reshape(-1)
+    if ids is None or len(ids) == 0 or not corners:
+        return [], None
+    return corners, ids
+
+
+def estimate_pose(
+    corners: list, image_size: Tuple[int, int], camera_id: int = 0
+) -> Optional[PoseBatch]:
+    """Pose de todos os marcadores do frame em lote (ver pose.py); None sem marcadores."""
+    if not corners:
+        return None
+    return pose_estimator(camera_id, image_size).estimate(corners)
+
+
+def timed(fn: Callable, timings: dict, key: str) -> Callable:
+    """Envolve ``fn`` somando o tempo de cada chamada em ``timings[key]`` (segundos)."""
+
+    def run(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[key] = timings.get(key, 0.0) + time.perf_counter() - t0
+
+    return run
+
+
+def detect_markers_pyramid(
+    coarse_detector,
+    gray: np.ndarray,
+    scale: float,
+    preprocess: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+) -> Tuple[list, Optional[np.ndarray]]:
+    """Detecção coarse-to-fine.
+
+    Os candidatos são achados numa cópia reduzida (``scale``, ex.: 0.5) já pré-processada;
+    os cantos são mapeados de volta e refinados com ``cornerSubPix`` no ``gray`` em
+    resolução cheia (sem CLAHE/blur), preservando a precisão do CORNER_REFINE_SUBPIX.
+    ``coarse_detector`` deve ser criado com ``build_detector(..., refine_corners=False)``.
+    """
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    corners, ids = detect_markers(coarse_detector, (preprocess or preprocess_gray)(small))
+    if ids is None:
+        return [], None
+    # centro de pixel: (x + 0.5) / s - 0.5 mapeia a grade reduzida para a original
+    pts = (np.concatenate([np.asarray(c).reshape(-1, 2) for c in corners]) + 0.5) / scale - 0.5
+    pts = pts.astype(np.float32).reshape(-1, 1, 2)
+    win = max(3, int(round(2.0 / scale)))  # cobre o erro de quantização da escala
+    pts = cv2.cornerSubPix(gray, pts, (win, win), (-1, -1), SUBPIX_CRITERIA)
+    refined = [pts[4 * i : 4 * i + 4].reshape(1, 4, 2) for i in range(len(ids))]
+    return refined, ids
+
+
+def detect_frame(
+    detector,
+    frame: np.ndarray,
+    with_pose: bool = True,
+    pyramid_scale: Optional[float] = None,
+    preprocess: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    timings: Optional[dict] = None,
+):
+    """Pipeline completo de um frame BGR: cinza -> preprocess -> detect -> pose.
+
+    Com ``pyramid_scale`` (< 1) usa ``detect_markers_pyramid``; nesse caso ``detector``
+    é o detector grosso, sem refinamento interno de cantos. ``preprocess`` troca o
+    ``preprocess_gray`` fixo (ex.: um ``PreprocessPipeline`` adaptativo).
+    Se ``timings`` for um dict, recebe a duração (s) de "preprocess" (inclui a
+    conversão para cinza), "detect" e "pose".
+    Retorna (corners, ids, tvecs).
+    """
+    preprocess = preprocess or preprocess_gray
+    if timings is not None:
+        preprocess = timed(preprocess, timings, "preprocess")
+        t0 = time.perf_counter()
+    # cv2 is a C-extension; pylint can't introspect its members reliably
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # pylint: disable=no-member
+    if timings is not None:
+        t1 = time.perf_counter()
+        timings["preprocess"] = timings.get("preprocess", 0.0) + t1 - t0
+    if pyramid_scale and pyramid_scale < 1.0:
+        corners, ids = detect_markers_pyramid(detector, gray, pyramid_scale, preprocess)
+    else:
+        corners, ids = detect_markers(detector, preprocess(gray))
+    if timings is not None:
+        t2 = time.perf_counter()
+        # o preprocess roda dentro da detecção (na pirâmide, na cópia reduzida)
+        timings["detect"] = t2 - t0 - timings["preprocess"]
+    tvecs = None
+    if with_pose and ids is not None:
+        batch = estimate_pose(corners, (frame.shape[1], frame.shape[0]))
+        tvecs = batch.tvecs if batch is not None else None
+        if timings is not None:
+            timings["pose"] = time.perf_counter() - t2
+    return corners, ids, tvecs
@@ -0,0 +1,126 @@
+"""
+Distribuição de DetectionResult para clientes de /events (Server-Sent Events).
+
+Mesmo desenho do FrameBroadcaster: o pipeline publica o último resultado, cada
+cliente espera numa ``threading.Condition`` por um número de sequência mais novo e
+clientes lentos pulam direto para o mais recente, sem fila. Cada resultado é
+serializado em JSON uma única vez, pelo primeiro cliente que precisar dele, fora da
+Condition (o publish() da captura nunca espera uma serialização).
+
+Dois modos de assinatura:
+
+- "change": só quando o conjunto de tags visíveis muda (padrão; quase nada trafega
+  com o pátio parado)
+- "frame":  todo frame processado (cantos e distância atualizados)
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from detection_result import DetectionResult
+
+EVENT_MODES = ("change", "frame")
+
+
+class DetectionEvents:
+    """Último DetectionResult de um pipeline, para N assinantes de /events."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._result: Optional[DetectionResult] = None
+        self._seq = 0
+        self._change_seq = 0  # seq do último frame em que o conjunto de tags mudou
+        self._tags: Optional[frozenset] = None
+        self._json: Optional[str] = None
+        self._json_seq = -1
+        self._json_lock = threading.Lock()  # uma serialização por seq
+        self._clients = 0
+
+        self.published = 0
+        self.changes = 0
+        self.events_sent = 0
+
+    # ------------------------------------------------------------------ produtor
+    def publish(self, result: DetectionResult) -> None:
+        """Publica o resultado de um frame (custo: um set e um notify)."""
+        tags = frozenset(result.tag_ids)
+        with self._cond:
+            self._result = result
+            self._seq += 1
+            self.published += 1
+            if tags != self._tags:
+                self._tags = tags
+                self._change_seq = self._seq
+                self.changes += 1
+            if self._clients:
+                self._cond.notify_all()
+
+    def clear(self) -> None:
+        """Esquece o último resultado (captura parada)."""
+        with self._cond:
+            self._result = None
+            self._tags = None
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------ consumidores
+    @property
+    def clients(self) -> int:
+        return self._clients
+
+    @contextmanager
+    def client(self):
+        """Registra um assinante enquanto o bloco estiver ativo."""
+        with self._cond:
+            self._clients += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._clients -= 1
+
+    def wait_event(
+        self, last_seq: int, mode: str = "change", timeout: float = 15.0
+    ) -> Optional[Tuple[int, str]]:
+        """Bloqueia até haver evento mais novo que ``last_seq`` no ``mode`` pedido.
+
+        Retorna (seq, json) do resultado mais recente, ou None no timeout.
+        """
+
+        def ready() -> bool:
+            if self._result is None:
+                return False
+            seq = self._change_seq if mode == "change" else self._seq
+            return seq > last_seq
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            seq, result = self._seq, self._result
+            changed = self._change_seq == seq
+            self.events_sent += 1
+
+        # serializa fora da Condition; o lock garante uma serialização por seq e um
+        # resultado mais novo já serializado por outro cliente é servido direto
+        with self._json_lock:
+            if self._json_seq < seq:
+                payload = result.to_dict()
+                payload["changed"] = changed
+                self._json = json.dumps(payload, separators=(",", ":"))
+                self._json_seq = seq
+            return self._json_seq, self._json
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "clients": self._clients,
+                "published": self.published,
+                "changes": self.changes,
+                "events_sent": self.events_sent,
+            }
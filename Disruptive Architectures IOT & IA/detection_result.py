@@ -0,0 +1,113 @@
+"""
+Resultado estruturado da detecção de um frame.
+
+A detecção produz um ``DetectionResult`` (ids, cantos e pose em arrays NumPy, como
+saem do OpenCV) em vez de só desenhar no frame; o overlay (overlay.py), o envio ao
+backend e os consumidores de eventos leem este objeto. A conversão para
+``MarkerDetection``/dict só acontece quando alguém pede (``markers``/``to_dict``), e a
+pose também: com ``pose_fn`` ela é calculada em lote na primeira leitura de
+``positions``/``distances``.
+"""
+
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class MarkerDetection:
+    """Um marcador detectado: id, 4 cantos (px), distância e posição (m, referencial
+    da câmera) estimadas."""
+
+    id: int
+    corners: List[Tuple[float, float]]
+    distance_m: Optional[float] = None
+    position_m: Optional[Tuple[float, float, float]] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "corners": [[round(x, 1), round(y, 1)] for x, y in self.corners],
+            "distance_m": (
+                round(self.distance_m, 3) if self.distance_m is not None else None
+            ),
+            "position_m": (
+                [round(v, 3) for v in self.position_m]
+                if self.position_m is not None
+                else None
+            ),
+        }
+
+
+@dataclass
+class DetectionResult:
+    """Saída da detecção de um frame de uma câmera.
+
+    ``timestamp`` é o instante (epoch, s) em que o frame foi capturado; ``corners``,
+    ``ids`` e ``tvecs`` são os arrays do OpenCV (ids/tvecs None sem marcadores ou
+    sem pose). Sem ``tvecs``, ``pose_fn(corners) -> PoseBatch`` calcula a pose sob
+    demanda.
+    """
+
+    camera_id: int
+    frame_seq: int
+    timestamp: float
+    corners: list = field(default_factory=list, repr=False)
+    ids: Optional[np.ndarray] = None
+    tvecs: Optional[np.ndarray] = field(default=None, repr=False)
+    pose_fn: Optional[Callable] = field(default=None, repr=False, compare=False)
+
+    @property
+    def count(self) -> int:
+        return 0 if self.ids is None else len(self.ids)
+
+    @property
+    def tag_ids(self) -> List[int]:
+        return [] if self.ids is None else [int(i) for i in self.ids.ravel()]
+
+    @cached_property
+    def positions(self) -> Optional[np.ndarray]:
+        """(N, 3) em metros no referencial da câmera (NaN onde a pose falhou)."""
+        if not self.count:
+            return None
+        if self.tvecs is not None:
+            return np.asarray(self.tvecs, dtype=np.float64).reshape(-1, 3)
+        if self.pose_fn is None:
+            return None
+        batch = self.pose_fn(self.corners)
+        return batch.positions if batch is not None else None
+
+    @property
+    def distances(self) -> Optional[np.ndarray]:
+        positions = self.positions
+        return None if positions is None else np.linalg.norm(positions, axis=1)
+
+    @cached_property
+    def markers(self) -> List[MarkerDetection]:
+        positions = self.positions
+        distances = self.distances
+        out = []
+        for i, tag_id in enumerate(self.tag_ids):
+            try:
+                pts = np.asarray(self.corners[i], dtype=np.float32).reshape(-1, 2)
+                corners = [(float(x), float(y)) for x, y in pts]
+            except Exception:
+                corners = []
+            distance = position = None
+            if positions is not None and i < len(positions):
+                if np.isfinite(distances[i]):
+                    distance = float(distances[i])
+                    position = tuple(float(v) for v in positions[i])
+            out.append(MarkerDetection(tag_id, corners, distance, position))
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "camera_id": self.camera_id,
+            "frame_seq": self.frame_seq,
+            "timestamp": round(self.timestamp, 3),
+            "count": self.count,
+            "markers": [m.to_dict() for m in self.markers],
+        }
@@ -0,0 +1,126 @@
+"""
+Perfis nomeados de ``cv2.aruco.DetectorParameters``.
+
+Um perfil é um dict {atributo: valor} aplicado sobre os parâmetros base
+(``BASE_PARAMS``, os valores que o ``build_detector`` sempre usou). Há perfis
+embutidos e, opcionalmente, um JSON gerado pelo ``tune_detector.py``
+(``DETECTOR_PROFILES_FILE``, padrão ``detector_profiles.json`` ao lado deste módulo)
+que acrescenta ou sobrescreve perfis; o arquivo é relido quando muda.
+
+O custo do limiar adaptativo cresce com o número de passadas:
+``(WinSizeMax - WinSizeMin) // WinSizeStep + 1`` — 13 no perfil "default".
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+DEFAULT_PROFILE = "default"
+PROFILES_FILE = os.environ.get(
+    "DETECTOR_PROFILES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "detector_profiles.json"),
+)
+
+# Afinando parâmetros para melhorar detecção em cenários de baixa luz/ruído
+BASE_PARAMS = {
+    "adaptiveThreshWinSizeMin": 3,
+    "adaptiveThreshWinSizeMax": 53,
+    "adaptiveThreshWinSizeStep": 4,
+    "adaptiveThreshConstant": 7.0,
+    "minMarkerPerimeterRate": 0.02,  # aceitar marcadores menores
+    "maxMarkerPerimeterRate": 4.0,
+    "polygonalApproxAccuracyRate": 0.03,
+    "minCornerDistanceRate": 0.05,
+    "minDistanceToBorder": 1,
+}
+
+# Parâmetros que o tune_detector explora (e que um perfil pode mudar)
+TUNABLE_PARAMS = {
+    "adaptiveThreshWinSizeMin": int,
+    "adaptiveThreshWinSizeMax": int,
+    "adaptiveThreshWinSizeStep": int,
+    "adaptiveThreshConstant": float,
+    "minMarkerPerimeterRate": float,
+    "maxMarkerPerimeterRate": float,
+    "polygonalApproxAccuracyRate": float,
+    "minCornerDistanceRate": float,
+    "minDistanceToBorder": int,
+}
+
+BUILTIN_PROFILES: Dict[str, dict] = {
+    DEFAULT_PROFILE: {},
+    # 4 passadas de limiar (5, 11, 17, 23) e marcadores um pouco maiores
+    "fast": {
+        "adaptiveThreshWinSizeMin": 5,
+        "adaptiveThreshWinSizeMax": 23,
+        "adaptiveThreshWinSizeStep": 6,
+        "minMarkerPerimeterRate": 0.03,
+    },
+    # janelas largas e constante menor para bordas de pouco contraste (6 passadas)
+    "low-light": {
+        "adaptiveThreshWinSizeMin": 5,
+        "adaptiveThreshWinSizeMax": 45,
+        "adaptiveThreshWinSizeStep": 8,
+        "adaptiveThreshConstant": 5.0,
+    },
+}
+
+_lock = threading.Lock()
+_file_cache = {"mtime": None, "profiles": {}}
+
+
+def threshold_passes(params: dict) -> int:
+    """Número de passadas do limiar adaptativo para os parâmetros dados."""
+    lo = int(params["adaptiveThreshWinSizeMin"])
+    hi = int(params["adaptiveThreshWinSizeMax"])
+    step = max(1, int(params["adaptiveThreshWinSizeStep"]))
+    return max(0, (hi - lo) // step) + 1
+
+
+def _sanitize(values: dict) -> dict:
+    """Mantém só parâmetros conhecidos, convertidos para o tipo certo."""
+    return {
+        k: TUNABLE_PARAMS[k](v)
+        for k, v in values.items()
+        if k in TUNABLE_PARAMS and v is not None
+    }
+
+
+def _file_profiles() -> Dict[str, dict]:
+    try:
+        mtime = os.path.getmtime(PROFILES_FILE)
+    except OSError:
+        return {}
+    with _lock:
+        if _file_cache["mtime"] != mtime:
+            try:
+                with open(PROFILES_FILE, encoding="utf-8") as fh:
+                    data = json.load(fh)
+                _file_cache["profiles"] = {
+                    name: _sanitize(p.get("params", p))
+                    for name, p in data.get("profiles", {}).items()
+                }
+            except Exception as e:
+                print(f"[PY CAM] Erro ao ler perfis de {PROFILES_FILE}: {e}")
+                _file_cache["profiles"] = {}
+            _file_cache["mtime"] = mtime
+        return dict(_file_cache["profiles"])
+
+
+def available_profiles() -> Dict[str, dict]:
+    """Todos os perfis (embutidos + arquivo do tuner), já resolvidos sobre a base."""
+    merged = dict(BUILTIN_PROFILES)
+    merged.update(_file_profiles())
+    return {name: {**BASE_PARAMS, **overrides} for name, overrides in merged.items()}
+
+
+def resolve_profile(name: Optional[str]) -> Optional[dict]:
+    """Parâmetros completos do perfil ``name`` (None/"" = default); None se não existir."""
+    return available_profiles().get(name or DEFAULT_PROFILE)
+
+
+def apply_params(params, values: dict) -> None:
+    """Copia ``values`` para um ``cv2.aruco.DetectorParameters``."""
+    for key, value in values.items():
+        setattr(params, key, value)
@@ -0,0 +1,138 @@
+"""
+Fila de despacho não-bloqueante para envios ao backend Java.
+
+O loop de captura apenas enfileira detecções (``submit`` nunca espera I/O de rede);
+um pool de threads em background drena a fila chamando o ``handler`` configurado.
+
+Políticas de overflow (fila cheia):
+- ``drop_oldest`` : descarta o item mais antigo para abrir espaço ao novo
+- ``coalesce``    : itens com a mesma chave (ex.: tag_id) são fundidos enquanto
+                    aguardam envio; se a fila lotar, o mais antigo é descartado
+"""
+
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+POLICIES = ("drop_oldest", "coalesce")
+
+
+class DispatchQueue:
+    """Fila limitada em memória drenada por um pool de workers em background."""
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Any],
+        maxsize: int = 256,
+        workers: int = 2,
+        policy: str = "coalesce",
+        name: str = "dispatch",
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Política inválida: {policy} (use {', '.join(POLICIES)})")
+        self.handler = handler
+        self.maxsize = max(1, int(maxsize))
+        self.num_workers = max(1, int(workers))
+        self.policy = policy
+        self.name = name
+
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._in_flight = 0
+
+        # contadores expostos em stats()
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    # ------------------------------------------------------------------ produtor
+    def submit(self, item: Any, key: Optional[Hashable] = None) -> bool:
+        """Enfileira ``item`` sem bloquear. Retorna False se algo foi descartado."""
+        with self._cond:
+            if self.policy == "coalesce" and key is not None and key in self._items:
+                # mantém a posição original na fila, atualiza só o conteúdo
+                self._items[key] = item
+                self.coalesced += 1
+                return True
+
+            accepted = True
+            if len(self._items) >= self.maxsize:
+                self._items.popitem(last=False)
+                self.dropped += 1
+                accepted = False
+
+            if self.policy != "coalesce" or key is None:
+                key = ("seq", next(self._seq))
+            self._items[key] = item
+            self.enqueued += 1
+            self._cond.notify()
+            return accepted
+
+    # ------------------------------------------------------------------ workers
+    def start(self) -> None:
+        """Inicia o pool de workers (idempotente)."""
+        # cria as threads com o lock: dois start() simultâneos não sobem dois pools
+        with self._cond:
+            self._stopping = False
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.num_workers):
+                t = threading.Thread(
+                    target=self._worker, name=f"{self.name}-{i}", daemon=True
+                )
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Sinaliza parada; workers terminam após esvaziar a fila ou no timeout."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = [t for t in self._threads if t.is_alive()]
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._items and not self._stopping:
+                    self._cond.wait()
+                if not self._items:
+                    return
+                _key, item = self._items.popitem(last=False)
+                self._in_flight += 1
+            try:
+                self.handler(item)
+            except Exception as e:
+                with self._cond:
+                    self.errors += 1
+                print(f"[PY CAM] Erro no worker {self.name}: {e}")
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self.processed += 1
+
+    # ------------------------------------------------------------------ métricas
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "in_flight": self._in_flight,
+                "workers": sum(1 for t in self._threads if t.is_alive()),
+                "enqueued": self.enqueued,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+            }
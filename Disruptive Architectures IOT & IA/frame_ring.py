@@ -0,0 +1,162 @@
+"""
+Ring de buffers de frame pré-alocados entre a captura e os consumidores.
+
+O loop de captura lê (``cap.read(buf)``) direto num slot livre do ring, desenha o overlay
+no próprio buffer e faz ``commit``. Consumidores recebem ``FrameRef``: uma view somente
+leitura com contagem de referências e número de geração. Um slot só é reutilizado pela
+captura quando ninguém mais o referencia, então não há cópia de frame por consumidor e a
+memória fica fixa em ``slots`` frames, independente de quantos consumidores existam.
+"""
+
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class FrameRef:
+    """Referência somente leitura a um frame do ring (libere com ``release``)."""
+
+    __slots__ = ("_ring", "slot", "generation", "array", "_released")
+
+    def __init__(self, ring: Optional["FrameRing"], slot: int, generation: int, array):
+        self._ring = ring
+        self.slot = slot
+        self.generation = generation
+        self.array = array
+        self._released = False
+
+    @classmethod
+    def wrap(cls, array) -> "FrameRef":
+        """Embrulha um array avulso (fora de ring) na mesma interface."""
+        view = array.view()
+        view.flags.writeable = False
+        return cls(None, -1, 0, view)
+
+    def retain(self) -> "FrameRef":
+        """Nova referência ao mesmo frame (cada uma deve ser liberada)."""
+        if self._ring is not None:
+            self._ring._retain(self.slot)
+        return FrameRef(self._ring, self.slot, self.generation, self.array)
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self._ring is not None:
+            self._ring._release(self.slot)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    def __enter__(self) -> "FrameRef":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class FrameRing:
+    """Pool fixo de buffers reaproveitados em anel pela captura."""
+
+    def __init__(self, slots: int = 4):
+        n = max(2, int(slots))
+        self._bufs: List[Optional[np.ndarray]] = [None] * n
+        self._views: List[Optional[np.ndarray]] = [None] * n
+        self._refs = [0] * n
+        self._gens = [0] * n
+        self._latest = -1
+        self._writing = -1
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.allocations = 0  # buffers (re)alocados: deve estabilizar em ``slots``
+        self.stalls = 0  # vezes que não havia slot livre para a captura
+
+    @property
+    def slots(self) -> int:
+        return len(self._bufs)
+
+    # ------------------------------------------------------------------ captura
+    def acquire_write(self) -> Optional[Tuple[int, Optional[np.ndarray]]]:
+        """Reserva um slot livre para escrita. Retorna (slot, buffer) ou None se todos
+        estiverem em uso (o chamador deve descartar o frame)."""
+        with self._lock:
+            n = len(self._bufs)
+            for step in range(1, n + 1):
+                i = (self._latest + step) % n
+                if i != self._latest and i != self._writing and self._refs[i] == 0:
+                    self._writing = i
+                    return i, self._bufs[i]
+            self.stalls += 1
+            return None
+
+    def commit(self, slot: int, array: np.ndarray) -> FrameRef:
+        """Publica o slot escrito como frame mais recente e devolve uma referência a ele.
+
+        ``array`` é o retorno de ``cap.read(buf)``: normalmente o próprio buffer do slot;
+        se o tamanho mudou (ou é o primeiro frame) ele passa a ser o buffer do slot.
+        """
+        with self._lock:
+            if self._bufs[slot] is not array:
+                self._bufs[slot] = array
+                view = array.view()
+                view.flags.writeable = False
+                self._views[slot] = view
+                self.allocations += 1
+            self._generation += 1
+            self._gens[slot] = self._generation
+            self._latest = slot
+            self._writing = -1
+            self._refs[slot] += 1
+            return FrameRef(self, slot, self._generation, self._views[slot])
+
+    def abort(self, slot: int) -> None:
+        """Devolve um slot reservado sem publicá-lo (ex.: falha no read)."""
+        with self._lock:
+            if self._writing == slot:
+                self._writing = -1
+
+    def reset(self) -> None:
+        """Esquece o frame mais recente (buffers continuam alocados para reuso)."""
+        with self._lock:
+            self._latest = -1
+
+    # ------------------------------------------------------------------ consumidores
+    def latest(self) -> Optional[FrameRef]:
+        """Referência ao frame mais recente, ou None se ainda não houver frame."""
+        with self._lock:
+            if self._latest < 0:
+                return None
+            slot = self._latest
+            self._refs[slot] += 1
+            return FrameRef(self, slot, self._gens[slot], self._views[slot])
+
+    def has_frame(self) -> bool:
+        return self._latest >= 0
+
+    @property
+    def shape(self):
+        with self._lock:
+            if self._latest < 0:
+                return None
+            return self._bufs[self._latest].shape
+
+    def _retain(self, slot: int) -> None:
+        with self._lock:
+            self._refs[slot] += 1
+
+    def _release(self, slot: int) -> None:
+        with self._lock:
+            self._refs[slot] = max(0, self._refs[slot] - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slots": len(self._bufs),
+                "generation": self._generation,
+                "in_use": sum(1 for r in self._refs if r > 0),
+                "allocations": self.allocations,
+                "stalls": self.stalls,
+            }
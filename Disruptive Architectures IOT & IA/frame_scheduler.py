@@ -0,0 +1,142 @@
+"""
+Agendador de frames do loop de captura (substitui o ``time.sleep`` fixo).
+
+A cada iteração mede quanto o frame levou (leitura + detecção + overlay) e dorme só o
+que sobra do período do FPS alvo. Quando o processamento fica para trás — o frame
+estourou o orçamento de latência ou o loop perdeu um ou mais períodos — pede ao loop
+para descartar frames (``grab`` sem processar) e reancora o relógio, em vez de tentar
+"recuperar" processando frames velhos.
+
+``target_fps=0`` desliga o limite (roda tão rápido quanto a fonte entregar). Replays
+ritmados passam o FPS deles em ``reset(source_fps=...)`` (ver
+``FrameSource.take_pacing``): o período passa a ser o do menor dos dois, e a fonte não
+dorme por conta própria. Replays sem ritmo (``realtime=False``, para benchmark) passam
+``reset(unpaced=True)``: o alvo não vale para eles, o loop não dorme e nenhum frame é
+descartado, então cada frame da fonte é processado o mais rápido possível.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+class FrameScheduler:
+    """Ritmo do loop de captura com FPS alvo, orçamento de latência e descarte."""
+
+    def __init__(
+        self,
+        target_fps: float = 30.0,
+        latency_budget_s: float = 0.1,
+        max_skip: int = 5,
+        window_s: float = 2.0,
+    ):
+        self.target_fps = max(0.0, float(target_fps))
+        self.latency_budget_s = float(latency_budget_s)
+        self.max_skip = max(0, int(max_skip))
+        self.window_s = float(window_s)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def fps(self) -> float:
+        """FPS efetivo: o alvo, limitado pelo FPS da fonte ritmada (0 = sem limite)."""
+        if self.unpaced:
+            return 0.0
+        limits = [f for f in (self.target_fps, self.source_fps) if f > 0]
+        return min(limits) if limits else 0.0
+
+    @property
+    def period(self) -> float:
+        fps = self.fps
+        return 1.0 / fps if fps > 0 else 0.0
+
+    def reset(self, source_fps: float = 0.0, unpaced: bool = False) -> None:
+        with self._lock:
+            self.source_fps = max(0.0, float(source_fps))
+            self.unpaced = bool(unpaced)  # replay sem ritmo: sem espera nem descarte
+            self._t_start: Optional[float] = None
+            self._next_due: Optional[float] = None
+            self._done = deque()  # instantes de fim dos frames recentes (FPS real)
+            self.processed = 0
+            self.skipped = 0
+            self.late = 0  # frames acima do orçamento de latência
+            self.busy_s = 0.0
+            self.slept_s = 0.0
+            self.last_busy_s = 0.0
+
+    def frame_start(self) -> None:
+        """Marca o início de uma iteração (antes da leitura do frame)."""
+        self._t_start = time.monotonic()
+        if self._next_due is None:
+            self._next_due = self._t_start
+
+    def frame_done(self) -> int:
+        """Fecha a iteração: dorme o que sobrou do período e retorna quantos frames
+        o loop deve descartar antes do próximo (0 = em dia)."""
+        now = time.monotonic()
+        busy = now - (self._t_start if self._t_start is not None else now)
+        skip = 0
+        with self._lock:
+            self.processed += 1
+            self.busy_s += busy
+            self.last_busy_s = busy
+            self._done.append(now)
+            while self._done and now - self._done[0] > self.window_s:
+                self._done.popleft()
+            over_budget = busy > self.latency_budget_s
+            if over_budget:
+                self.late += 1
+
+            period = self.period
+            if period:
+                self._next_due += period
+                lag = now - self._next_due
+                if lag > 0:
+                    # atrasado: descarta os períodos perdidos e reancora no agora
+                    missed = int(lag // period)
+                    if over_budget or missed:
+                        skip = min(self.max_skip, max(1, missed))
+                    self._next_due = now
+            elif over_budget and not self.unpaced:
+                skip = min(self.max_skip, 1)
+            wait = self._next_due - now if period else 0.0
+        if wait > 0:
+            time.sleep(wait)
+            with self._lock:
+                self.slept_s += wait
+        return skip
+
+    def note_skipped(self, n: int) -> None:
+        with self._lock:
+            self.skipped += n
+
+    def actual_fps(self) -> Optional[float]:
+        with self._lock:
+            if len(self._done) < 2:
+                return None
+            span = self._done[-1] - self._done[0]
+            return (len(self._done) - 1) / span if span > 0 else None
+
+    def stats(self) -> dict:
+        fps = self.actual_fps()
+        with self._lock:
+            avg_busy = self.busy_s / self.processed if self.processed else None
+            return {
+                "target_fps": self.target_fps or None,
+                "source_fps": self.source_fps or None,
+                "unpaced": self.unpaced,
+                "actual_fps": round(fps, 2) if fps else None,
+                "latency_budget_ms": round(self.latency_budget_s * 1000, 1),
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "late": self.late,
+                "avg_busy_ms": round(avg_busy * 1000, 2) if avg_busy else None,
+                "last_busy_ms": round(self.last_busy_s * 1000, 2),
+                # fração do período gasta processando (>1 = não dá conta do alvo)
+                "utilization": (
+                    round(avg_busy / self.period, 3)
+                    if avg_busy and self.period
+                    else None
+                ),
+            }
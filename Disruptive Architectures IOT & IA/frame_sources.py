@@ -0,0 +1,647 @@
+"""
+Fontes de frame intercambiáveis para o loop de captura.
+
+Todas imitam a parte do ``cv2.VideoCapture`` que os loops usam (``isOpened``,
+``read(buf)``, ``grab``, ``release``), então o pipeline roda igual com:
+
+- ``DeviceSource``:      câmera física (índice do dispositivo)
+- ``VideoFileSource``:   arquivo de vídeo gravado
+- ``ImageFolderSource``: pasta de imagens (ordem alfabética)
+- ``SyntheticSource``:   cenas sintéticas com marcadores (bench_corpus), sem hardware
+
+Replays (vídeo, pasta, sintético) podem ser ritmados no FPS da fonte
+(``realtime=True``) ou rodar o mais rápido possível (``realtime=False``), para medir
+throughput numa máquina Linux sem câmera. Um loop que já tem agendador próprio (o
+FrameScheduler do serviço) chama ``take_pacing()``: a fonte para de dormir no ``read``
+e devolve o FPS que o agendador deve respeitar, para o ritmo ficar num lugar só.
+Sem ``loop``, a fonte fica ``exhausted`` ao acabar e o loop de captura encerra.
+
+``open_source`` aceita um descritor: int (câmera), "synthetic", caminho de arquivo
+ou pasta, ou dict {"type": "device"|"video"|"images"|"synthetic", ...}.
+
+Fontes ao vivo (câmera) podem ser envolvidas por ``LatestFrameGrabber``
+(``open_source(..., latest_only=True)``): uma thread faz ``grab()`` contínuo e o
+driver nunca acumula frames, então quem lê recebe sempre o frame mais recente, mesmo
+quando a detecção é mais lenta que a câmera. ``last_frame_ts`` (``time.monotonic``)
+marca quando o frame entregue foi capturado, para medir a idade do frame processado.
+"""
+
+import os
+import threading
+import time
+from typing import List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+SOURCE_TYPES = ("device", "video", "images", "synthetic")
+DEFAULT_SYNTHETIC_FRAMES = 60
+DEFAULT_SYNTHETIC_SIZE = (1280, 720)
+# o corpus sintético é gerado inteiro na memória: limites por descritor
+MAX_SYNTHETIC_FRAMES = 600
+MAX_SYNTHETIC_SIZE = (4096, 4096)
+MAX_SYNTHETIC_BYTES = 2 * 1024**3  # frames x largura x altura x 3 (BGR)
+
+
+class FrameSource:
+    """Base: contagem de frames, ritmo de replay e cópia para o buffer do ring."""
+
+    kind = "source"
+    live = False  # câmera ao vivo (o driver acumula frames se o leitor atrasar)
+    always_fresh = False  # read() já descarta frames velhos (LatestFrameGrabber)
+
+    def __init__(self, fps: float = 30.0, realtime: bool = True, loop: bool = False):
+        self.fps = float(fps) if fps and fps > 0 else 30.0
+        self.realtime = bool(realtime)
+        self.paced_by_caller = False  # take_pacing(): quem lê dorme, não o read
+        self.loop = bool(loop)
+        self.exhausted = False
+        self.frames_read = 0
+        self.last_frame_ts: Optional[float] = (
+            None  # monotonic da captura do último frame
+        )
+        self._next_due: Optional[float] = None
+
+    @property
+    def description(self) -> str:
+        return self.kind
+
+    def isOpened(self) -> bool:  # pylint: disable=invalid-name
+        return True
+
+    def release(self) -> None:
+        pass
+
+    @property
+    def unpaced(self) -> bool:
+        """Replay sem ritmo (``realtime=False``): deve rodar o mais rápido possível."""
+        return not self.realtime and not self.live
+
+    def take_pacing(self) -> float:
+        """Passa o ritmo do replay para quem chama (o ``read`` deixa de dormir).
+        Retorna o FPS a respeitar, ou 0 se a fonte não é ritmada. ``realtime``
+        continua valendo: o replay segue ritmado, só que por quem chamou."""
+        if not self.realtime or self.live:
+            return 0.0
+        self.paced_by_caller = True
+        return self.fps
+
+    def _pace(self) -> None:
+        """No modo realtime, espera até o instante do próximo frame da fonte."""
+        if not self.realtime or self.paced_by_caller:
+            return
+        now = time.monotonic()
+        if self._next_due is None or now - self._next_due > 1.0:
+            # primeiro frame ou muito atrasado: reancora em vez de tentar recuperar
+            self._next_due = now
+        elif self._next_due > now:
+            time.sleep(self._next_due - now)
+        self._next_due += 1.0 / self.fps
+
+    @staticmethod
+    def _into(buf: Optional[np.ndarray], image: np.ndarray) -> np.ndarray:
+        """Copia ``image`` para o buffer do ring (ou para um array novo, se não couber);
+        o overlay é desenhado no frame devolvido, então a imagem original não é tocada.
+        """
+        if buf is not None and buf.shape == image.shape and buf.dtype == image.dtype:
+            np.copyto(buf, image)
+            return buf
+        return image.copy()
+
+    def stats(self) -> dict:
+        return {
+            "type": self.kind,
+            "description": self.description,
+            "fps": self.fps,
+            "realtime": self.realtime,
+            "paced_by_caller": self.paced_by_caller,
+            "loop": self.loop,
+            "frames_read": self.frames_read,
+            "exhausted": self.exhausted,
+        }
+
+
+class DeviceSource(FrameSource):
+    """Câmera física; o ritmo é o do próprio dispositivo."""
+
+    kind = "device"
+    live = True
+
+    def __init__(self, index: int = 0, width: int = 1280, height: int = 720, fps=30):
+        super().__init__(fps, realtime=False)
+        self.index = int(index)
+        self.cap = cv2.VideoCapture(self.index)
+        if self.cap.isOpened():
+            self._apply_preferences(width, height)
+
+    def _apply_preferences(self, width: int, height: int) -> None:
+        """Tenta aplicar resolução e expo auto desabilitado para estabilidade (ignorando falhas)."""
+        try:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+            # Tentar desabilitar auto-exposição (valores variam por backend)
+            self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)  # DSHOW/MSMF
+        except Exception:
+            pass
+
+    @property
+    def description(self) -> str:
+        return f"câmera {self.index}"
+
+    def isOpened(self) -> bool:  # pylint: disable=invalid-name
+        return self.cap.isOpened()
+
+    def read(
+        self, buf: Optional[np.ndarray] = None
+    ) -> Tuple[bool, Optional[np.ndarray]]:
+        ok, frame = self.cap.read(buf) if buf is not None else self.cap.read()
+        if ok:
+            self.frames_read += 1
+            self.last_frame_ts = time.monotonic()
+        return ok, frame
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def retrieve(
+        self, buf: Optional[np.ndarray] = None
+    ) -> Tuple[bool, Optional[np.ndarray]]:
+        """Decodifica o último frame do ``grab`` (sem contar em frames_read)."""
+        return self.cap.retrieve(buf) if buf is not None else self.cap.retrieve()
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """Replay de um arquivo de vídeo, no FPS gravado ou sem limite."""
+
+    kind = "video"
+
+    def __init__(
+        self, path: str, realtime: bool = True, loop: bool = False, fps: float = 0
+    ):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        native = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        super().__init__(fps or native or 30.0, realtime, loop)
+
+    @property
+    def description(self) -> str:
+        return self.path
+
+    def isOpened(self) -> bool:  # pylint: disable=invalid-name
+        return self.cap.isOpened()
+
+    def read(
+        self, buf: Optional[np.ndarray] = None
+    ) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.exhausted:
+            return False, None
+        self._pace()
+        ok, frame = self.cap.read(buf) if buf is not None else self.cap.read()
+        if not ok and self.loop and self.frames_read:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read(buf) if buf is not None else self.cap.read()
+        if not ok:
+            self.exhausted = True
+            return False, None
+        self.frames_read += 1
+        self.last_frame_ts = time.monotonic()
+        return True, frame
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class _ListSource(FrameSource):
+    """Fonte baseada em uma sequência indexável de imagens BGR."""
+
+    def __init__(self, fps: float, realtime: bool, loop: bool):
+        super().__init__(fps, realtime, loop)
+        self._index = 0
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _image(self, i: int) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def isOpened(self) -> bool:  # pylint: disable=invalid-name
+        return len(self) > 0
+
+    def _advance(self) -> Optional[int]:
+        if self._index >= len(self):
+            if not self.loop or not len(self):
+                self.exhausted = True
+                return None
+            self._index = 0
+        i = self._index
+        self._index += 1
+        return i
+
+    def read(
+        self, buf: Optional[np.ndarray] = None
+    ) -> Tuple[bool, Optional[np.ndarray]]:
+        i = self._advance()
+        if i is None:
+            return False, None
+        self._pace()
+        image = self._image(i)
+        if image is None:
+            return False, None
+        self.frames_read += 1
+        self.last_frame_ts = time.monotonic()
+        return True, self._into(buf, image)
+
+    def grab(self) -> bool:
+        return self._advance() is not None
+
+
+class ImageFolderSource(_ListSource):
+    """Imagens de uma pasta em ordem alfabética (lidas do disco sob demanda)."""
+
+    kind = "images"
+
+    def __init__(
+        self, path: str, fps: float = 10.0, realtime: bool = True, loop: bool = False
+    ):
+        super().__init__(fps, realtime, loop)
+        self.path = path
+        try:
+            names = sorted(os.listdir(path))
+        except OSError:
+            names = []
+        self.files: List[str] = [
+            os.path.join(path, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+
+    @property
+    def description(self) -> str:
+        return f"{self.path} ({len(self.files)} imagens)"
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def _image(self, i: int) -> Optional[np.ndarray]:
+        image = cv2.imread(self.files[i], cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"[PY CAM] AVISO: não foi possível ler {self.files[i]}")
+        return image
+
+
+class SyntheticSource(_ListSource):
+    """Cenas sintéticas com marcadores, geradas uma vez e repetidas em laço."""
+
+    kind = "synthetic"
+
+    def __init__(
+        self,
+        fps: float = 30.0,
+        realtime: bool = True,
+        loop: bool = True,
+        frames: int = DEFAULT_SYNTHETIC_FRAMES,
+        size: Tuple[int, int] = DEFAULT_SYNTHETIC_SIZE,
+        seed: int = 42,
+        dict_name: Optional[str] = None,
+        clip_len: int = 10,
+    ):
+        super().__init__(fps, realtime, loop)
+        from bench_corpus import synthetic_corpus
+        from detection import DEFAULT_DICT_NAME
+
+        self.corpus = synthetic_corpus(
+            frames,
+            seed,
+            tuple(size),
+            dict_name or DEFAULT_DICT_NAME,
+            clip_len=clip_len,
+        )
+        self.size = tuple(size)
+
+    @property
+    def description(self) -> str:
+        return f"sintético {self.size[0]}x{self.size[1]} ({len(self.corpus)} frames)"
+
+    def __len__(self) -> int:
+        return len(self.corpus)
+
+    def _image(self, i: int) -> Optional[np.ndarray]:
+        return self.corpus[i].image
+
+
+class LatestFrameGrabber:
+    """Thread de ``grab()`` contínuo sobre uma fonte ao vivo; ``read`` entrega o frame
+    mais novo.
+
+    Só o frame pedido é decodificado (``retrieve``): os demais são descartados no
+    ``grab``, sem custo de decodificação. ``read`` espera o próximo ``grab`` terminar,
+    então o frame entregue tem no máximo um período da câmera de idade.
+
+    Cada ``read`` tem um número de pedido: um ``retrieve`` que termina depois do
+    timeout do pedido é descartado (não vira resposta de um ``read`` seguinte), e o
+    ``read`` que desistiu espera esse ``retrieve`` acabar antes de devolver o buffer ao
+    chamador, para nada ser escrito num buffer já abandonado.
+    """
+
+    always_fresh = True
+
+    def __init__(self, source: FrameSource, timeout_s: float = 1.0):
+        self.source = source
+        self.timeout_s = float(timeout_s)
+        self.exhausted = False
+        self.frames_read = 0
+        self.last_frame_ts: Optional[float] = None
+        self.grabbed = 0
+        self.grab_failures = 0
+        self._cond = threading.Condition()
+        self._request = 0  # número do último pedido de read
+        self._wanted: Optional[int] = None  # pedido esperando resposta
+        self._pending: Optional[int] = None  # pedido que o próximo grab vai atender
+        self._retrieving: Optional[int] = None  # pedido com retrieve em andamento
+        self._buf: Optional[np.ndarray] = None
+        self._result = None  # (pedido, ok, frame, ts)
+        self.late_results = 0  # retrieves descartados por chegarem após o timeout
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def kind(self) -> str:
+        return self.source.kind
+
+    @property
+    def live(self) -> bool:
+        return self.source.live
+
+    @property
+    def description(self) -> str:
+        return self.source.description
+
+    def isOpened(self) -> bool:  # pylint: disable=invalid-name
+        return self.source.isOpened()
+
+    @property
+    def unpaced(self) -> bool:
+        return False
+
+    def take_pacing(self) -> float:
+        return 0.0  # fonte ao vivo: o ritmo é o da câmera
+
+    def _start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._grab_loop, name="grabber", daemon=True
+        )
+        self._thread.start()
+
+    def _grab_loop(self) -> None:
+        src = self.source
+        while self._running:
+            ok = src.grab()
+            ts = time.monotonic()
+            with self._cond:
+                request, self._pending = self._pending, None
+                if not ok:
+                    self.grab_failures += 1
+                    if request is not None:
+                        self._result = (request, False, None, ts)
+                    self._cond.notify_all()
+                else:
+                    self.grabbed += 1
+                    buf = self._buf
+                    self._retrieving = request
+                    self._cond.notify_all()  # acorda grab() de quem está descartando
+                    if request is None:
+                        continue
+            if not ok:
+                time.sleep(0.01)
+                continue
+            # decodifica fora do lock: o leitor só espera, o próximo grab vem depois
+            ok, frame = src.retrieve(buf)
+            with self._cond:
+                self._retrieving = None
+                if request == self._wanted:
+                    self._result = (request, ok, frame, ts)
+                else:
+                    self.late_results += 1  # o read desistiu: descarta
+                self._cond.notify_all()
+
+    def read(
+        self, buf: Optional[np.ndarray] = None
+    ) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._running:
+            self._start()
+        with self._cond:
+            self._request += 1
+            request = self._wanted = self._pending = self._request
+            self._buf = buf
+            self._result = None
+            self._cond.wait_for(
+                lambda: self._result is not None and self._result[0] == request,
+                self.timeout_s,
+            )
+            result, self._result = self._result, None
+            self._wanted = None
+            if self._pending == request:
+                self._pending = None
+            if result is None:
+                # timeout: não devolve o buffer com um retrieve dele em andamento
+                self._cond.wait_for(
+                    lambda: self._retrieving != request, self.timeout_s
+                )
+        if result is None or not result[1]:
+            return False, None
+        _request, ok, frame, ts = result
+        self.frames_read += 1
+        self.last_frame_ts = ts
+        return ok, frame
+
+    def grab(self) -> bool:
+        """Descarta um frame: espera o próximo ``grab`` da thread."""
+        if not self._running:
+            self._start()
+        with self._cond:
+            seen = self.grabbed
+            return self._cond.wait_for(lambda: self.grabbed != seen, self.timeout_s)
+
+    def release(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout_s + 1.0)
+        self.source.release()
+
+    def stats(self) -> dict:
+        out = self.source.stats()
+        out["frames_read"] = self.frames_read
+        out["grabber"] = {
+            "grabbed": self.grabbed,
+            # frames que a câmera entregou e ninguém processou (antes: lag no driver)
+            "discarded": max(0, self.grabbed - self.frames_read),
+            "grab_failures": self.grab_failures,
+            "late_results": self.late_results,
+        }
+        return out
+
+
+def _resolve_media_path(path, media_root: Optional[str], allow_paths: bool) -> str:
+    """Caminho de vídeo/pasta; com ``media_root``, só o que resolve dentro dele."""
+    if not allow_paths:
+        raise ValueError("Fontes de arquivo desativadas (configure MEDIA_ROOT)")
+    if not isinstance(path, str) or not path:
+        raise ValueError(f"Caminho inválido: {path!r}")
+    if media_root is None:
+        return path
+    root = os.path.realpath(media_root)
+    # relativo ao media_root; realpath resolve ".." e links simbólicos antes da checagem
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Caminho fora de MEDIA_ROOT: {path}")
+    return resolved
+
+
+def parse_descriptor(
+    descriptor: Union[None, int, str, dict],
+    media_root: Optional[str] = None,
+    allow_paths: bool = True,
+) -> dict:
+    """Normaliza o descritor para um dict com "type" (ValueError se inválido).
+
+    ``media_root`` restringe fontes de vídeo/pasta a caminhos dentro dele (relativos
+    a ele); com ``allow_paths=False`` elas são recusadas.
+    """
+    if descriptor is None:
+        return {"type": "device", "index": 0}
+    if isinstance(descriptor, bool):
+        raise ValueError("Fonte inválida")
+    if isinstance(descriptor, int):
+        return {"type": "device", "index": descriptor}
+    if isinstance(descriptor, str):
+        if descriptor.isdigit():
+            return {"type": "device", "index": int(descriptor)}
+        if descriptor == "synthetic":
+            return {"type": "synthetic"}
+        path = _resolve_media_path(descriptor, media_root, allow_paths)
+        if os.path.isdir(path):
+            return {"type": "images", "path": path}
+        if os.path.isfile(path):
+            return {"type": "video", "path": path}
+        raise ValueError(f"Fonte não encontrada: {descriptor}")
+    if isinstance(descriptor, dict):
+        kind = descriptor.get("type")
+        if kind not in SOURCE_TYPES:
+            raise ValueError(
+                f"Tipo de fonte inválido: {kind} (use {', '.join(SOURCE_TYPES)})"
+            )
+        d = dict(descriptor)
+        if kind in ("video", "images"):
+            if not d.get("path"):
+                raise ValueError(f"Fonte {kind} exige 'path'")
+            d["path"] = _resolve_media_path(d["path"], media_root, allow_paths)
+            if media_root is not None and not os.path.exists(d["path"]):
+                raise ValueError(f"Fonte não encontrada: {descriptor['path']}")
+        return _validate_fields(d)
+    raise ValueError("Fonte inválida")
+
+
+def _as_int(d: dict, key: str, minimum: int, maximum: Optional[int] = None) -> None:
+    value = d.get(key)
+    if value is None:
+        return
+    try:
+        if isinstance(value, bool) or float(value) != int(value):
+            raise ValueError
+        d[key] = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"'{key}' deve ser inteiro: {value!r}") from None
+    if d[key] < minimum:
+        raise ValueError(f"'{key}' deve ser >= {minimum}: {value!r}")
+    if maximum is not None and d[key] > maximum:
+        raise ValueError(f"'{key}' deve ser <= {maximum}: {value!r}")
+
+
+def _validate_fields(d: dict) -> dict:
+    """Converte os campos opcionais do descritor dict (ValueError se inválidos), para
+    que um /start malformado falhe na requisição e não dentro da thread de captura."""
+    _as_int(d, "index", 0)
+    _as_int(d, "frames", 1, MAX_SYNTHETIC_FRAMES)
+    _as_int(d, "seed", 0)
+    if d.get("fps") is not None:
+        try:
+            d["fps"] = float(d["fps"])
+        except (TypeError, ValueError):
+            raise ValueError(f"'fps' deve ser número: {d['fps']!r}") from None
+        if not 0 <= d["fps"] <= 1000:
+            raise ValueError(f"'fps' fora do intervalo 0..1000: {d['fps']!r}")
+    for key in ("realtime", "loop"):
+        if key in d and not isinstance(d[key], bool):
+            raise ValueError(f"'{key}' deve ser true/false: {d[key]!r}")
+    if d.get("size") is not None:
+        size = d["size"]
+        try:
+            if isinstance(size, (str, bytes)) or len(size) != 2:
+                raise ValueError
+            if any(isinstance(v, bool) for v in size):
+                raise ValueError
+            width, height = (int(v) for v in size)
+            if width <= 0 or height <= 0:
+                raise ValueError
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(
+                f"'size' deve ser [largura, altura] positivos: {size!r}"
+            ) from None
+        max_w, max_h = MAX_SYNTHETIC_SIZE
+        if width > max_w or height > max_h:
+            raise ValueError(f"'size' deve ser no máximo {max_w}x{max_h}: {size!r}")
+        d["size"] = (width, height)
+    if d["type"] == "synthetic":
+        width, height = d.get("size") or DEFAULT_SYNTHETIC_SIZE
+        frames = d.get("frames") or DEFAULT_SYNTHETIC_FRAMES
+        if frames * width * height * 3 > MAX_SYNTHETIC_BYTES:
+            raise ValueError(
+                f"Corpus sintético grande demais: {frames} frames de {width}x{height} "
+                f"(máximo {MAX_SYNTHETIC_BYTES // 1024**2} MB)"
+            )
+    if d.get("dict") is not None:
+        from detection import DICT_MAP
+
+        if d["dict"] not in DICT_MAP:
+            raise ValueError(
+                f"Dicionário inválido: {d['dict']!r} (use {', '.join(DICT_MAP)})"
+            )
+    return d
+
+
+def open_source(
+    descriptor: Union[None, int, str, dict], latest_only: bool = False
+) -> Union[FrameSource, LatestFrameGrabber]:
+    """Cria a fonte descrita por ``descriptor`` (ver parse_descriptor).
+
+    Com ``latest_only``, fontes ao vivo vêm envolvidas por ``LatestFrameGrabber``.
+    """
+    d = parse_descriptor(descriptor)
+    kind = d["type"]
+    realtime = bool(d.get("realtime", True))
+    loop = bool(d.get("loop", kind == "synthetic"))
+    if kind == "device":
+        device = DeviceSource(int(d.get("index", 0)))
+        if latest_only and device.isOpened():
+            return LatestFrameGrabber(device)
+        return device
+    if kind == "video":
+        return VideoFileSource(d["path"], realtime, loop, float(d.get("fps", 0)))
+    if kind == "images":
+        return ImageFolderSource(d["path"], float(d.get("fps", 10)), realtime, loop)
+    return SyntheticSource(
+        float(d.get("fps", 30)),
+        realtime,
+        loop,
+        frames=int(d.get("frames", DEFAULT_SYNTHETIC_FRAMES)),
+        size=tuple(d.get("size", DEFAULT_SYNTHETIC_SIZE)),
+        seed=int(d.get("seed", 42)),
+        dict_name=d.get("dict"),
+    )
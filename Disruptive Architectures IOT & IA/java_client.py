@@ -0,0 +1,214 @@
+"""
+Cliente HTTP compartilhado para a API Java (Spring Boot).
+
+- Uma única ``requests.Session`` com pool de conexões keep-alive (tamanho configurável),
+  evitando abrir uma conexão TCP nova a cada tag enviada.
+- Login JWT com leitura do ``exp`` do token e renovação em background antes de expirar.
+- Em caso de 401, reloga e repete a requisição uma única vez (a detecção não é perdida).
+- Circuit breaker (circuit_breaker.py) compartilhado pelo login e por todas as
+  requisições: com o backend fora do ar as chamadas falham na hora com
+  ``CircuitOpenError`` em vez de esperar o timeout.
+"""
+
+import base64
+import json
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+MIN_REFRESH_INTERVAL_S = 5.0  # no máximo um login proativo a cada 5 s
+
+
+def jwt_expiry(token: Optional[str]) -> Optional[float]:
+    """Extrai o ``exp`` (epoch em segundos) do payload de um JWT, sem validar assinatura."""
+    if not token:
+        return None
+    try:
+        payload_b64 = token.split(".")[1]
+        payload_b64 += "=" * (-len(payload_b64) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(payload_b64))
+        exp = payload.get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
+
+class JavaApiClient:
+    """Sessão HTTP com pool keep-alive e gerenciamento automático do token JWT."""
+
+    def __init__(
+        self,
+        base_url: str,
+        email: str,
+        senha: str,
+        timeout: float = 8,
+        pool_size: int = 4,
+        refresh_margin_s: float = 60.0,
+        login_url: Optional[str] = None,
+        log_prefix: str = "[PY CAM]",
+        breaker_failures: int = 5,
+        breaker_reset_s: float = 15.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.login_url = login_url or f"{self.base_url}/api/login"
+        self.email = email
+        self.senha = senha
+        self.timeout = timeout
+        self.pool_size = max(1, int(pool_size))
+        self.refresh_margin_s = refresh_margin_s
+        self.log_prefix = log_prefix
+        self.breaker = CircuitBreaker(
+            breaker_failures, breaker_reset_s, on_change=self._log_breaker
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, pool_block=False
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"Content-Type": "application/json", "Accept": "application/json"}
+        )
+
+        self._token: Optional[str] = None
+        self._token_exp: Optional[float] = None
+        self._login_at = float("-inf")  # time.monotonic() do último login bem-sucedido
+        self._login_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_wakeup = threading.Event()
+
+        self.logins = 0
+        self.retries_after_401 = 0
+
+    def _log_breaker(self, previous: str, state: str) -> None:
+        print(f"{self.log_prefix} Circuit breaker do backend: {previous} -> {state}")
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Uma requisição passando pelo breaker: rede/timeout/5xx contam como falha."""
+        self.breaker.check()
+        try:
+            r = self.session.request(method, url, **kwargs)
+        except Exception:
+            # inclui timeout/erro de rede; também libera a vaga de prova do meio-aberto
+            self.breaker.record_failure()
+            raise
+        if r.status_code >= 500 and r.status_code != 501:  # 501: endpoint ausente
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return r
+
+    # ------------------------------------------------------------------ token
+    @property
+    def token(self) -> Optional[str]:
+        return self._token
+
+    @property
+    def token_expires_in(self) -> Optional[float]:
+        if self._token_exp is None:
+            return None
+        return self._token_exp - time.time()
+
+    def login(self) -> Optional[str]:
+        """Faz login e guarda o token. Chamadas concorrentes compartilham o mesmo login."""
+        stale = self._token
+        with self._login_lock:
+            if self._token is not None and self._token != stale:
+                # outra thread já renovou enquanto esperávamos o lock
+                return self._token
+            try:
+                r = self._send(
+                    "POST",
+                    self.login_url,
+                    json={"email": self.email, "senha": self.senha},
+                    timeout=self.timeout,
+                )
+                if r.ok:
+                    token = r.json().get("tokenAcesso")
+                    self._token = token
+                    self._token_exp = jwt_expiry(token)
+                    self._login_at = time.monotonic()
+                    self.logins += 1
+                    self._refresh_wakeup.set()
+                    return token
+                print(
+                    f"{self.log_prefix} Falha login Java: {r.status_code} {r.text[:200]}"
+                )
+            except CircuitOpenError:
+                pass  # backend fora: o refresher tenta de novo quando o circuito reabrir
+            except Exception as e:
+                print(f"{self.log_prefix} Erro login Java: {e}")
+            return None
+
+    def start_refresher(self) -> None:
+        """Inicia (idempotente) a thread que loga e renova o token antes do ``exp``."""
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="jwt-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self._refresh_wakeup.clear()
+            if self._token is None:
+                if self.login() is None:
+                    self._refresh_wakeup.wait(5.0)  # backend fora: tenta de novo
+                continue
+            expires_in = self.token_expires_in
+            if expires_in is None:
+                # token sem exp: só renovamos reativamente (401)
+                self._refresh_wakeup.wait(300.0)
+                continue
+            # token com vida <= margem (ou relógio do backend adiantado): renova na
+            # metade da vida (até 30 s antes), nunca em laço logo após outro login
+            wait_s = max(
+                expires_in - self.refresh_margin_s,
+                min(30.0, expires_in / 2),
+                MIN_REFRESH_INTERVAL_S - (time.monotonic() - self._login_at),
+            )
+            if wait_s > 0:
+                # acorda antes se outro login (ex.: após 401) trocar o token
+                if self._refresh_wakeup.wait(wait_s):
+                    continue
+            if self.login() is None:
+                self._refresh_wakeup.wait(5.0)
+
+    # ------------------------------------------------------------------ requisições
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Executa a requisição com o token atual; em 401 reloga e repete uma vez."""
+        kwargs.setdefault("timeout", self.timeout)
+        r = self._send(method, url, headers=self._auth_headers(), **kwargs)
+        if r.status_code == 401:
+            print(f"{self.log_prefix} 401 - relogando e repetindo requisição...")
+            if self.login() is not None:
+                self.retries_after_401 += 1
+                r = self._send(method, url, headers=self._auth_headers(), **kwargs)
+        return r
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def _auth_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self._token}"} if self._token else {}
+
+    def stats(self) -> dict:
+        expires_in = self.token_expires_in
+        return {
+            "has_token": self._token is not None,
+            "token_expires_in_s": round(expires_in, 1) if expires_in is not None else None,
+            "pool_size": self.pool_size,
+            "logins": self.logins,
+            "retries_after_401": self.retries_after_401,
+            "circuit": self.breaker.stats(),
+        }
@@ -0,0 +1,179 @@
+"""
+Teste de carga de /stream: abre centenas de espectadores MJPEG simultâneos e mede
+quantos frames cada um recebe.
+
+Sobe o serviço (de preferência preso a um núcleo) e dispara os clientes:
+
+    SERVER_MODE=asyncio taskset -c 0 python camera_web_service.py
+    python load_test_stream.py --start synthetic --clients 300 --duration 20
+
+Cada cliente é uma corrotina com socket próprio que só conta as partes do multipart
+(``--frame``). Ao final imprime FPS por cliente (mín/mediana/média), banda total, erros
+e, com ``--server-pid``, o uso de CPU do servidor no período. Sai com código 1 se a
+média por cliente ficar abaixo de ``--min-fps`` ou se algum cliente falhar.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+BOUNDARY = b"--frame\r\n"
+
+
+class ClientResult:
+    __slots__ = ("frames", "bytes", "first_frame_s", "elapsed_s", "error")
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.first_frame_s: Optional[float] = None
+        self.elapsed_s = 0.0  # tempo conectado
+        self.error: Optional[str] = None
+
+
+async def viewer(host: str, port: int, target: str, stop_at: float) -> ClientResult:
+    """Um espectador: GET no stream e conta frames até ``stop_at``."""
+    result = ClientResult()
+    t0 = time.monotonic()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        result.error = f"connect: {e}"
+        return result
+    try:
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = head.split(b" ", 2)[1]
+        if status != b"200":
+            result.error = f"HTTP {status.decode()}"
+            return result
+        tail = b""
+        while True:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(65536), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                result.error = "conexão fechada pelo servidor"
+                break
+            result.bytes += len(chunk)
+            # a fronteira pode vir partida entre dois reads
+            data = tail + chunk
+            found = data.count(BOUNDARY)
+            if found and result.first_frame_s is None:
+                result.first_frame_s = time.monotonic() - t0
+            result.frames += found
+            tail = data[-(len(BOUNDARY) - 1) :]
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+        result.error = str(e) or type(e).__name__
+    finally:
+        result.elapsed_s = time.monotonic() - t0
+        writer.close()
+    return result
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """utime + stime do processo (Linux, /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _post_start(base_url: str, source: str) -> None:
+    try:
+        source = json.loads(source)  # descritor completo, ex.: '{"type": ...}'
+    except ValueError:
+        pass  # "synthetic", índice da câmera ou caminho
+    body = json.dumps({"source": source}).encode()
+    req = Request(
+        f"{base_url}/start", body, headers={"Content-Type": "application/json"}
+    )
+    with urlopen(req, timeout=10) as resp:
+        print(f"POST /start -> {resp.status} {resp.read().decode().strip()}")
+
+
+async def run(args) -> List[ClientResult]:
+    url = urlsplit(args.url)
+    target = url.path + (f"?{url.query}" if url.query else "")
+    stop_at = time.monotonic() + args.ramp + args.duration
+    tasks = []
+    for i in range(args.clients):
+        tasks.append(
+            asyncio.create_task(viewer(url.hostname, url.port or 80, target, stop_at))
+        )
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.clients)
+    return await asyncio.gather(*tasks)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:5001/stream?w=320&q=50")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0, help="segundos")
+    parser.add_argument(
+        "--ramp", type=float, default=2.0, help="segundos para abrir todos os clientes"
+    )
+    parser.add_argument(
+        "--start",
+        metavar="SOURCE",
+        help='faz POST /start com {"source": SOURCE} antes (ex.: synthetic ou JSON)',
+    )
+    parser.add_argument("--server-pid", type=int, help="mede a CPU deste processo")
+    parser.add_argument(
+        "--min-fps", type=float, default=0.0, help="FPS médio mínimo por cliente"
+    )
+    args = parser.parse_args(argv)
+
+    if args.start:
+        url = urlsplit(args.url)
+        _post_start(f"{url.scheme}://{url.netloc}", args.start)
+        time.sleep(1.0)
+
+    cpu0 = _cpu_seconds(args.server_pid) if args.server_pid else None
+    wall0 = time.monotonic()
+    results = asyncio.run(run(args))
+    wall = time.monotonic() - wall0
+    cpu1 = _cpu_seconds(args.server_pid) if args.server_pid else None
+
+    errors = [r.error for r in results if r.error]
+    fps = sorted(r.frames / r.elapsed_s if r.elapsed_s else 0.0 for r in results)
+    total_mb = sum(r.bytes for r in results) / 1e6
+    first = [r.first_frame_s for r in results if r.first_frame_s is not None]
+
+    print(f"\nClientes:        {args.clients} ({len(errors)} com erro)")
+    print(f"Duração:         {wall:.1f} s (rampa {args.ramp:g} s)")
+    print(
+        f"FPS por cliente: mín {fps[0]:.1f} | mediana {statistics.median(fps):.1f} "
+        f"| média {statistics.mean(fps):.1f}"
+    )
+    print(f"Frames totais:   {sum(r.frames for r in results)}")
+    print(f"Banda:           {total_mb / wall:.1f} MB/s ({total_mb:.0f} MB)")
+    if first:
+        print(f"1º frame:        mediana {statistics.median(first) * 1000:.0f} ms")
+    if cpu0 is not None and cpu1 is not None:
+        print(f"CPU do servidor: {(cpu1 - cpu0) / wall * 100:.0f}% de um núcleo")
+    for error in sorted(set(errors))[:5]:
+        print(f"  erro: {error} ({errors.count(error)}x)")
+
+    if errors or statistics.mean(fps) < args.min_fps:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Métricas simples em memória (sem dependências externas).
+
+Histogramas com buckets fixos e cumulativos, no mesmo formato usado pelo Prometheus,
+para que possam ser expostos em JSON (/status) ou em texto (``render_prometheus``,
+formato de exposição 0.0.4, usado por /metrics).
+
+Observar custa um ``bisect`` e um lock sem contenção; os valores que já existem como
+atributos (contadores de frames, clientes do stream...) são lidos só na hora da coleta
+via ``CallbackMetric``, sem custo nenhum no loop de captura.
+"""
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Buckets padrão para latências em segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets padrão para tamanhos (quantidade de itens)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+# Buckets para estágios do pipeline por frame (sub-milissegundo até 1 s)
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0,
+)
+
+Labels = Optional[Dict[str, str]]
+Sample = Tuple[str, Dict[str, str], float]  # (sufixo, labels, valor)
+
+
+class Histogram:
+    """Histograma thread-safe com buckets fixos."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, buckets: Iterable[float], help: str = "", labels: Labels = None
+    ):
+        self.name = name
+        self.help = help
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # último = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        """Retorna contagem, soma, média e buckets cumulativos ({le: count})."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        acc = 0
+        for le, c in zip(self.buckets, counts):
+            acc += c
+            cumulative[_fmt_le(le)] = acc
+        cumulative["+Inf"] = acc + counts[-1]
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else None,
+            "buckets": cumulative,
+        }
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        out: List[Sample] = []
+        acc = 0
+        for le, c in zip(self.buckets + (None,), counts):
+            acc += c
+            out.append(("_bucket", {**self.labels, "le": _fmt_le(le)}, acc))
+        out.append(("_sum", self.labels, total))
+        out.append(("_count", self.labels, count))
+        return out
+
+
+class Counter:
+    """Contador monotônico thread-safe."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = "", labels: Labels = None):
+        self.name = name
+        self.help = help
+        self.labels = dict(labels or {})
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def samples(self) -> List[Sample]:
+        return [("", self.labels, self._value)]
+
+
+class CallbackMetric:
+    """Counter/gauge cujo valor é lido de uma função no momento da coleta."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        fn: Callable[[], float],
+        help: str = "",
+        labels: Labels = None,
+    ):
+        if kind not in ("counter", "gauge"):
+            raise ValueError(f"Tipo inválido: {kind}")
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = dict(labels or {})
+        self._fn = fn
+
+    def samples(self) -> List[Sample]:
+        try:
+            value = float(self._fn())
+        except Exception:
+            return []
+        return [("", self.labels, value)]
+
+
+def _fmt_le(le: Optional[float]) -> str:
+    if le is None:
+        return "+Inf"
+    return str(int(le)) if float(le).is_integer() else repr(le)
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _fmt_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus(metrics: Iterable) -> str:
+    """Renderiza métricas no formato texto do Prometheus.
+
+    Métricas com o mesmo ``name`` (ex.: um histograma por câmera/estágio) são
+    agrupadas sob um único HELP/TYPE.
+    """
+    families: Dict[str, list] = {}
+    for m in metrics:
+        families.setdefault(m.name, []).append(m)
+    lines = []
+    for name, members in families.items():
+        first = members[0]
+        if first.help:
+            help_txt = first.help.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {name} {help_txt}")
+        lines.append(f"# TYPE {name} {first.kind}")
+        for m in members:
+            for suffix, labels, value in m.samples():
+                lines.append(f"{name}{suffix}{_fmt_labels(labels)} {_fmt_value(value)}")
+    return "\n".join(lines) + "\n"
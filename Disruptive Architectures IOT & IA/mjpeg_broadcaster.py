@@ -0,0 +1,252 @@
+"""
+Broadcaster MJPEG: codifica cada frame novo em JPEG uma única vez por perfil e
+distribui para todos os clientes de /stream.
+
+- Cada frame publicado recebe um número de sequência.
+- Clientes esperam numa ``threading.Condition`` (sem polling com sleep fixo).
+- Os frames chegam como ``FrameRef`` do ring de captura: o broadcaster segura uma
+  referência ao frame atual e cada encode segura a sua, sem copiar pixels.
+- Cada cliente pede um ``StreamProfile`` (largura, qualidade JPEG, FPS máximo). O
+  JPEG de cada (largura, qualidade) é gerado sob demanda pelo primeiro cliente que
+  precisar dele e reaproveitado pelos demais do mesmo perfil; perfis diferentes
+  codificam em paralelo. O FPS só espaça os envios do cliente, então não cria
+  encode novo.
+- Clientes lentos pulam direto para o frame mais novo, sem fila.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Tuple
+
+import cv2
+
+from frame_ring import FrameRef
+from metrics import Histogram
+
+JPEG_QUALITY = 80
+MIN_WIDTH = 160
+MIN_QUALITY = 10
+MAX_QUALITY = 95
+MAX_PROFILES = 8  # perfis de encode mantidos em cache (os sem cliente saem primeiro)
+
+EncodeKey = Tuple[Optional[int], int]  # (largura ou None, qualidade)
+
+
+@dataclass(frozen=True)
+class StreamProfile:
+    """O que um cliente de /stream quer receber.
+
+    ``width`` None mantém a resolução da captura (nunca amplia); ``fps`` None envia
+    todo frame novo.
+    """
+
+    width: Optional[int] = None
+    quality: int = JPEG_QUALITY
+    fps: Optional[float] = None
+
+    @classmethod
+    def from_args(
+        cls, args: Mapping[str, str], default_quality: int = JPEG_QUALITY
+    ) -> "StreamProfile":
+        """Lê ``w``, ``q`` e ``fps`` da query string (ValueError se inválidos)."""
+        try:
+            width = int(args["w"]) if args.get("w") else None
+            quality = int(args["q"]) if args.get("q") else int(default_quality)
+            fps = float(args["fps"]) if args.get("fps") else None
+        except ValueError:
+            raise ValueError("w, q e fps devem ser numéricos") from None
+        if width is not None and width < MIN_WIDTH:
+            raise ValueError(f"w deve ser >= {MIN_WIDTH}")
+        if not MIN_QUALITY <= quality <= MAX_QUALITY:
+            raise ValueError(f"q deve estar entre {MIN_QUALITY} e {MAX_QUALITY}")
+        if fps is not None and fps <= 0:
+            raise ValueError("fps deve ser > 0")
+        return cls(width, quality, fps)
+
+    @property
+    def encode_key(self) -> EncodeKey:
+        return self.width, self.quality
+
+    @property
+    def label(self) -> str:
+        return f"{self.width or 'full'}w/q{self.quality}"
+
+
+class _Encoded:
+    """Último JPEG gerado para um (largura, qualidade)."""
+
+    __slots__ = ("seq", "jpeg", "lock", "encodes", "last_used")
+
+    def __init__(self):
+        self.seq = -1
+        self.jpeg: Optional[bytes] = None
+        self.lock = threading.Lock()  # o mesmo seq é codificado uma vez por perfil
+        self.encodes = 0
+        self.last_used = 0.0
+
+
+class FrameBroadcaster:
+    """Distribui o último frame (codificado uma vez por perfil) para N consumidores."""
+
+    def __init__(
+        self, jpeg_quality: int = JPEG_QUALITY, encode_hist: Optional[Histogram] = None
+    ):
+        self.jpeg_quality = int(jpeg_quality)
+        self.encode_hist = encode_hist  # duração de cada imencode (opcional)
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._encoded: Dict[EncodeKey, _Encoded] = {}
+        self._profile_clients: Counter = Counter()
+        self._clients = 0
+
+        self.encodes = 0
+        self.frames_served = 0
+
+    @property
+    def default_profile(self) -> StreamProfile:
+        return StreamProfile(quality=self.jpeg_quality)
+
+    # ------------------------------------------------------------------ produtor
+    def publish(self, frame: FrameRef) -> int:
+        """Publica um novo frame (o broadcaster passa a ser dono da referência)."""
+        with self._cond:
+            previous, self._frame = self._frame, frame
+            self._seq += 1
+            self._cond.notify_all()
+            seq = self._seq
+        if previous is not None:
+            previous.release()
+        return seq
+
+    def clear(self) -> None:
+        """Descarta o frame atual (ex.: captura parada)."""
+        with self._cond:
+            previous, self._frame = self._frame, None
+            self._cond.notify_all()
+        if previous is not None:
+            previous.release()
+
+    # ------------------------------------------------------------------ consumidores
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    @property
+    def clients(self) -> int:
+        return self._clients
+
+    @contextmanager
+    def client(self, profile: Optional[StreamProfile] = None):
+        """Registra um consumidor enquanto o bloco estiver ativo."""
+        key = (profile or self.default_profile).encode_key
+        with self._cond:
+            self._clients += 1
+            self._profile_clients[key] += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._clients -= 1
+                self._profile_clients[key] -= 1
+                if not self._profile_clients[key]:
+                    del self._profile_clients[key]
+
+    def _entry(self, key: EncodeKey) -> _Encoded:
+        """Cache de encode do perfil (chamar com a Condition adquirida)."""
+        entry = self._encoded.get(key)
+        if entry is None:
+            if len(self._encoded) >= MAX_PROFILES:
+                # descarta o perfil menos usado recentemente, preferindo os sem cliente
+                victim = min(
+                    self._encoded,
+                    key=lambda k: (
+                        self._profile_clients.get(k, 0) > 0,
+                        self._encoded[k].last_used,
+                    ),
+                )
+                del self._encoded[victim]
+            entry = self._encoded[key] = _Encoded()
+        entry.last_used = time.monotonic()
+        return entry
+
+    def wait_jpeg(
+        self,
+        last_seq: int,
+        timeout: float = 1.0,
+        profile: Optional[StreamProfile] = None,
+    ) -> Optional[Tuple[int, bytes]]:
+        """Bloqueia até existir um frame mais novo que ``last_seq``.
+
+        Retorna (seq, jpeg_bytes) do frame mais recente no ``profile`` pedido (padrão:
+        resolução cheia na qualidade do broadcaster), ou None no timeout.
+        """
+        width, quality = (profile or self.default_profile).encode_key
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._frame is None or self._seq <= last_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            seq = self._seq
+            entry = self._entry((width, quality))
+            if entry.seq == seq:
+                self.frames_served += 1
+                return seq, entry.jpeg
+            # referência própria: o slot não é reutilizado pela captura durante o encode
+            frame = self._frame.retain()
+
+        # codifica fora da Condition para não travar o publish(); o lock do perfil
+        # garante que o mesmo seq seja codificado só uma vez por perfil, e quem chega
+        # depois de um encode mais novo serve esse (nunca regride para o seq velho)
+        try:
+            with entry.lock:
+                if entry.seq < seq:
+                    t0 = time.perf_counter()
+                    image = frame.array
+                    h, w = image.shape[:2]
+                    if width is not None and width < w:
+                        image = cv2.resize(
+                            image,
+                            (width, max(1, round(h * width / w))),
+                            interpolation=cv2.INTER_AREA,
+                        )
+                    ret, jpeg = cv2.imencode(
+                        ".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+                    )
+                    if self.encode_hist is not None:
+                        self.encode_hist.observe(time.perf_counter() - t0)
+                    if not ret:
+                        return None
+                    with self._cond:
+                        entry.jpeg, entry.seq = jpeg.tobytes(), seq
+                        entry.encodes += 1
+                        self.encodes += 1
+                with self._cond:
+                    self.frames_served += 1
+                    # entry.seq >= seq: o que acabamos de gerar ou um encode mais novo
+                    # de outro cliente; o próximo wait pega o que vier depois
+                    return entry.seq, entry.jpeg
+        finally:
+            frame.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "clients": self._clients,
+                "seq": self._seq,
+                "encodes": self.encodes,
+                "frames_served": self.frames_served,
+                "jpeg_quality": self.jpeg_quality,
+                "profiles": {
+                    StreamProfile(width, quality).label: {
+                        "clients": self._profile_clients.get((width, quality), 0),
+                        "encodes": entry.encodes,
+                    }
+                    for (width, quality), entry in self._encoded.items()
+                },
+            }
@@ -0,0 +1,55 @@
+"""
+Desenho do overlay (marcadores, IDs e faixa de status) a partir de um DetectionResult.
+
+Separado da detecção: o serviço só chama ``render_overlay`` enquanto há clientes no
+/stream, então uma instalação sem ninguém assistindo não gasta nada desenhando.
+"""
+
+import cv2
+import numpy as np
+
+from detection_result import DetectionResult
+
+MARKER_COLOR = (0, 255, 0)
+HEADER_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def draw_markers(frame: np.ndarray, result: DetectionResult) -> None:
+    """Contorno e "ID: n" de cada marcador detectado."""
+    if result.ids is None:
+        return
+    try:
+        cv2.aruco.drawDetectedMarkers(  # pylint: disable=no-member
+            frame, result.corners, result.ids.reshape(-1, 1), borderColor=MARKER_COLOR
+        )
+    except Exception:
+        pass
+
+    for i, tag_id in enumerate(result.tag_ids):
+        # com fallback de coordenada caso corners não esteja no formato esperado
+        try:
+            pt = tuple(np.array(result.corners[i][0][0]).astype(int))
+        except Exception:
+            pt = (10, 30)
+        cv2.putText(
+            frame,
+            f"ID: {tag_id}",
+            (pt[0], pt[1] - 10),
+            HEADER_FONT,
+            0.6,
+            MARKER_COLOR,
+            2,
+        )
+
+
+def draw_header(frame: np.ndarray, text: str) -> None:
+    """Faixa preta com texto branco no canto superior esquerdo."""
+    (w, h), _ = cv2.getTextSize(text, HEADER_FONT, 0.6, 2)
+    cv2.rectangle(frame, (5, 5), (15 + w, 30 + h), (0, 0, 0), -1)
+    cv2.putText(frame, text, (10, 30), HEADER_FONT, 0.6, (255, 255, 255), 2)
+
+
+def render_overlay(frame: np.ndarray, result: DetectionResult, header: str) -> None:
+    """Desenha marcadores e cabeçalho direto em ``frame``."""
+    draw_markers(frame, result)
+    draw_header(frame, header)
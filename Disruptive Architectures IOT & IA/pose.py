@@ -0,0 +1,443 @@
+"""
+Pose e distância dos marcadores em lote, com intrínsecos por câmera.
+
+Substitui o ``cv2.aruco.estimatePoseSingleMarkers`` (obsoleto; removido no OpenCV 5)
+com a matriz de câmera fixa:
+
+- os cantos de todos os marcadores do frame são normalizados de uma vez (coordenadas
+  normalizadas sem distorção, num único passo vetorizado) e a pose sai do método do
+  ``cv2.solvePnP(SOLVEPNP_IPPE_SQUARE)`` (IPPE), estável com cantos ruidosos. Com
+  ``BATCH_MIN_MARKERS`` marcadores ou mais, o IPPE roda para todos juntos em arrays
+  NumPy (homografia do quadrado, as duas rotações candidatas pelo jacobiano no centro
+  do marcador, translação por mínimos quadrados, a candidata de menor erro de
+  reprojeção) e coincide com o solvePnP (diferença ~1e-13); com menos, um solvePnP por
+  marcador sai mais barato que o custo fixo das operações NumPy. O vetor de Rodrigues
+  só é calculado se alguém pedir
+- intrínsecos por câmera em ``<calibration_dir>/camera_<id>.npz`` (``camera_matrix``,
+  ``dist_coeffs``, ``image_size``; gravado por ``save_intrinsics``), ajustados à
+  resolução em uso. Sem arquivo, vale a matriz padrão (f=1000 px em 1280x720, sem
+  distorção), escalada para a resolução do frame
+- com distorção, a correção dos cantos usa uma tabela pré-calculada (pixel distorcido
+  -> coordenada normalizada) guardada em ``camera_<id>_<w>x<h>_lut.npz`` ao lado da
+  calibração; ela é gerada uma vez e recarregada nas execuções seguintes
+- nada disso roda sem consumidor: o DetectionResult só chama o estimador quando
+  alguém lê a pose (eventos, status)
+
+``PoseBatch`` devolve arrays NumPy: ``positions`` (N, 3) em metros no referencial da
+câmera, ``distances`` (N,) e ``rotations`` (N, 3, 3).
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+REAL_MARKER_SIZE_M = 0.05
+# a partir de quantos marcadores no frame a pose é resolvida em lote (abaixo disso,
+# o custo fixo das operações NumPy passa o de um solvePnP por marcador)
+BATCH_MIN_MARKERS = 12
+DEFAULT_FOCAL_PX = 1000.0  # matriz padrão: f=1000 px para 1280 px de largura
+DEFAULT_WIDTH = 1280
+DEFAULT_CALIBRATION_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "calibracao"
+)
+
+ImageSize = Tuple[int, int]  # (largura, altura)
+
+
+@dataclass
+class CameraIntrinsics:
+    """Matriz de câmera e distorção para uma resolução."""
+
+    camera_matrix: np.ndarray
+    dist_coeffs: np.ndarray
+    image_size: ImageSize
+    source: str = "padrão"  # caminho da calibração ou "padrão"
+
+    @classmethod
+    def default(cls, image_size: ImageSize) -> "CameraIntrinsics":
+        w, h = image_size
+        f = DEFAULT_FOCAL_PX * w / DEFAULT_WIDTH
+        matrix = np.array([[f, 0, w / 2], [0, f, h / 2], [0, 0, 1]], dtype=np.float64)
+        return cls(matrix, np.zeros(5), (w, h))
+
+    @property
+    def has_distortion(self) -> bool:
+        return bool(np.any(self.dist_coeffs))
+
+    def scaled(self, image_size: ImageSize) -> "CameraIntrinsics":
+        """Mesma câmera em outra resolução (fx, cx escalam com a largura etc.)."""
+        if tuple(image_size) == tuple(self.image_size):
+            return self
+        sx = image_size[0] / self.image_size[0]
+        sy = image_size[1] / self.image_size[1]
+        matrix = self.camera_matrix * np.array([[sx], [sy], [1.0]])
+        return CameraIntrinsics(
+            matrix, self.dist_coeffs, tuple(image_size), self.source
+        )
+
+
+def calibration_path(camera_id: int, directory: str = DEFAULT_CALIBRATION_DIR) -> str:
+    return os.path.join(directory, f"camera_{camera_id}.npz")
+
+
+def save_intrinsics(
+    camera_id: int,
+    camera_matrix: np.ndarray,
+    dist_coeffs: np.ndarray,
+    image_size: ImageSize,
+    directory: str = DEFAULT_CALIBRATION_DIR,
+) -> str:
+    """Grava a calibração de uma câmera (ex.: saída de ``cv2.calibrateCamera``)."""
+    os.makedirs(directory, exist_ok=True)
+    path = calibration_path(camera_id, directory)
+    np.savez(
+        path,
+        camera_matrix=np.asarray(camera_matrix, dtype=np.float64),
+        dist_coeffs=np.asarray(dist_coeffs, dtype=np.float64).ravel(),
+        image_size=np.asarray(image_size, dtype=np.int32),
+    )
+    return path
+
+
+def load_intrinsics(
+    camera_id: int, image_size: ImageSize, directory: str = DEFAULT_CALIBRATION_DIR
+) -> CameraIntrinsics:
+    """Calibração da câmera ajustada a ``image_size`` (padrão se não houver arquivo)."""
+    path = calibration_path(camera_id, directory)
+    if not os.path.isfile(path):
+        return CameraIntrinsics.default(image_size)
+    with np.load(path) as data:
+        calibrated = CameraIntrinsics(
+            data["camera_matrix"].astype(np.float64),
+            data["dist_coeffs"].astype(np.float64).ravel(),
+            tuple(int(v) for v in data["image_size"]),
+            path,
+        )
+    return calibrated.scaled(image_size)
+
+
+def _build_lut(intrinsics: CameraIntrinsics) -> np.ndarray:
+    """Coordenada normalizada (sem distorção) de cada pixel: (h, w, 2) float32."""
+    w, h = intrinsics.image_size
+    xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+    pixels = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2)
+    normalized = cv2.undistortPoints(
+        pixels, intrinsics.camera_matrix, intrinsics.dist_coeffs
+    )
+    return normalized.reshape(h, w, 2).astype(np.float32)
+
+
+def load_undistort_lut(
+    camera_id: int, intrinsics: CameraIntrinsics, directory: str
+) -> np.ndarray:
+    """Tabela de correção do cache em disco; gera e grava se faltar ou estiver velha."""
+    w, h = intrinsics.image_size
+    path = os.path.join(directory, f"camera_{camera_id}_{w}x{h}_lut.npz")
+    source = intrinsics.source
+    if os.path.isfile(path) and (
+        not os.path.isfile(source) or os.path.getmtime(path) >= os.path.getmtime(source)
+    ):
+        with np.load(path) as data:
+            lut = data["lut"]
+        if lut.shape == (h, w, 2):
+            return lut
+    lut = _build_lut(intrinsics)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        np.savez(path, lut=lut)
+    except OSError:
+        pass  # sem escrita no diretório: usa só em memória
+    return lut
+
+
+class PoseBatch:
+    """Pose dos N marcadores de um frame (NaN onde a solução falhou)."""
+
+    def __init__(self, positions: np.ndarray, rotations: np.ndarray):
+        self.positions = positions  # (N, 3) câmera -> centro do marcador, em metros
+        self.rotations = rotations  # (N, 3, 3) marcador -> câmera
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def distances(self) -> np.ndarray:
+        return np.linalg.norm(self.positions, axis=1)
+
+    @property
+    def tvecs(self) -> np.ndarray:
+        """No formato do OpenCV: (N, 1, 3)."""
+        return self.positions.reshape(-1, 1, 3)
+
+    @cached_property
+    def rvecs(self) -> np.ndarray:
+        """Rotações em Rodrigues (N, 1, 3), no formato do OpenCV; calculadas só se
+        alguém pedir."""
+        out = np.full((len(self), 1, 3), np.nan)
+        for i, rotation in enumerate(self.rotations):
+            if np.all(np.isfinite(rotation)):
+                out[i, 0] = cv2.Rodrigues(rotation)[0].ravel()
+        return out
+
+
+# Os passos abaixo trabalham com arrays (N, ...) e escrevem cada elemento em arrays
+# pré-alocados: com poucos marcadores por frame, o custo é o número de operações NumPy,
+# não o tamanho dos arrays (np.stack/np.cross custam mais que a conta que fazem).
+
+
+def _square_homographies(points: np.ndarray, half: float) -> np.ndarray:
+    """Homografias (N, 3, 3) do plano do marcador (quadrado de lado ``2 * half``
+    centrado na origem) para os cantos normalizados ``points`` (N, 4, 2).
+
+    Forma fechada quadrado unitário -> quadrilátero (Heckbert) composta com a escala do
+    marcador; quadriláteros degenerados dão NaN/inf em vez de erro.
+    """
+    x, y = points[..., 0], points[..., 1]
+    dx1, dy1 = x[:, 1] - x[:, 2], y[:, 1] - y[:, 2]
+    dx2, dy2 = x[:, 3] - x[:, 2], y[:, 3] - y[:, 2]
+    dx3 = x[:, 0] - x[:, 1] + x[:, 2] - x[:, 3]
+    dy3 = y[:, 0] - y[:, 1] + y[:, 2] - y[:, 3]
+    den = dx1 * dy2 - dx2 * dy1
+    g = (dx3 * dy2 - dx2 * dy3) / den
+    h = (dx1 * dy3 - dx3 * dy1) / den
+    unit = np.empty((len(points), 3, 3))
+    unit[:, 0, 0] = x[:, 1] - x[:, 0] + g * x[:, 1]
+    unit[:, 0, 1] = x[:, 3] - x[:, 0] + h * x[:, 3]
+    unit[:, 0, 2] = x[:, 0]
+    unit[:, 1, 0] = y[:, 1] - y[:, 0] + g * y[:, 1]
+    unit[:, 1, 1] = y[:, 3] - y[:, 0] + h * y[:, 3]
+    unit[:, 1, 2] = y[:, 0]
+    unit[:, 2, 0] = g
+    unit[:, 2, 1] = h
+    unit[:, 2, 2] = 1.0
+    # (X, Y) do marcador -> quadrado unitário: canto 0 em (0, 0), canto 2 em (1, 1)
+    scale = 0.5 / half
+    to_unit = np.array([[scale, 0.0, 0.5], [0.0, -scale, 0.5], [0.0, 0.0, 1.0]])
+    homographies = unit @ to_unit
+    return homographies / homographies[:, 2:, 2:]
+
+
+def _ippe_rotations(homographies: np.ndarray) -> np.ndarray:
+    """As duas rotações candidatas do IPPE para cada homografia: (N, 2, 3, 3)."""
+    n = len(homographies)
+    # projeção do centro do marcador e jacobiano da homografia nele
+    v = homographies[:, :2, 2]
+    jacobian = homographies[:, :2, :2] - v[:, :, None] * homographies[:, 2:, :2]
+    # rotação que leva o eixo óptico ao raio do centro (Rodrigues, ângulo de
+    # tangente t, eixo perpendicular a v no plano da imagem)
+    t = np.hypot(v[:, 0], v[:, 1])
+    cos = 1 / np.sqrt(t * t + 1)
+    sin = t * cos
+    ax, ay = (v / np.where(t > 1e-12, t, 1.0)[:, None]).T
+    rv = np.empty((n, 3, 3))
+    rv[:, 0, 0] = 1 - (1 - cos) * ax * ax
+    rv[:, 0, 1] = rv[:, 1, 0] = -(1 - cos) * ax * ay
+    rv[:, 0, 2] = sin * ax
+    rv[:, 1, 1] = 1 - (1 - cos) * ay * ay
+    rv[:, 1, 2] = sin * ay
+    rv[:, 2, 0] = -sin * ax
+    rv[:, 2, 1] = -sin * ay
+    rv[:, 2, 2] = cos
+    # A = B^-1 J (inversa 2x2 pela adjunta: singular vira inf/NaN, não LinAlgError)
+    b = rv[:, :2, :2] - v[:, :, None] * rv[:, 2:, :2]
+    b_inv = np.empty((n, 2, 2))
+    b_inv[:, 0, 0] = b[:, 1, 1]
+    b_inv[:, 0, 1] = -b[:, 0, 1]
+    b_inv[:, 1, 0] = -b[:, 1, 0]
+    b_inv[:, 1, 1] = b[:, 0, 0]
+    det = b[:, 0, 0] * b[:, 1, 1] - b[:, 0, 1] * b[:, 1, 0]
+    a = b_inv @ jacobian / det[:, None, None]
+    # bloco 2x2 da rotação: A dividida pelo seu maior valor singular
+    aat = a @ a.transpose(0, 2, 1)
+    p, q, r = aat[:, 0, 0], aat[:, 0, 1], aat[:, 1, 1]
+    gamma = np.sqrt(0.5 * (p + r + np.sqrt((p - r) ** 2 + 4 * q * q)))
+    r22 = a / gamma[:, None, None]
+    r00, r01, r10, r11 = r22[:, 0, 0], r22[:, 0, 1], r22[:, 1, 0], r22[:, 1, 1]
+    # completa as duas primeiras colunas até ortonormais; a terceira é o produto
+    # vetorial delas
+    b0 = np.sqrt(np.maximum(1 - r00 * r00 - r10 * r10, 0))
+    b1 = np.sqrt(np.maximum(1 - r01 * r01 - r11 * r11, 0))
+    b1 = np.where(r00 * r01 + r10 * r11 > 0, -b1, b1)
+    first = np.empty((n, 3, 3))
+    first[:, :2, :2] = r22
+    first[:, 2, 0] = b0
+    first[:, 2, 1] = b1
+    first[:, 0, 2] = r10 * b1 - b0 * r11
+    first[:, 1, 2] = b0 * r01 - r00 * b1
+    first[:, 2, 2] = r00 * r11 - r10 * r01
+    # a segunda solução espelha o marcador em torno da linha de visada
+    second = first.copy()
+    second[:, :2, 2] *= -1
+    second[:, 2, :2] *= -1
+    rotations = np.empty((n, 2, 3, 3))
+    rotations[:, 0] = rv @ first
+    rotations[:, 1] = rv @ second
+    return rotations
+
+
+def _translations(
+    rotations: np.ndarray, points: np.ndarray, object_points: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Translação por mínimos quadrados para cada rotação candidata (N, K, 3, 3) e o
+    erro de reprojeção de cada uma (soma dos quadrados, coordenadas normalizadas)."""
+    m = len(object_points)
+    u, v = points[:, None, :, 0], points[:, None, :, 1]  # (N, 1, 4)
+    rotated = np.einsum("nkij,pj->nkpi", rotations, object_points)  # (N, K, 4, 3)
+    # por canto, x + tx - u (z + tz) = 0 e y + ty - v (z + tz) = 0; as equações
+    # normais [[m, 0, -su], [0, m, -sv], [-su, -sv, suv]] só dependem dos cantos e
+    # eliminando tx, ty sobra uma equação em tz
+    bx = u * rotated[..., 2] - rotated[..., 0]
+    by = v * rotated[..., 2] - rotated[..., 1]
+    su, sv = u.sum(axis=-1), v.sum(axis=-1)
+    rx, ry = bx.sum(axis=-1), by.sum(axis=-1)
+    rz = -(u * bx + v * by).sum(axis=-1)
+    # m vezes a dispersão dos cantos: zero só com os quatro no mesmo ponto
+    spread = (u * u + v * v).sum(axis=-1) - (su * su + sv * sv) / m
+    translations = np.empty(rotations.shape[:2] + (3,))
+    tz = translations[..., 2] = (rz + (su * rx + sv * ry) / m) / spread
+    translations[..., 0] = (rx + su * tz) / m
+    translations[..., 1] = (ry + sv * tz) / m
+    camera = rotated + translations[:, :, None, :]
+    projected = camera[..., :2] / camera[..., 2:]
+    errors = ((projected - points[:, None]) ** 2).sum(axis=(-1, -2))
+    return translations, errors
+
+
+class PoseEstimator:
+    """Estimador em lote para uma câmera numa resolução."""
+
+    def __init__(
+        self,
+        intrinsics: CameraIntrinsics,
+        marker_size: float = REAL_MARKER_SIZE_M,
+        lut: Optional[np.ndarray] = None,
+    ):
+        self.intrinsics = intrinsics
+        self.marker_size = float(marker_size)
+        self.lut = lut  # tabela de correção de distorção (None = sem distorção)
+        k = intrinsics.camera_matrix
+        self._k_inv = np.linalg.inv(k)
+        # cantos do marcador centrado na origem, na ordem do ArUco (como no
+        # estimatePoseSingleMarkers e no SOLVEPNP_IPPE_SQUARE)
+        half = self.marker_size / 2
+        self._object_points = np.array(
+            [[-half, half, 0], [half, half, 0], [half, -half, 0], [-half, -half, 0]],
+            dtype=np.float64,
+        )
+
+    def _normalize(self, pixels: np.ndarray) -> np.ndarray:
+        """Pixels (..., 2) -> coordenadas normalizadas sem distorção (..., 2)."""
+        if self.lut is None:
+            k_inv = self._k_inv
+            x = (
+                k_inv[0, 0] * pixels[..., 0]
+                + k_inv[0, 1] * pixels[..., 1]
+                + k_inv[0, 2]
+            )
+            y = k_inv[1, 1] * pixels[..., 1] + k_inv[1, 2]
+            return np.stack([x, y], axis=-1)
+        # interpolação bilinear na tabela pré-calculada
+        lut = self.lut
+        h, w = lut.shape[:2]
+        px = np.clip(pixels[..., 0], 0, w - 1.001)
+        py = np.clip(pixels[..., 1], 0, h - 1.001)
+        x0, y0 = px.astype(np.intp), py.astype(np.intp)
+        fx, fy = (px - x0)[..., None], (py - y0)[..., None]
+        top = lut[y0, x0] * (1 - fx) + lut[y0, x0 + 1] * fx
+        bottom = lut[y0 + 1, x0] * (1 - fx) + lut[y0 + 1, x0 + 1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def estimate(self, corners: Sequence[np.ndarray]) -> Optional[PoseBatch]:
+        """Pose de todos os marcadores (cantos como saem do detectMarkers)."""
+        n = len(corners)
+        if n == 0:
+            return None
+        pixels = np.asarray(corners, dtype=np.float64).reshape(n, 4, 2)
+        points = self._normalize(pixels)
+        if n < BATCH_MIN_MARKERS:
+            positions, rotations = self._solve_each(points)
+        else:
+            positions, rotations = self._solve_batch(points)
+        failed = ~(
+            np.all(np.isfinite(positions), axis=1)
+            & np.all(np.isfinite(rotations), axis=(1, 2))
+        )
+        positions[failed] = np.nan
+        rotations[failed] = np.nan
+        return PoseBatch(positions, rotations)
+
+    def _solve_each(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Um ``solvePnP(SOLVEPNP_IPPE_SQUARE)`` por marcador (já normalizados e sem
+        distorção: câmera identidade, sem coeficientes)."""
+        n = len(points)
+        positions = np.full((n, 3), np.nan)
+        rotations = np.full((n, 3, 3), np.nan)
+        identity = np.eye(3)
+        for i in range(n):
+            if not np.all(np.isfinite(points[i])):
+                continue
+            try:
+                ok, rvec, tvec = cv2.solvePnP(
+                    self._object_points,
+                    points[i],
+                    identity,
+                    None,
+                    flags=cv2.SOLVEPNP_IPPE_SQUARE,
+                )
+            except cv2.error:
+                continue  # quadrilátero degenerado
+            if ok:
+                positions[i] = tvec.ravel()
+                rotations[i] = cv2.Rodrigues(rvec)[0]
+        return positions, rotations
+
+    def _solve_batch(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """O mesmo IPPE para todos os marcadores de uma vez, em arrays NumPy."""
+        # quadriláteros degenerados viram NaN/inf no caminho e NaN no resultado
+        with np.errstate(all="ignore"):
+            homographies = _square_homographies(points, self.marker_size / 2)
+            candidates = _ippe_rotations(homographies)
+            translations, errors = _translations(
+                candidates, points, self._object_points
+            )
+        # das duas soluções do IPPE, a de menor erro de reprojeção
+        best = np.argmin(np.where(np.isnan(errors), np.inf, errors), axis=1)
+        rows = np.arange(len(points))
+        return translations[rows, best], candidates[rows, best]
+
+
+_ESTIMATORS: Dict[tuple, PoseEstimator] = {}
+_ESTIMATORS_LOCK = threading.Lock()
+
+
+def pose_estimator(
+    camera_id: int,
+    image_size: ImageSize,
+    directory: str = DEFAULT_CALIBRATION_DIR,
+    marker_size: float = REAL_MARKER_SIZE_M,
+) -> PoseEstimator:
+    """Estimador da câmera na resolução dada, criado uma vez e reaproveitado (a
+    calibração e a tabela de distorção são lidas do disco só na primeira chamada)."""
+    key = (int(camera_id), tuple(image_size), directory, float(marker_size))
+    with _ESTIMATORS_LOCK:
+        estimator = _ESTIMATORS.get(key)
+        if estimator is None:
+            intrinsics = load_intrinsics(camera_id, image_size, directory)
+            lut = (
+                load_undistort_lut(camera_id, intrinsics, directory)
+                if intrinsics.has_distortion
+                else None
+            )
+            estimator = _ESTIMATORS[key] = PoseEstimator(intrinsics, marker_size, lut)
+        return estimator
+
+
+def clear_cache() -> None:
+    """Esquece os estimadores (ex.: depois de gravar uma calibração nova)."""
+    with _ESTIMATORS_LOCK:
+        _ESTIMATORS.clear()
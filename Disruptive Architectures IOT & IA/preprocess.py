@@ -0,0 +1,173 @@
+"""
+Pré-processamento em estágios configuráveis, com estado reutilizável e auto-medição.
+
+Cada estágio (CLAHE, desfoque) guarda seu próprio objeto OpenCV e buffer de saída
+(sem alocar por frame), mede o próprio tempo e decide se roda a partir de estatísticas
+baratas (média/desvio) de uma amostra subamostrada do frame: no pátio ao meio-dia,
+com boa luz e contraste, os estágios são pulados; à noite, entram automaticamente.
+
+Modo por estágio: "auto" (decide pela imagem), "on" (sempre) ou "off" (nunca).
+Uma instância por thread (os buffers são reaproveitados entre chamadas).
+"""
+
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+STAGE_MODES = ("auto", "on", "off")
+
+
+class PreprocessStage:
+    """Estágio base: decide se roda, reaproveita o buffer de saída e mede o tempo."""
+
+    name = "stage"
+
+    def __init__(self, mode: str = "auto"):
+        if mode not in STAGE_MODES:
+            raise ValueError(f"Modo inválido: {mode} (use {', '.join(STAGE_MODES)})")
+        self.mode = mode
+        self.runs = 0
+        self.skips = 0
+        self.total_s = 0.0
+        self._buf: Optional[np.ndarray] = None
+
+    def wanted(self, stats: dict) -> bool:
+        raise NotImplementedError
+
+    def should_run(self, stats: dict) -> bool:
+        if self.mode == "on":
+            return True
+        if self.mode == "off":
+            return False
+        return self.wanted(stats)
+
+    def _out(self, src: np.ndarray) -> np.ndarray:
+        if self._buf is None or self._buf.shape != src.shape or self._buf.dtype != src.dtype:
+            self._buf = np.empty_like(src)
+        return self._buf
+
+    def process(self, src: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "runs": self.runs,
+            "skips": self.skips,
+            "avg_ms": round(self.total_s / self.runs * 1000, 3) if self.runs else None,
+        }
+
+
+class ClaheStage(PreprocessStage):
+    """Equalização adaptativa (CLAHE) para cenas escuras ou de baixo contraste.
+
+    Limiares medidos no corpus do benchmark_detection: frames noturnos ficam com média
+    19-65 e desvio 4-21; os de dia (inclusive borrados/ruidosos) com média >= 92 e
+    desvio >= 22. Com média < 80 ou desvio < 20 o CLAHE roda só nos escuros (25% do
+    corpus, contra ~80% com os limiares antigos 90/45), com recall 0,963 contra 0,971
+    e pré-processamento de 3,2 para 1,1 ms/frame em 960x540.
+    """
+
+    name = "clahe"
+
+    def __init__(
+        self,
+        mode: str = "auto",
+        clip_limit: float = 3.0,
+        tile_grid: tuple = (8, 8),
+        max_mean: float = 80.0,
+        max_std: float = 20.0,
+    ):
+        super().__init__(mode)
+        self.max_mean = max_mean
+        self.max_std = max_std
+        self._clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid)
+
+    def wanted(self, stats: dict) -> bool:
+        return stats["mean"] < self.max_mean or stats["std"] < self.max_std
+
+    def process(self, src: np.ndarray) -> np.ndarray:
+        return self._clahe.apply(src, self._out(src))
+
+
+class BlurStage(PreprocessStage):
+    """Leve desfoque gaussiano contra o ruído de sensor típico de pouca luz."""
+
+    name = "blur"
+
+    def __init__(self, mode: str = "auto", ksize: tuple = (3, 3), max_mean: float = 90.0):
+        super().__init__(mode)
+        self.ksize = ksize
+        self.max_mean = max_mean
+
+    def wanted(self, stats: dict) -> bool:
+        return stats["mean"] < self.max_mean
+
+    def process(self, src: np.ndarray) -> np.ndarray:
+        return cv2.GaussianBlur(src, self.ksize, 0, dst=self._out(src))
+
+
+class PreprocessPipeline:
+    """Cadeia de estágios aplicada ao frame em cinza (chamável como função)."""
+
+    def __init__(self, stages: List[PreprocessStage], sample_step: int = 8):
+        self.stages = stages
+        self.sample_step = max(1, int(sample_step))
+        self.frames = 0
+        self.stats_s = 0.0
+        self.last_stats: Optional[dict] = None
+
+    @classmethod
+    def adaptive(cls) -> "PreprocessPipeline":
+        """CLAHE + desfoque ligados/desligados conforme brilho e contraste."""
+        return cls([ClaheStage("auto"), BlurStage("auto")])
+
+    @classmethod
+    def always(cls) -> "PreprocessPipeline":
+        """Comportamento clássico: CLAHE + desfoque em todo frame."""
+        return cls([ClaheStage("on"), BlurStage("on")])
+
+    @classmethod
+    def from_mode(cls, mode: str) -> "PreprocessPipeline":
+        return cls.always() if mode == "always" else cls.adaptive()
+
+    def image_stats(self, gray: np.ndarray) -> dict:
+        """Média e desvio padrão numa amostra (1 a cada ``sample_step`` pixels por eixo)."""
+        sample = gray[:: self.sample_step, :: self.sample_step]
+        mean, std = cv2.meanStdDev(sample)
+        return {"mean": float(mean[0][0]), "std": float(std[0][0])}
+
+    def __call__(self, gray: np.ndarray) -> np.ndarray:
+        t0 = cv2.getTickCount()
+        stats = self.image_stats(gray)
+        t1 = cv2.getTickCount()
+        self.stats_s += (t1 - t0) / cv2.getTickFrequency()
+        self.frames += 1
+        self.last_stats = stats
+
+        out = gray
+        for stage in self.stages:
+            if not stage.should_run(stats):
+                stage.skips += 1
+                continue
+            t0 = cv2.getTickCount()
+            out = stage.process(out)
+            stage.total_s += (cv2.getTickCount() - t0) / cv2.getTickFrequency()
+            stage.runs += 1
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "stats_avg_ms": (
+                round(self.stats_s / self.frames * 1000, 3) if self.frames else None
+            ),
+            "last_image_stats": (
+                {k: round(v, 1) for k, v in self.last_stats.items()}
+                if self.last_stats
+                else None
+            ),
+            "stages": [s.stats() for s in self.stages],
+        }
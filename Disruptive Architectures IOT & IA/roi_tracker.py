@@ -0,0 +1,164 @@
+"""
+Modo de rastreamento por ROI: evita varrer o frame inteiro a cada frame.
+
+Depois de uma detecção completa, os próximos N frames só procuram marcadores em
+regiões (com margem) ao redor dos marcadores já conhecidos — motos estacionadas quase
+não se movem entre frames. Uma varredura completa roda periodicamente (para achar
+motos que chegaram) ou imediatamente quando algum marcador rastreado se perde.
+"""
+
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from detection import detect_markers, preprocess_gray
+
+
+def _merge_rects(rects: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """Une retângulos (x0, y0, x1, y1) que se sobrepõem, para não varrer pixels duas vezes."""
+    merged = []
+    for r in sorted(rects):
+        for i, m in enumerate(merged):
+            if r[0] <= m[2] and r[2] >= m[0] and r[1] <= m[3] and r[3] >= m[1]:
+                merged[i] = (min(m[0], r[0]), min(m[1], r[1]), max(m[2], r[2]), max(m[3], r[3]))
+                break
+        else:
+            merged.append(r)
+    return merged
+
+
+class RoiTracker:
+    """Detecta em ROIs ao redor dos marcadores conhecidos, com rescan completo periódico."""
+
+    def __init__(
+        self,
+        detector,
+        rescan_every: int = 15,
+        padding: float = 0.6,
+        min_padding_px: int = 24,
+        preprocess: Callable[[np.ndarray], np.ndarray] = preprocess_gray,
+    ):
+        self.detector = detector
+        self.rescan_every = max(1, int(rescan_every))
+        self.padding = float(padding)  # fração do tamanho do marcador
+        self.min_padding_px = int(min_padding_px)
+        self.preprocess = preprocess
+
+        self._tracked: Optional[np.ndarray] = None  # ids da última detecção
+        self._rects: List[Tuple[int, int, int, int]] = []
+        self._since_full = 0
+
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.lost_rescans = 0
+        self._full_s = 0.0
+        self._roi_s = 0.0
+        self._scanned_px = 0
+        self._frame_px = 0
+
+    def reset(self) -> None:
+        """Força uma varredura completa no próximo frame (ex.: troca de dicionário)."""
+        self._tracked = None
+        self._rects = []
+
+    # ------------------------------------------------------------------ detecção
+    def detect(self, gray: np.ndarray) -> Tuple[list, Optional[np.ndarray]]:
+        """Recebe o frame em cinza *sem* pré-processamento e retorna (corners, ids)."""
+        h, w = gray.shape[:2]
+        if self._tracked is None or self._since_full >= self.rescan_every:
+            return self._full(gray)
+
+        t0 = time.perf_counter()
+        corners, ids, scanned = self._scan_rois(gray)
+        self._roi_s += time.perf_counter() - t0
+        self.roi_scans += 1
+        self._since_full += 1
+        self._scanned_px += scanned
+        self._frame_px += h * w
+
+        found = set() if ids is None else set(int(i) for i in ids)
+        if any(int(t) not in found for t in self._tracked):
+            # algum marcador sumiu da ROI: pode ter se movido; varre tudo agora
+            self.lost_rescans += 1
+            return self._full(gray)
+
+        self._update(corners, ids, w, h)
+        return corners, ids
+
+    def _full(self, gray: np.ndarray) -> Tuple[list, Optional[np.ndarray]]:
+        h, w = gray.shape[:2]
+        t0 = time.perf_counter()
+        corners, ids = detect_markers(self.detector, self.preprocess(gray))
+        self._full_s += time.perf_counter() - t0
+        self.full_scans += 1
+        self._since_full = 0
+        self._scanned_px += h * w
+        self._frame_px += h * w
+        self._update(corners, ids, w, h)
+        return corners, ids
+
+    def _scan_rois(self, gray: np.ndarray):
+        all_corners: list = []
+        all_ids = []
+        scanned = 0
+        for x0, y0, x1, y1 in self._rects:
+            crop = gray[y0:y1, x0:x1]
+            scanned += crop.shape[0] * crop.shape[1]
+            corners, ids = detect_markers(self.detector, self.preprocess(crop))
+            if ids is None:
+                continue
+            offset = np.array([x0, y0], dtype=np.float32)
+            for c, i in zip(corners, ids):
+                all_corners.append(c + offset)
+                all_ids.append(i)
+        if not all_ids:
+            return [], None, scanned
+        return all_corners, np.asarray(all_ids), scanned
+
+    def _update(self, corners: list, ids: Optional[np.ndarray], w: int, h: int) -> None:
+        if ids is None:
+            self._tracked = None
+            self._rects = []
+            return
+        rects = []
+        for c in corners:
+            pts = np.asarray(c).reshape(-1, 2)
+            x0, y0 = pts.min(axis=0)
+            x1, y1 = pts.max(axis=0)
+            pad = max(self.min_padding_px, self.padding * max(x1 - x0, y1 - y0))
+            rects.append(
+                (
+                    max(0, int(x0 - pad)),
+                    max(0, int(y0 - pad)),
+                    min(w, int(np.ceil(x1 + pad))),
+                    min(h, int(np.ceil(y1 + pad))),
+                )
+            )
+        self._tracked = np.asarray(ids).copy()
+        self._rects = _merge_rects(rects)
+
+    # ------------------------------------------------------------------ métricas
+    def stats(self) -> dict:
+        frames = self.full_scans + self.roi_scans
+        avg_full = self._full_s / self.full_scans if self.full_scans else None
+        avg_frame = (self._full_s + self._roi_s) / frames if frames else None
+        return {
+            "rescan_every": self.rescan_every,
+            "tracked": 0 if self._tracked is None else len(self._tracked),
+            "full_scans": self.full_scans,
+            "roi_scans": self.roi_scans,
+            "lost_rescans": self.lost_rescans,
+            # fração média da área do frame efetivamente varrida (1.0 = sempre frame inteiro)
+            "scanned_area_ratio": (
+                round(self._scanned_px / self._frame_px, 4) if self._frame_px else None
+            ),
+            "avg_full_ms": round(avg_full * 1000, 2) if avg_full else None,
+            "avg_roi_ms": (
+                round(self._roi_s / self.roi_scans * 1000, 2) if self.roi_scans else None
+            ),
+            # ganho estimado de FPS da detecção vs. varrer o frame inteiro sempre
+            "detect_fps_gain": (
+                round(avg_full / avg_frame, 2) if avg_full and avg_frame else None
+            ),
+        }
@@ -0,0 +1,201 @@
+"""
+Agrupador de detecções para envio em lote ao backend Java.
+
+As detecções são acumuladas numa janela de tempo (ex.: 250 ms) ou até N tags, e então
+enviadas numa única requisição ao endpoint de lote. Se o backend não tiver esse endpoint
+(``send_batch`` lança ``BulkNotSupported``), o lote é distribuído em POSTs individuais
+e o modo individual passa a ser usado direto nas próximas janelas, até o endpoint ser
+sondado de novo após ``reprobe_s`` (o backend pode ganhar o endpoint num deploy).
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+from metrics import LATENCY_BUCKETS, SIZE_BUCKETS, Histogram
+
+
+class BulkNotSupported(Exception):
+    """O backend não oferece endpoint de cadastro em lote (404/405/501)."""
+
+
+class BulkSupport:
+    """Se o backend tem o endpoint de lote, com nova sondagem após uma recusa.
+
+    ``supported`` é None até a primeira resposta, True depois de um lote aceito e
+    False depois de ``BulkNotSupported``; passados ``reprobe_s`` da recusa volta a None
+    e o próximo envio tenta o lote de novo. Usado pelo TagBatcher e pela TagOutbox.
+    """
+
+    def __init__(self, reprobe_s: float = 300.0):
+        self.reprobe_s = max(0.0, float(reprobe_s))
+        self.supported: Optional[bool] = None
+        self._refused_at = 0.0  # monotonic da última recusa do endpoint de lote
+
+    def disabled(self) -> bool:
+        """True enquanto a última recusa do endpoint de lote não vencer."""
+        if self.supported is not False:
+            return False
+        if time.monotonic() - self._refused_at >= self.reprobe_s:
+            self.supported = None  # o backend pode ter ganho o endpoint num deploy
+            print("[PY CAM] Testando de novo o endpoint de lote.")
+            return False
+        return True
+
+    def accepted(self) -> None:
+        self.supported = True
+
+    def refused(self) -> None:
+        self.supported = False
+        self._refused_at = time.monotonic()
+
+
+class TagBatcher:
+    """Coleta itens por janela de tempo/tamanho e faz flush em background."""
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[Any]], bool],
+        send_one: Callable[[Any], Any],
+        max_size: int = 20,
+        window_s: float = 0.25,
+        name: str = "lote-tags",
+        reprobe_s: float = 300.0,
+    ):
+        self.send_batch = send_batch
+        self.send_one = send_one
+        self.max_size = max(1, int(max_size))
+        self.window_s = max(0.001, float(window_s))
+        self.name = name
+        self.bulk = BulkSupport(reprobe_s)
+
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._first_ts: Optional[float] = None
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.batch_size = Histogram(
+            "aruco_batch_size", SIZE_BUCKETS, "Tags por lote enviado"
+        )
+        self.flush_latency = Histogram(
+            "aruco_batch_flush_seconds",
+            LATENCY_BUCKETS,
+            "Tempo entre a primeira tag do lote e o fim do envio",
+        )
+        self.batches = 0
+        self.fanouts = 0
+        self.failures = 0
+
+    @property
+    def bulk_supported(self) -> Optional[bool]:
+        return self.bulk.supported
+
+    def add(self, item: Any, key: Optional[Hashable] = None) -> None:
+        """Adiciona um item à janela atual (itens com a mesma chave são fundidos)."""
+        with self._cond:
+            if key is None:
+                key = ("seq", next(self._seq))
+            first = not self._pending
+            if first:
+                self._first_ts = time.perf_counter()
+            self._pending[key] = item
+            if first or len(self._pending) >= self.max_size:
+                # o primeiro item arma a janela; o lote cheio sai na hora
+                self._cond.notify()
+        self.start()
+
+    def start(self) -> None:
+        """Inicia a thread de flush (idempotente)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Para a thread fazendo um último flush do que estiver pendente."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if len(self._pending) >= self.max_size:
+                        break
+                    if self._pending:
+                        remaining = self._first_ts + self.window_s - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if not self._pending and self._stopping:
+                    return
+                items = list(self._pending.values())[: self.max_size]
+                keys = list(self._pending.keys())[: self.max_size]
+                for k in keys:
+                    del self._pending[k]
+                first_ts = self._first_ts
+                self._first_ts = time.perf_counter() if self._pending else None
+            if items:
+                self._flush(items, first_ts)
+
+    def _flush(self, items: List[Any], first_ts: Optional[float]) -> None:
+        self.batch_size.observe(len(items))
+        try:
+            if self.bulk.disabled():
+                self._fan_out(items)
+            else:
+                try:
+                    ok = self.send_batch(items)
+                    self.bulk.accepted()
+                    self.batches += 1
+                    if not ok:
+                        self.failures += 1
+                except BulkNotSupported:
+                    print(
+                        "[PY CAM] Backend sem endpoint de lote; enviando tags individualmente."
+                    )
+                    self.bulk.refused()
+                    self._fan_out(items)
+        except Exception as e:
+            self.failures += 1
+            print(f"[PY CAM] Erro no envio em lote: {e}")
+        finally:
+            if first_ts is not None:
+                self.flush_latency.observe(time.perf_counter() - first_ts)
+
+    def _fan_out(self, items: List[Any]) -> None:
+        self.fanouts += 1
+        for item in items:
+            try:
+                self.send_one(item)
+            except Exception as e:
+                self.failures += 1
+                print(f"[PY CAM] Erro no envio individual: {e}")
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "max_size": self.max_size,
+            "window_ms": round(self.window_s * 1000, 1),
+            "bulk_supported": self.bulk_supported,
+            "pending": self.pending(),
+            "batches": self.batches,
+            "fanouts": self.fanouts,
+            "failures": self.failures,
+            "batch_size": self.batch_size.snapshot(),
+            "flush_latency_s": self.flush_latency.snapshot(),
+        }
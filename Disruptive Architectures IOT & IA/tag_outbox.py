@@ -0,0 +1,394 @@
+"""
+Outbox durável (SQLite) para os envios de tags ao backend Java.
+
+Todo evento a enviar é gravado primeiro na outbox e só sai dela quando o backend
+confirma; com a API fora do ar a câmera continua detectando normalmente e os eventos
+se acumulam em disco (sobrevivem a reinícios do processo). Uma thread em background
+drena a fila:
+
+- em lotes de até ``batch_size`` itens (``send_batch``; se o backend não tiver o
+  endpoint de lote, ``BulkNotSupported`` faz cair para ``send_one`` item a item até
+  uma nova sondagem do lote após ``reprobe_s``)
+- limitada a ``rate_per_s`` itens/s, para o backlog não derrubar o backend que acabou
+  de voltar
+- com backoff exponencial (``backoff_base_s`` .. ``backoff_max_s``) após falha,
+  zerado no primeiro envio bem-sucedido
+
+Falhas são de dois tipos. Transitórias (rede, 5xx, ``send_*`` devolvendo False) param
+a drenagem até o backoff e contam uma tentativa para os itens enviados; com o circuito
+aberto (``CircuitOpenError``) nada foi enviado e nada é contado. Definitivas
+(``PermanentFailure``, ex.: 4xx de payload inválido) não adiantam repetir: o item vai
+na hora para a tabela ``dead_letter``, assim como o que passar de ``max_attempts``
+tentativas, e a fila segue. Um lote que já falhou é reenviado item a item, para isolar
+o item problemático sem levar os outros junto.
+
+Cada item tem uma chave de idempotência: gravar a mesma chave de novo é ignorado, então
+um evento reentregue (ex.: retry da fila em memória) não vira dois POSTs. Limites:
+``max_items`` (descarta os mais antigos) e ``max_age_s`` (expira itens velhos demais
+para ainda interessarem).
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from circuit_breaker import CircuitOpenError
+from tag_batcher import BulkNotSupported, BulkSupport
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tag_outbox.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    item TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    item TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    failed_at REAL NOT NULL,
+    reason TEXT
+);
+"""
+
+
+class PermanentFailure(Exception):
+    """O backend recusou o item de forma definitiva (ex.: 4xx): repetir não adianta."""
+
+    def __init__(self, reason: Any):
+        super().__init__(reason)
+        self.reason = str(reason)
+
+
+class _Outcome:
+    """Resultado de uma rodada de envio da outbox."""
+
+    __slots__ = ("sent", "rejected", "attempted", "error")
+
+    def __init__(self):
+        self.sent: List[int] = []  # confirmados pelo backend
+        self.rejected: List[Tuple[int, str]] = []  # recusa definitiva -> dead_letter
+        self.attempted: List[int] = []  # falha transitória: conta uma tentativa
+        self.error: Optional[str] = None
+
+    def fail(self, error: str, attempted: List[Tuple]) -> "_Outcome":
+        self.error = error
+        self.attempted = [row[0] for row in attempted]
+        return self
+
+
+class TagOutbox:
+    """Fila persistente com chave de idempotência, drenada em lotes com backoff."""
+
+    def __init__(
+        self,
+        send_batch: Optional[Callable[[List[Any]], bool]],
+        send_one: Callable[[Any], bool],
+        path: str = DEFAULT_PATH,
+        batch_size: int = 20,
+        rate_per_s: float = 20.0,
+        max_items: int = 50000,
+        max_age_s: float = 24 * 3600.0,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 60.0,
+        max_attempts: int = 10,
+        reprobe_s: float = 300.0,
+        name: str = "outbox",
+    ):
+        self.send_batch = send_batch  # None = backend sem lote (só send_one)
+        self.send_one = send_one
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.rate_per_s = max(0.0, float(rate_per_s))  # 0 = sem limite
+        self.max_items = max(1, int(max_items))
+        self.max_age_s = max(0.0, float(max_age_s))
+        self.backoff_base_s = max(0.01, float(backoff_base_s))
+        self.backoff_max_s = max(self.backoff_base_s, float(backoff_max_s))
+        self.max_attempts = max(1, int(max_attempts))
+        self.name = name
+        self.bulk = BulkSupport(reprobe_s) if send_batch else None
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        # contagens mantidas em memória (evita COUNT(*) a cada put)
+        self._count = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        self._dead_count = self._db.execute(
+            "SELECT COUNT(*) FROM dead_letter"
+        ).fetchone()[0]
+        self._lock = threading.Lock()  # uma conexão, acesso serializado
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._backoff_s = 0.0
+        self._retry_at = 0.0
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.sent = 0
+        self.failures = 0
+        self.dropped = 0  # descartados por max_items
+        self.expired = 0  # descartados por max_age_s
+        self.dead_lettered = 0  # movidos para dead_letter nesta execução
+        self.last_error: Optional[str] = None
+
+    @property
+    def bulk_supported(self) -> Optional[bool]:
+        return self.bulk.supported if self.bulk is not None else False
+
+    # ------------------------------------------------------------------ produtor
+    def put(self, item: Any, key: str) -> bool:
+        """Grava ``item`` (serializável em JSON). Retorna False se a chave já existia."""
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO outbox (key, item, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(item), now),
+            )
+            inserted = cur.rowcount == 1
+            if inserted:
+                self.accepted += 1
+                self._count += 1
+                self._enforce_size()
+            else:
+                self.duplicates += 1
+            self._db.commit()
+        if inserted:
+            self._wakeup.set()
+        return inserted
+
+    def _enforce_size(self) -> None:
+        """Descarta os itens mais antigos acima de ``max_items`` (com o lock)."""
+        excess = self._count - self.max_items
+        if excess > 0:
+            cur = self._db.execute(
+                "DELETE FROM outbox WHERE id IN "
+                "(SELECT id FROM outbox ORDER BY id LIMIT ?)",
+                (excess,),
+            )
+            self._count -= cur.rowcount
+            self.dropped += cur.rowcount
+
+    # ------------------------------------------------------------------ drenagem
+    def start(self) -> None:
+        """Inicia a thread de drenagem (idempotente)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._wakeup.set()  # itens de execuções anteriores
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _purge_expired(self) -> None:
+        if not self.max_age_s:
+            return
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM outbox WHERE created_at < ?",
+                (time.time() - self.max_age_s,),
+            )
+            if cur.rowcount > 0:
+                self._count -= cur.rowcount
+                self.expired += cur.rowcount
+                print(f"[PY CAM] Outbox: {cur.rowcount} itens expirados descartados")
+            self._db.commit()
+
+    def _next_batch(self) -> List[Tuple[int, Any, int]]:
+        """Próximos itens: (id, item, tentativas anteriores)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, item, attempts FROM outbox ORDER BY id LIMIT ?",
+                (self.batch_size,),
+            ).fetchall()
+        return [(row_id, json.loads(item), attempts) for row_id, item, attempts in rows]
+
+    def _run(self) -> None:
+        while not self._stopping:
+            # limpa antes de olhar a fila: um put() daqui em diante acorda o wait
+            self._wakeup.clear()
+            wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                self._wakeup.wait(wait)
+                continue
+            self._purge_expired()
+            batch = self._next_batch()
+            if not batch:
+                self._wakeup.wait(5.0)
+                continue
+            t0 = time.monotonic()
+            outcome = self._send(batch)
+            self._finish(outcome)
+            done = len(outcome.sent) + len(outcome.rejected)
+            if self.rate_per_s and done:
+                # vazão controlada: o backlog drena a no máximo rate_per_s itens/s
+                pause = done / self.rate_per_s - (time.monotonic() - t0)
+                if pause > 0:
+                    time.sleep(pause)
+
+    def _send(self, batch: List[Tuple[int, Any, int]]) -> _Outcome:
+        """Envia o lote; o resultado separa confirmados, recusados e falhas."""
+        outcome = _Outcome()
+        # lote que já falhou vai item a item: isola o item que derruba o lote
+        retrying = any(attempts for _id, _item, attempts in batch)
+        if self.bulk is not None and not self.bulk.disabled() and not retrying:
+            items = [item for _id, item, _attempts in batch]
+            try:
+                if self.send_batch(items):
+                    self.bulk.accepted()
+                    outcome.sent = [row_id for row_id, _item, _attempts in batch]
+                    return outcome
+                return outcome.fail("lote recusado", batch)
+            except BulkNotSupported:
+                print("[PY CAM] Outbox: backend sem endpoint de lote; item a item.")
+                self.bulk.refused()
+            except PermanentFailure as e:
+                # algum item do lote é inválido: descobre qual mandando um a um
+                print(f"[PY CAM] Outbox: lote recusado ({e.reason}); item a item.")
+            except CircuitOpenError:
+                return outcome.fail("circuito aberto", [])
+            except Exception as e:
+                return outcome.fail(str(e), batch)
+        for row in batch:
+            row_id, item, _attempts = row
+            try:
+                ok = self.send_one(item)
+            except PermanentFailure as e:
+                outcome.rejected.append((row_id, e.reason))
+                continue
+            except CircuitOpenError:
+                return outcome.fail("circuito aberto", [])
+            except Exception as e:
+                return outcome.fail(str(e), [row])
+            if not ok:
+                # backend provavelmente fora: para aqui em vez de esperar N timeouts
+                return outcome.fail("envio recusado", [row])
+            outcome.sent.append(row_id)
+        return outcome
+
+    def _finish(self, outcome: _Outcome) -> None:
+        now = time.time()
+        with self._lock:
+            if outcome.sent:
+                self._db.executemany(
+                    "DELETE FROM outbox WHERE id = ?", [(i,) for i in outcome.sent]
+                )
+                self._count -= len(outcome.sent)
+            if outcome.attempted:
+                self._db.executemany(
+                    "UPDATE outbox SET attempts = attempts + 1 WHERE id = ?",
+                    [(i,) for i in outcome.attempted],
+                )
+                # falhou vezes demais: sai da frente da fila
+                exhausted = self._db.execute(
+                    "SELECT id FROM outbox WHERE attempts >= ? AND id IN (%s)"
+                    % ",".join("?" * len(outcome.attempted)),
+                    (self.max_attempts, *outcome.attempted),
+                ).fetchall()
+                outcome.rejected += [
+                    (row_id, f"{self.max_attempts} tentativas: {outcome.error}")
+                    for (row_id,) in exhausted
+                ]
+            for row_id, reason in outcome.rejected:
+                moved = self._db.execute(
+                    "INSERT INTO dead_letter "
+                    "(id, key, item, created_at, attempts, failed_at, reason) "
+                    "SELECT id, key, item, created_at, attempts, ?, ? "
+                    "FROM outbox WHERE id = ?",
+                    (now, reason, row_id),
+                ).rowcount
+                self._db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+                self._count -= moved
+                self._dead_count += moved
+                self.dead_lettered += moved
+            self._db.commit()
+        self.sent += len(outcome.sent)
+        for row_id, reason in outcome.rejected:
+            print(f"[PY CAM] Outbox: item {row_id} movido para dead_letter ({reason})")
+        error = outcome.error
+        if error is None:
+            self._backoff_s = 0.0
+            return
+        self.failures += 1
+        self.last_error = error
+        self._backoff_s = min(
+            self.backoff_max_s, max(self.backoff_base_s, self._backoff_s * 2)
+        )
+        # jitter de ±10% para várias instâncias não voltarem juntas
+        delay = self._backoff_s * random.uniform(0.9, 1.1)
+        self._retry_at = time.monotonic() + delay
+        print(
+            f"[PY CAM] Outbox: envio falhou ({error}); "
+            f"nova tentativa em {delay:.1f}s ({self.pending()} pendentes)"
+        )
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        """Itens recusados de vez (mais recentes primeiro), para inspeção."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, item, attempts, failed_at, reason FROM dead_letter "
+                "ORDER BY failed_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {
+                "key": key,
+                "item": json.loads(item),
+                "attempts": attempts,
+                "failed_at": failed_at,
+                "reason": reason,
+            }
+            for key, item, attempts, failed_at, reason in rows
+        ]
+
+    # ------------------------------------------------------------------ métricas
+    def pending(self) -> int:
+        return self._count
+
+    def oldest_age_s(self) -> Optional[float]:
+        with self._lock:
+            (oldest,) = self._db.execute(
+                "SELECT MIN(created_at) FROM outbox"
+            ).fetchone()
+        return time.time() - oldest if oldest is not None else None
+
+    def stats(self) -> dict:
+        oldest = self.oldest_age_s()
+        retry_in = self._retry_at - time.monotonic()
+        return {
+            "path": self.path,
+            "pending": self.pending(),
+            "oldest_age_s": round(oldest, 1) if oldest is not None else None,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "sent": self.sent,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "expired": self.expired,
+            "dead_letter": self._dead_count,
+            "max_attempts": self.max_attempts,
+            "bulk_supported": self.bulk_supported,
+            "backoff_s": round(self._backoff_s, 1),
+            "retry_in_s": round(retry_in, 1) if retry_in > 0 else 0.0,
+            "last_error": self.last_error,
+            "batch_size": self.batch_size,
+            "rate_per_s": self.rate_per_s or None,
+            "max_items": self.max_items,
+            "max_age_s": self.max_age_s or None,
+        }
@@ -0,0 +1,155 @@
+"""
+Presença de tags por câmera: eventos de entrada/saída em vez de re-envio periódico.
+
+Cada tag passa por uma pequena máquina de estados alimentada com os ids de cada frame:
+
+    (ausente) --visto--> candidata --visto em enter_frames frames--> presente [enter]
+    candidata --sem ser vista por exit_after_s--> descartada (sem evento)
+    presente  --sem ser vista por exit_after_s--> ausente [exit]
+    presente  --a cada heartbeat_s (opcional)--> presente [heartbeat]
+
+A histerese (``enter_frames`` na entrada, ``exit_after_s`` na saída) evita que um
+falso positivo de um frame ou uma oclusão curta gerem eventos. Tags que saem são
+removidas (TTL), então o estado só contém o que está visível agora.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+ENTER = "enter"
+EXIT = "exit"
+HEARTBEAT = "heartbeat"
+
+
+@dataclass
+class PresenceEvent:
+    """Mudança de presença de uma tag (``duration_s``: tempo visível até agora)."""
+
+    kind: str
+    tag_id: int
+    timestamp: float
+    duration_s: float = 0.0
+
+
+class _TagState:
+    __slots__ = ("first_seen", "last_seen", "hits", "present", "last_emit")
+
+    def __init__(self, now: float):
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 0
+        self.present = False
+        self.last_emit = now
+
+
+class TagPresenceTracker:
+    """Converte os ids vistos em cada frame em eventos enter/exit/heartbeat."""
+
+    def __init__(
+        self,
+        enter_frames: int = 2,
+        exit_after_s: float = 3.0,
+        heartbeat_s: float = 0.0,
+    ):
+        self.enter_frames = max(1, int(enter_frames))
+        self.exit_after_s = max(0.0, float(exit_after_s))
+        self.heartbeat_s = max(0.0, float(heartbeat_s))  # 0 = sem heartbeat
+        self._tags: Dict[int, _TagState] = {}
+        self._lock = threading.Lock()
+
+        self.enters = 0
+        self.exits = 0
+        self.heartbeats = 0
+        self.retries = 0
+
+    def update(
+        self, tag_ids: Iterable[int], now: Optional[float] = None
+    ) -> List[PresenceEvent]:
+        """Registra os ids vistos num frame e retorna os eventos gerados."""
+        now = time.time() if now is None else now
+        events: List[PresenceEvent] = []
+        with self._lock:
+            for tag_id in set(tag_ids):
+                state = self._tags.get(tag_id)
+                if state is None:
+                    state = self._tags[tag_id] = _TagState(now)
+                state.last_seen = now
+                state.hits += 1
+                if not state.present and state.hits >= self.enter_frames:
+                    state.present = True
+                    state.last_emit = now
+                    self.enters += 1
+                    events.append(
+                        PresenceEvent(ENTER, tag_id, now, now - state.first_seen)
+                    )
+                elif (
+                    state.present
+                    and self.heartbeat_s
+                    and now - state.last_emit >= self.heartbeat_s
+                ):
+                    # heartbeat só para tag vista neste frame (não durante o TTL)
+                    state.last_emit = now
+                    self.heartbeats += 1
+                    events.append(
+                        PresenceEvent(HEARTBEAT, tag_id, now, now - state.first_seen)
+                    )
+            events.extend(self._expire(now))
+        return events
+
+    def _expire(self, now: float) -> List[PresenceEvent]:
+        """Saídas por TTL (chamar com o lock adquirido)."""
+        events = []
+        for tag_id, state in list(self._tags.items()):
+            if now - state.last_seen <= self.exit_after_s:
+                continue
+            del self._tags[tag_id]
+            if state.present:
+                self.exits += 1
+                events.append(
+                    PresenceEvent(EXIT, tag_id, now, state.last_seen - state.first_seen)
+                )
+        return events
+
+    def retry(self, tag_id: int) -> None:
+        """O envio da entrada falhou: volta a tag para candidata, para que a próxima
+        vez que ela for vista gere um novo ``enter``."""
+        with self._lock:
+            state = self._tags.get(tag_id)
+            if state is not None and state.present:
+                state.present = False
+                state.hits = self.enter_frames - 1
+                self.retries += 1
+
+    def flush(self, now: Optional[float] = None) -> List[PresenceEvent]:
+        """Encerra todas as tags (ex.: captura parada): ``exit`` para as presentes."""
+        now = time.time() if now is None else now
+        with self._lock:
+            events = [
+                PresenceEvent(EXIT, tag_id, now, state.last_seen - state.first_seen)
+                for tag_id, state in self._tags.items()
+                if state.present
+            ]
+            self.exits += len(events)
+            self._tags.clear()
+        return events
+
+    def present(self) -> List[int]:
+        with self._lock:
+            return sorted(t for t, s in self._tags.items() if s.present)
+
+    def stats(self) -> dict:
+        with self._lock:
+            present = sorted(t for t, s in self._tags.items() if s.present)
+            return {
+                "present": present,
+                "candidates": len(self._tags) - len(present),
+                "enters": self.enters,
+                "exits": self.exits,
+                "heartbeats": self.heartbeats,
+                "retries": self.retries,
+                "enter_frames": self.enter_frames,
+                "exit_after_s": self.exit_after_s,
+                "heartbeat_s": self.heartbeat_s or None,
+            }
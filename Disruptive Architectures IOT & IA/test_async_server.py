@@ -0,0 +1,90 @@
+"""
+Testes do servidor asyncio: leitura da requisição (Content-Length inválido ou grande
+demais) e repasse das demais rotas ao app WSGI. Cada teste sobe o servidor numa porta
+livre de 127.0.0.1.
+
+    python -m pytest -q test_async_server.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from async_server import MAX_BODY_BYTES, AsyncStreamServer
+
+
+class _EchoApp:
+    """App WSGI que responde o tamanho do corpo recebido."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, environ, start_response):
+        self.calls += 1
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length)
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [json.dumps({"path": environ["PATH_INFO"], "len": len(body)}).encode()]
+
+
+def _exchange(server, raw: bytes):
+    """Envia ``raw`` e devolve (status, corpo JSON) da resposta."""
+
+    async def run():
+        srv = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5.0)
+            writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return int(head.split(b" ", 2)[1]), json.loads(body)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def app():
+    return _EchoApp()
+
+
+@pytest.fixture
+def server(app):
+    return AsyncStreamServer(app, lambda cam_id: None, wsgi_workers=2)
+
+
+def _post(length_header: str, body: bytes = b"") -> bytes:
+    return (
+        f"POST /start HTTP/1.1\r\nHost: x\r\nContent-Length: {length_header}\r\n\r\n"
+    ).encode() + body
+
+
+def test_body_is_passed_to_wsgi(server, app):
+    status, body = _exchange(server, _post("5", b"12345"))
+    assert status == 200
+    assert body == {"path": "/start", "len": 5}
+    assert app.calls == 1
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "+5", "1_0", "5 5"])
+def test_invalid_content_length_is_400(server, app, length):
+    status, body = _exchange(server, _post(length, b"12345"))
+    assert status == 400
+    assert body["ok"] is False
+    assert app.calls == 0
+
+
+def test_oversized_body_is_413_not_truncated(server, app):
+    status, body = _exchange(server, _post(str(MAX_BODY_BYTES + 1)))
+    assert status == 413
+    assert body["ok"] is False
+    assert app.calls == 0
+
+
+def test_stream_of_unknown_pipeline_is_404(server, app):
+    status, body = _exchange(server, b"GET /cameras/7/stream HTTP/1.1\r\n\r\n")
+    assert status == 404
+    assert app.calls == 0
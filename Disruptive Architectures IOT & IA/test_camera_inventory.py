@@ -0,0 +1,164 @@
+"""
+Testes do inventário de câmeras: /cameras responde da memória, renovação por TTL e por
+hot-plug, dispositivos em uso nunca são abertos, sondagem presa vira "timeout" sem ser
+repetida, e a thread sobrevive a erros. Os dispositivos são falsos.
+
+    python -m pytest -q test_camera_inventory.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import camera_inventory
+from camera_inventory import CameraInventory
+
+
+class _Cap:
+    def __init__(self, opened):
+        self.opened = opened
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.released = True
+
+
+class _Devices:
+    """``open_device`` falso: ``present`` abrem, ``hanging`` travam até ``unblock``."""
+
+    def __init__(self, present=(), hanging=()):
+        self.present = set(present)
+        self.hanging = set(hanging)
+        self.gate = threading.Event()
+        self.opened = []
+        self.caps = []
+        self.lock = threading.Lock()
+
+    def __call__(self, index):
+        with self.lock:
+            self.opened.append(index)
+        if index in self.hanging:
+            self.gate.wait(5.0)
+        cap = _Cap(index in self.present)
+        self.caps.append(cap)
+        return cap
+
+    def unblock(self):
+        self.gate.set()
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    """Lista de /dev/video* falsa (None: sem hot-plug, sonda todos os índices)."""
+    current = {"value": None}
+    monkeypatch.setattr(camera_inventory, "video_nodes", lambda: current["value"])
+    return current
+
+
+@pytest.fixture
+def inventory(nodes):
+    created = []
+
+    def make(devices, **kwargs):
+        kwargs.setdefault("max_index", 4)
+        kwargs.setdefault("probe_timeout_s", 0.5)
+        kwargs.setdefault("poll_s", 0.1)
+        inv = CameraInventory(devices, **kwargs)
+        created.append((inv, devices))
+        inv.start()
+        assert inv.wait_ready(3.0)
+        return inv
+
+    yield make
+    for _, devices in created:
+        devices.unblock()
+
+
+def _ids(inv):
+    return [(c["id"], c["in_use"]) for c in inv.cameras()]
+
+
+def test_cameras_are_served_from_memory(inventory):
+    devices = _Devices(present={0, 2})
+    inv = inventory(devices)
+    assert _ids(inv) == [(0, False), (2, False)]
+    opened = len(devices.opened)
+    for _ in range(5):
+        inv.cameras()
+    assert len(devices.opened) == opened == 4
+    assert all(cap.released for cap in devices.caps)
+    assert [c["id"] for c in inv.cameras(max_index=1)] == [0]
+
+
+def test_ttl_renews_in_background(inventory):
+    devices = _Devices(present={0})
+    inv = inventory(devices, ttl_s=0.2)
+    devices.present.add(1)  # câmera ligada depois da primeira sondagem
+    deadline = time.monotonic() + 3.0
+    while _ids(inv) != [(0, False), (1, False)] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert _ids(inv) == [(0, False), (1, False)]
+    assert inv.stats()["refreshes"] >= 2
+
+
+def test_in_use_devices_are_never_opened(inventory):
+    devices = _Devices(present={0, 1})
+    inv = inventory(devices, in_use=lambda: {1})
+    assert inv.refresh(3.0)
+    assert 1 not in devices.opened
+    assert _ids(inv) == [(0, False), (1, True)]
+
+
+def test_hung_probe_is_timeout_and_not_repeated(inventory):
+    devices = _Devices(present={0, 2}, hanging={2})
+    inv = inventory(devices, probe_timeout_s=0.1)
+    assert _ids(inv) == [(0, False)]  # travou ao abrir: não é listado
+    stats = inv.stats()
+    assert stats["timeouts"] == 1
+    assert stats["probing"] == [2]
+    assert not inv.wait_idle(2, timeout=0.05)
+
+    assert inv.refresh(3.0)
+    assert devices.opened.count(2) == 1  # a sondagem presa não é empilhada
+    assert inv.stats()["timeouts"] == 1
+
+    devices.unblock()
+    assert inv.wait_idle(2, timeout=1.0)
+    assert inv.wait_idle(3, timeout=0.0)  # sem sondagem no índice: livre na hora
+    assert inv.refresh(3.0)
+    assert _ids(inv) == [(0, False), (2, False)]
+
+
+def test_thread_survives_probe_errors(inventory):
+    failures = {"left": 1}
+
+    def in_use():
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("falha ao listar os pipelines")
+        return set()
+
+    devices = _Devices(present={0})
+    inv = CameraInventory(devices, in_use=in_use, max_index=2, poll_s=0.1)
+    inv.start()
+    assert inv.wait_ready(3.0)  # a primeira tentativa falhou, a seguinte não
+    assert inv.stats()["errors"] == 1
+    assert [c["id"] for c in inv.cameras()] == [0]
+
+
+def test_hotplug_refreshes_before_ttl(inventory, nodes):
+    nodes["value"] = frozenset({0})
+    devices = _Devices(present={0, 1})
+    inv = inventory(devices, ttl_s=3600.0)
+    assert _ids(inv) == [(0, False)]
+    assert devices.opened == [0]  # sem /dev/videoN: ausente sem abrir
+    nodes["value"] = frozenset({0, 1})
+    deadline = time.monotonic() + 3.0
+    while len(_ids(inv)) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert _ids(inv) == [(0, False), (1, False)]
+    assert inv.stats()["hotplug"] is True
@@ -0,0 +1,117 @@
+"""
+Testes do circuit breaker: abre após ``failure_threshold`` falhas, recusa com
+``CircuitOpenError``, fica meio-aberto depois de ``reset_timeout_s`` e fecha ou reabre
+conforme a chamada de prova. O relógio do módulo é substituído por um relógio manual.
+
+    python -m pytest -q test_circuit_breaker.py
+"""
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.check()
+        breaker.record_failure()
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout_s=10.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.opens == 1
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=10.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_open_rejects_without_calling(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=10.0)
+    _open(breaker)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert not breaker.allow()
+    stats = breaker.stats()
+    assert stats["rejected"] == 2
+    assert stats["retry_in_s"] == 10.0
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=10.0)
+    _open(breaker)
+    clock.now += 9.9
+    assert breaker.state == OPEN
+    clock.now += 0.1
+    assert breaker.state == HALF_OPEN
+    breaker.check()  # chamada de prova
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=10.0)
+    _open(breaker)
+    clock.now += 10.0
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.opens == 2
+    clock.now += 5.0
+    assert breaker.state == OPEN  # mais um reset_timeout_s inteiro
+
+
+def test_half_open_limits_probes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=1.0, half_open_max=2)
+    _open(breaker)
+    clock.now += 1.0
+    assert breaker.allow()
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_on_change_reports_transitions(clock):
+    changes = []
+    breaker = CircuitBreaker(
+        failure_threshold=1,
+        reset_timeout_s=1.0,
+        on_change=lambda old, new: changes.append((old, new)),
+    )
+    _open(breaker)
+    clock.now += 1.0
+    breaker.check()
+    breaker.record_success()
+    assert changes == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
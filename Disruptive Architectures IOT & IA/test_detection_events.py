@@ -0,0 +1,126 @@
+"""
+Testes do ``DetectionEvents`` (/events): no modo "change" só sai evento quando o
+conjunto de tags visíveis muda, no modo "frame" sai a cada frame, e cada resultado é
+serializado uma vez.
+
+    python -m pytest -q test_detection_events.py
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+
+from detection_events import DetectionEvents
+from detection_result import DetectionResult
+
+
+def _result(frame_seq, *tag_ids):
+    ids = np.array(tag_ids, dtype=np.int32).reshape(-1, 1) if tag_ids else None
+    corners = [np.zeros((1, 4, 2), np.float32) for _ in tag_ids]
+    return DetectionResult(0, frame_seq, 1000.0 + frame_seq, corners, ids)
+
+
+def _frames(events, mode, last=0):
+    """Eventos disponíveis agora, em ordem (sem esperar)."""
+    out = []
+    while True:
+        event = events.wait_event(last, mode=mode, timeout=0.01)
+        if event is None:
+            return out
+        last, payload = event
+        out.append((last, json.loads(payload)))
+
+
+def test_change_mode_emits_only_on_change():
+    events = DetectionEvents()
+    events.publish(_result(1, 3))
+    seq, payload = events.wait_event(0, mode="change", timeout=0.1)
+    assert seq == 1
+    assert json.loads(payload)["changed"] is True
+
+    events.publish(_result(2, 3))  # mesmas tags: nada no modo change
+    events.publish(_result(3, 3))
+    assert events.wait_event(seq, mode="change", timeout=0.05) is None
+
+    events.publish(_result(4, 3, 7))
+    seq, payload = events.wait_event(seq, mode="change", timeout=0.1)
+    data = json.loads(payload)
+    assert seq == 4
+    assert data["changed"] is True
+    assert [m["id"] for m in data["markers"]] == [3, 7]
+    assert events.stats()["changes"] == 2
+
+
+def test_change_mode_returns_latest_frame():
+    events = DetectionEvents()
+    events.publish(_result(1, 3))
+    events.publish(_result(2, 3))  # mudou no seq 1, o mais novo é o 2
+    seq, payload = events.wait_event(0, mode="change", timeout=0.1)
+    data = json.loads(payload)
+    assert (seq, data["frame_seq"], data["changed"]) == (2, 2, False)
+    assert events.wait_event(seq, mode="change", timeout=0.05) is None
+
+
+def test_frame_mode_emits_every_frame():
+    events = DetectionEvents()
+    seqs = []
+    last = 0
+    for frame_seq in (1, 2, 3):
+        events.publish(_result(frame_seq, 3))
+        last, _ = events.wait_event(last, mode="frame", timeout=0.1)
+        seqs.append(last)
+    assert seqs == [1, 2, 3]
+
+
+def test_tags_leaving_is_a_change():
+    events = DetectionEvents()
+    events.publish(_result(1, 3))
+    events.publish(_result(2))
+    events.publish(_result(3))
+    frames = _frames(events, "change", last=1)
+    assert [(seq, data["count"]) for seq, data in frames] == [(3, 0)]
+
+
+def test_waiter_wakes_on_change():
+    events = DetectionEvents()
+    events.publish(_result(1, 3))
+    got = []
+    with events.client():
+        waiter = threading.Thread(
+            target=lambda: got.append(events.wait_event(1, "change", timeout=2.0))
+        )
+        waiter.start()
+        time.sleep(0.05)
+        events.publish(_result(2, 3))  # sem mudança: continua esperando
+        time.sleep(0.05)
+        assert waiter.is_alive()
+        events.publish(_result(3, 5))
+        waiter.join(1.0)
+    assert not waiter.is_alive()
+    assert got[0][0] == 3
+
+
+def test_clear_restarts_change_tracking():
+    events = DetectionEvents()
+    events.publish(_result(1, 3))
+    events.clear()
+    assert events.wait_event(0, mode="frame", timeout=0.05) is None
+    # captura reiniciada: o primeiro frame é mudança mesmo com as mesmas tags
+    events.publish(_result(1, 3))
+    seq, payload = events.wait_event(1, mode="change", timeout=0.1)
+    assert seq == 2
+    assert json.loads(payload)["changed"] is True
+
+
+def test_serializes_once_per_seq(monkeypatch):
+    events = DetectionEvents()
+    result = _result(1, 3)
+    calls = []
+    to_dict = result.to_dict
+    monkeypatch.setattr(result, "to_dict", lambda: calls.append(1) or to_dict())
+    events.publish(result)
+    first = events.wait_event(0, mode="frame", timeout=0.1)
+    assert events.wait_event(0, mode="change", timeout=0.1) == first
+    assert len(calls) == 1
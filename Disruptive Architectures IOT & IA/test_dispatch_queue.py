@@ -0,0 +1,100 @@
+"""
+Testes da fila de despacho: coalescência por chave, overflow e drenagem pelos workers.
+
+    python -m pytest -q test_dispatch_queue.py
+"""
+
+import threading
+
+import pytest
+
+from dispatch_queue import DispatchQueue
+
+
+def _pending(queue):
+    with queue._cond:
+        return list(queue._items.values())
+
+
+def test_coalesce_keeps_position_and_updates_item():
+    queue = DispatchQueue(lambda item: None, maxsize=8, policy="coalesce")
+    assert queue.submit("a1", key="a")
+    assert queue.submit("b1", key="b")
+    assert queue.submit("a2", key="a")  # fundido, não ocupa outra vaga
+    assert _pending(queue) == ["a2", "b1"]
+    stats = queue.stats()
+    assert stats["depth"] == 2
+    assert stats["enqueued"] == 2
+    assert stats["coalesced"] == 1
+
+
+def test_items_without_key_are_not_coalesced():
+    queue = DispatchQueue(lambda item: None, maxsize=8, policy="coalesce")
+    queue.submit("x")
+    queue.submit("x")
+    assert queue.depth() == 2
+    assert queue.stats()["coalesced"] == 0
+
+
+@pytest.mark.parametrize("policy", ["drop_oldest", "coalesce"])
+def test_overflow_drops_oldest(policy):
+    queue = DispatchQueue(lambda item: None, maxsize=3, policy=policy)
+    results = [queue.submit(i, key=i) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert _pending(queue) == [2, 3, 4]
+    assert queue.stats()["dropped"] == 2
+
+
+def test_drop_oldest_ignores_keys():
+    queue = DispatchQueue(lambda item: None, maxsize=8, policy="drop_oldest")
+    queue.submit("a1", key="a")
+    queue.submit("a2", key="a")
+    assert _pending(queue) == ["a1", "a2"]
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        DispatchQueue(lambda item: None, policy="lifo")
+
+
+def test_workers_drain_queue_and_count_errors():
+    handled = []
+    done = threading.Event()
+
+    def handler(item):
+        if item == "falha":
+            raise RuntimeError("backend fora")
+        handled.append(item)
+        if len(handled) == 3:
+            done.set()
+
+    queue = DispatchQueue(handler, maxsize=16, workers=2, name="teste")
+    for item in ["a", "falha", "b", "c"]:
+        queue.submit(item)
+    queue.start()
+    assert done.wait(2.0)
+    queue.stop()
+    assert sorted(handled) == ["a", "b", "c"]
+    stats = queue.stats()
+    assert stats["processed"] == 4
+    assert stats["errors"] == 1
+    assert stats["depth"] == 0
+
+
+def test_concurrent_start_launches_one_pool():
+    queue = DispatchQueue(lambda item: None, workers=3)
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        queue.start()
+
+    starters = [threading.Thread(target=start) for _ in range(8)]
+    for t in starters:
+        t.start()
+    for t in starters:
+        t.join()
+    assert queue.stats()["workers"] == 3
+    queue.start()  # idempotente
+    assert len(queue._threads) == 3
+    queue.stop()
@@ -0,0 +1,103 @@
+"""
+Testes do ring de frames: reuso dos slots, contagem de referências, stall com todos os
+slots presos, abort, reset e views somente leitura.
+
+    python -m pytest -q test_frame_ring.py
+"""
+
+import numpy as np
+import pytest
+
+from frame_ring import FrameRef, FrameRing
+
+SHAPE = (4, 6, 3)
+
+
+def _write(ring, value):
+    """Simula um ``cap.read(buf)``: escreve no buffer do slot (aloca no 1º uso)."""
+    slot, buf = ring.acquire_write()
+    if buf is None:
+        buf = np.empty(SHAPE, np.uint8)
+    buf[:] = value
+    return ring.commit(slot, buf)
+
+
+def test_slots_are_reused_without_new_allocations():
+    ring = FrameRing(slots=3)
+    for value in range(10):
+        _write(ring, value).release()
+    stats = ring.stats()
+    assert stats["allocations"] == 3
+    assert stats["generation"] == 10
+    assert stats["in_use"] == 0
+    with ring.latest() as ref:
+        assert ref.array[0, 0, 0] == 9
+        assert ref.generation == 10
+
+
+def test_referenced_slot_is_not_overwritten():
+    ring = FrameRing(slots=3)
+    held = _write(ring, 1)
+    for value in range(2, 8):
+        _write(ring, value).release()
+    assert np.all(held.array == 1)
+    assert ring.stats()["in_use"] == 1
+    held.release()
+    held.release()  # liberar duas vezes não desconta outra referência
+    assert ring.stats()["in_use"] == 0
+
+
+def test_stall_when_every_slot_is_held():
+    ring = FrameRing(slots=2)
+    first = _write(ring, 1)
+    second = _write(ring, 2)  # o mais recente nunca é reescrito
+    assert ring.acquire_write() is None
+    assert ring.stats()["stalls"] == 1
+    first.release()
+    slot, buf = ring.acquire_write()
+    assert slot == first.slot
+    assert buf is not None  # o buffer do slot é reaproveitado
+    ring.abort(slot)
+    second.release()
+
+
+def test_retain_keeps_slot_until_every_reference_is_released():
+    ring = FrameRing(slots=2)
+    ref = _write(ring, 1)
+    extra = ref.retain()
+    ref.release()
+    _write(ring, 2).release()
+    assert ring.acquire_write() is None  # slot 0 ainda preso por ``extra``
+    extra.release()
+    assert ring.acquire_write() is not None
+
+
+def test_abort_returns_slot():
+    ring = FrameRing(slots=2)
+    slot, _buf = ring.acquire_write()
+    ring.abort(slot)
+    assert ring.acquire_write()[0] == slot
+    assert not ring.has_frame()
+
+
+def test_latest_and_reset():
+    ring = FrameRing(slots=2)
+    assert ring.latest() is None
+    assert ring.shape is None
+    _write(ring, 3).release()
+    assert ring.has_frame()
+    assert ring.shape == SHAPE
+    ring.reset()
+    assert ring.latest() is None
+    assert ring.stats()["allocations"] == 1  # buffers continuam alocados
+
+
+def test_views_are_read_only():
+    ring = FrameRing(slots=2)
+    with _write(ring, 1) as ref:
+        with pytest.raises(ValueError):
+            ref.array[0, 0, 0] = 5
+    wrapped = FrameRef.wrap(np.zeros(SHAPE, np.uint8))
+    with pytest.raises(ValueError):
+        wrapped.array[0, 0, 0] = 5
+    wrapped.release()
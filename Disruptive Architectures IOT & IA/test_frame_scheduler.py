@@ -0,0 +1,89 @@
+"""
+Testes do agendador do loop de captura: período efetivo (alvo x FPS da fonte), replays
+sem ritmo e descarte de frames atrasados. O relógio e o ``sleep`` do módulo são
+substituídos por um relógio manual.
+
+    python -m pytest -q test_frame_scheduler.py
+"""
+
+import pytest
+
+import frame_scheduler
+from frame_scheduler import FrameScheduler
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(frame_scheduler.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(frame_scheduler.time, "sleep", clock.sleep)
+    return clock
+
+
+def _run(scheduler, clock, frames, busy_s):
+    """Roda ``frames`` iterações de ``busy_s`` cada; retorna os descartes pedidos."""
+    skips = []
+    for _ in range(frames):
+        scheduler.frame_start()
+        clock.now += busy_s
+        skips.append(scheduler.frame_done())
+    return skips
+
+
+@pytest.mark.parametrize(
+    "target, source, expected",
+    [(30.0, 0.0, 30.0), (30.0, 10.0, 10.0), (30.0, 60.0, 30.0), (0.0, 12.0, 12.0)],
+)
+def test_effective_fps(clock, target, source, expected):
+    scheduler = FrameScheduler(target_fps=target)
+    scheduler.reset(source_fps=source)
+    assert scheduler.fps == expected
+    t0 = clock.now
+    _run(scheduler, clock, 31, busy_s=0.001)
+    assert clock.now - t0 == pytest.approx(31 / expected, rel=0.05)
+    assert scheduler.stats()["source_fps"] == (source or None)
+
+
+def test_unpaced_replay_ignores_target_and_never_skips(clock):
+    scheduler = FrameScheduler(target_fps=30.0, latency_budget_s=0.01)
+    scheduler.reset(unpaced=True)
+    assert scheduler.fps == 0.0
+    skips = _run(scheduler, clock, 50, busy_s=0.02)  # acima do orçamento
+    assert skips == [0] * 50
+    assert clock.slept == 0.0
+    assert scheduler.stats()["unpaced"] is True
+
+
+def test_late_frames_skip_missed_periods(clock):
+    scheduler = FrameScheduler(target_fps=10.0, latency_budget_s=0.05, max_skip=5)
+    assert _run(scheduler, clock, 1, busy_s=0.01) == [0]
+    # 0,35 s num período de 0,1 s: perdeu dois períodos inteiros
+    assert _run(scheduler, clock, 1, busy_s=0.35) == [2]
+    assert scheduler.stats()["late"] == 1
+    # reancorado: o próximo frame em dia não herda o atraso
+    assert _run(scheduler, clock, 1, busy_s=0.01) == [0]
+
+
+def test_skip_is_capped(clock):
+    scheduler = FrameScheduler(target_fps=30.0, latency_budget_s=0.05, max_skip=3)
+    _run(scheduler, clock, 1, busy_s=0.001)
+    assert _run(scheduler, clock, 1, busy_s=2.0) == [3]
+
+
+def test_unlimited_target_skips_one_when_over_budget(clock):
+    scheduler = FrameScheduler(target_fps=0.0, latency_budget_s=0.05)
+    assert _run(scheduler, clock, 2, busy_s=0.1) == [1, 1]
+    assert clock.slept == 0.0
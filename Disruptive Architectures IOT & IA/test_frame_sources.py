@@ -0,0 +1,128 @@
+"""
+Testes do ``parse_descriptor`` (normalização e validação dos descritores de fonte
+recebidos no /start; um descritor inválido vira ValueError -> HTTP 400) e do ritmo dos
+replays.
+
+    python -m pytest -q test_frame_sources.py
+"""
+
+import os
+import time
+
+import pytest
+
+from frame_sources import (
+    MAX_SYNTHETIC_FRAMES,
+    MAX_SYNTHETIC_SIZE,
+    SyntheticSource,
+    parse_descriptor,
+)
+
+
+@pytest.mark.parametrize(
+    "descriptor, expected",
+    [
+        (None, {"type": "device", "index": 0}),
+        (2, {"type": "device", "index": 2}),
+        ("3", {"type": "device", "index": 3}),
+        ("synthetic", {"type": "synthetic"}),
+        (
+            {"type": "synthetic", "frames": "30", "size": ["640", 480], "fps": "15"},
+            {"type": "synthetic", "frames": 30, "size": (640, 480), "fps": 15.0},
+        ),
+        (
+            {"type": "device", "index": 1.0, "realtime": False},
+            {"type": "device", "index": 1, "realtime": False},
+        ),
+    ],
+)
+def test_valid_descriptors(descriptor, expected):
+    assert parse_descriptor(descriptor) == expected
+
+
+@pytest.mark.parametrize(
+    "descriptor",
+    [
+        True,
+        [0],
+        {"type": "ftp"},
+        {"type": "device", "index": -1},
+        {"type": "device", "index": 1.5},
+        {"type": "synthetic", "frames": 0},
+        {"type": "synthetic", "frames": "muitos"},
+        {"type": "synthetic", "seed": True},
+        {"type": "synthetic", "fps": "rápido"},
+        {"type": "synthetic", "fps": 5000},
+        {"type": "synthetic", "realtime": "false"},
+        {"type": "synthetic", "loop": 1},
+        {"type": "synthetic", "size": "640x480"},
+        {"type": "synthetic", "size": [640]},
+        {"type": "synthetic", "size": [640, 0]},
+        {"type": "synthetic", "dict": "DICT_NAO_EXISTE"},
+        {"type": "video"},
+    ],
+)
+def test_invalid_descriptors(descriptor):
+    with pytest.raises(ValueError):
+        parse_descriptor(descriptor)
+
+
+def test_synthetic_corpus_limits():
+    max_w, max_h = MAX_SYNTHETIC_SIZE
+    parse_descriptor({"type": "synthetic", "frames": MAX_SYNTHETIC_FRAMES})
+    parse_descriptor({"type": "synthetic", "frames": 10, "size": [max_w, max_h]})
+    for descriptor in [
+        {"type": "synthetic", "frames": MAX_SYNTHETIC_FRAMES + 1},
+        {"type": "synthetic", "frames": 100000, "size": [8000, 8000]},
+        {"type": "synthetic", "size": [max_w + 1, 480]},
+        {"type": "synthetic", "size": [640, max_h + 1]},
+        # cada campo dentro do limite, mas o corpus inteiro não cabe na memória
+        {"type": "synthetic", "frames": MAX_SYNTHETIC_FRAMES, "size": [max_w, max_h]},
+    ]:
+        with pytest.raises(ValueError):
+            parse_descriptor(descriptor)
+
+
+def test_paths_are_confined_to_media_root(tmp_path):
+    root = tmp_path / "media"
+    (root / "fotos").mkdir(parents=True)
+    (root / "video.mp4").write_bytes(b"")
+    (tmp_path / "fora").mkdir()
+    os.symlink(tmp_path / "fora", root / "atalho")
+
+    d = parse_descriptor("fotos", media_root=str(root))
+    assert d == {"type": "images", "path": str(root / "fotos")}
+    d = parse_descriptor({"type": "video", "path": "video.mp4"}, media_root=str(root))
+    assert d["path"] == str(root / "video.mp4")
+    for path in ["../fora", str(tmp_path / "fora"), "atalho", "nao_existe"]:
+        with pytest.raises(ValueError):
+            parse_descriptor({"type": "images", "path": path}, media_root=str(root))
+
+
+def test_paths_disabled_without_media_root():
+    with pytest.raises(ValueError):
+        parse_descriptor("/tmp", allow_paths=False)
+    with pytest.raises(ValueError):
+        parse_descriptor({"type": "video", "path": "/tmp/x.mp4"}, allow_paths=False)
+    # câmera e sintético continuam aceitos
+    assert parse_descriptor("synthetic", allow_paths=False) == {"type": "synthetic"}
+
+
+def test_take_pacing_hands_pacing_to_caller():
+    source = SyntheticSource(fps=5.0, realtime=True, frames=4, size=(320, 240))
+    assert not source.unpaced
+    assert source.take_pacing() == 5.0
+    t0 = time.monotonic()
+    for _ in range(4):
+        assert source.read()[0]
+    assert time.monotonic() - t0 < 0.5  # a 5 fps a fonte dormiria ~0,6 s
+    stats = source.stats()
+    assert stats["realtime"] is True  # o replay continua ritmado (pelo chamador)
+    assert stats["paced_by_caller"] is True
+
+
+def test_unpaced_replay_has_no_pacing_to_hand_over():
+    source = SyntheticSource(fps=5.0, realtime=False, frames=2, size=(320, 240))
+    assert source.unpaced
+    assert source.take_pacing() == 0.0
+    assert source.stats()["paced_by_caller"] is False
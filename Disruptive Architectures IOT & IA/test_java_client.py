@@ -0,0 +1,165 @@
+"""
+Testes do cliente da API Java: leitura do ``exp`` do JWT, agenda de renovação do token
+(antes do ``exp``, sem laço de logins com token de vida curta) e 401 -> relogin ->
+repetição única. A sessão HTTP e o relógio são substituídos por falsos.
+
+    python -m pytest -q test_java_client.py
+"""
+
+import base64
+import json
+
+import pytest
+
+import java_client
+from java_client import MIN_REFRESH_INTERVAL_S, JavaApiClient, jwt_expiry
+
+
+def _jwt(payload):
+    def part(data):
+        raw = base64.urlsafe_b64encode(json.dumps(data).encode())
+        return raw.rstrip(b"=").decode()
+
+    return f"{part({'alg': 'HS256'})}.{part(payload)}.assinatura"
+
+
+class _Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self._body = body or {}
+        self.text = json.dumps(self._body)
+
+    def json(self):
+        return self._body
+
+
+class _Session:
+    """Responde o login com um token novo e as demais URLs com ``responses``."""
+
+    def __init__(self, clock, lifetime_s=3600.0, responses=()):
+        self.clock = clock
+        self.lifetime_s = lifetime_s
+        self.responses = list(responses)
+        self.calls = []
+        self.issued = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs.get("headers")))
+        if url.endswith("/api/login"):
+            self.issued += 1
+            exp = self.clock.time() + self.lifetime_s
+            return _Response(200, {"tokenAcesso": _jwt({"exp": exp, "n": self.issued})})
+        return self.responses.pop(0)
+
+
+class _Clock:
+    def __init__(self):
+        self.wall = 1_700_000_000.0
+        self.mono = 1000.0
+
+    def time(self):
+        return self.wall
+
+    def monotonic(self):
+        return self.mono
+
+    def advance(self, seconds):
+        self.wall += seconds
+        self.mono += seconds
+
+
+class _Stop(Exception):
+    pass
+
+
+class _Wakeup:
+    """Event falso: cada ``wait`` avança o relógio e é registrado."""
+
+    def __init__(self, clock, max_waits):
+        self.clock = clock
+        self.max_waits = max_waits
+        self.waits = []
+
+    def set(self):
+        pass
+
+    def clear(self):
+        pass
+
+    def wait(self, timeout):
+        if len(self.waits) == self.max_waits:
+            raise _Stop()
+        self.waits.append(timeout)
+        self.clock.advance(timeout)
+        return False
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(java_client.time, "time", clock.time)
+    monkeypatch.setattr(java_client.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def _client(session):
+    client = JavaApiClient("http://backend", "a@b.c", "senha", refresh_margin_s=60.0)
+    client.session = session
+    return client
+
+
+def test_jwt_expiry():
+    assert jwt_expiry(_jwt({"exp": 1234})) == 1234.0
+    assert jwt_expiry(_jwt({"sub": "x"})) is None
+    assert jwt_expiry("nao.e.jwt") is None
+    assert jwt_expiry(None) is None
+
+
+def test_401_relogs_and_retries_once(clock):
+    session = _Session(clock, responses=[_Response(401), _Response(201)])
+    client = _client(session)
+    client.login()
+    r = client.post("http://backend/api/tags", json={"id": 1})
+    assert r.status_code == 201
+    urls = [url for _, url, _ in session.calls]
+    assert urls == [
+        "http://backend/api/login",
+        "http://backend/api/tags",
+        "http://backend/api/login",
+        "http://backend/api/tags",
+    ]
+    # a repetição leva o token novo
+    assert session.calls[1][2] != session.calls[3][2]
+    assert session.calls[3][2] == {"Authorization": f"Bearer {client.token}"}
+    assert client.stats()["retries_after_401"] == 1
+
+
+def test_second_401_is_not_retried_again(clock):
+    session = _Session(clock, responses=[_Response(401), _Response(401)])
+    client = _client(session)
+    assert client.get("http://backend/api/tags").status_code == 401
+    assert len(session.calls) == 3  # requisição, login, uma única repetição
+
+
+def test_refresh_before_expiry(clock):
+    session = _Session(clock, lifetime_s=3600.0)
+    client = _client(session)
+    client._refresh_wakeup = _Wakeup(clock, max_waits=3)
+    with pytest.raises(_Stop):
+        client._refresh_loop()
+    # renova margem (60 s) antes do exp de cada token
+    assert client._refresh_wakeup.waits == [3540.0, 3540.0, 3540.0]
+    assert client.logins == 4
+
+
+def test_short_lived_token_does_not_spin(clock):
+    # token que já nasce dentro da margem de renovação
+    session = _Session(clock, lifetime_s=2.0)
+    client = _client(session)
+    client._refresh_wakeup = _Wakeup(clock, max_waits=5)
+    with pytest.raises(_Stop):
+        client._refresh_loop()
+    waits = client._refresh_wakeup.waits
+    assert all(w >= MIN_REFRESH_INTERVAL_S for w in waits)
+    assert client.logins == len(waits) + 1
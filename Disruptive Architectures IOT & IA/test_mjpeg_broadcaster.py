@@ -0,0 +1,123 @@
+"""
+Testes do ``FrameBroadcaster``: um encode por frame e perfil, não importa quantos
+clientes de /stream peçam o mesmo perfil; perfis diferentes codificam à parte; um
+cliente nunca recebe um frame mais velho que o anterior.
+
+    python -m pytest -q test_mjpeg_broadcaster.py
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import mjpeg_broadcaster
+from frame_ring import FrameRef
+from mjpeg_broadcaster import FrameBroadcaster, StreamProfile
+
+
+def _frame(value, shape=(48, 64, 3)):
+    return FrameRef.wrap(np.full(shape, value, np.uint8))
+
+
+def _value(jpeg):
+    return int(round(cv2.imdecode(np.frombuffer(jpeg, np.uint8), 1).mean()))
+
+
+@pytest.fixture
+def encodes(monkeypatch):
+    """Conta os imencode; cada um demora um pouco para os clientes se sobreporem."""
+    calls = []
+    imencode = cv2.imencode
+
+    def slow_imencode(*args, **kwargs):
+        calls.append(args[1].shape)
+        time.sleep(0.02)
+        return imencode(*args, **kwargs)
+
+    monkeypatch.setattr(mjpeg_broadcaster.cv2, "imencode", slow_imencode)
+    return calls
+
+
+def _concurrent(count, fn):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5.0)
+    return results
+
+
+def test_same_profile_encodes_once(encodes):
+    broadcaster = FrameBroadcaster()
+    broadcaster.publish(_frame(100))
+    results = _concurrent(8, lambda i: broadcaster.wait_jpeg(0, timeout=2.0))
+    assert len(encodes) == 1
+    assert {seq for seq, _ in results} == {1}
+    assert len({jpeg for _, jpeg in results}) == 1
+    stats = broadcaster.stats()
+    assert stats["encodes"] == 1
+    assert stats["frames_served"] == 8
+
+
+def test_cached_jpeg_is_served_without_encode(encodes):
+    broadcaster = FrameBroadcaster()
+    broadcaster.publish(_frame(100))
+    first = broadcaster.wait_jpeg(0)
+    assert broadcaster.wait_jpeg(0) == first
+    assert len(encodes) == 1
+    assert broadcaster.wait_jpeg(1, timeout=0.05) is None  # nada mais novo
+
+
+def test_each_profile_encodes_separately(encodes):
+    broadcaster = FrameBroadcaster()
+    broadcaster.publish(_frame(100, shape=(240, 320, 3)))
+    profiles = [StreamProfile(), StreamProfile(width=160, quality=50)] * 3
+    results = _concurrent(6, lambda i: broadcaster.wait_jpeg(0, 2.0, profiles[i]))
+    assert sorted(encodes) == [(120, 160, 3), (240, 320, 3)]
+    small = cv2.imdecode(np.frombuffer(results[1][1], np.uint8), 1)
+    assert small.shape == (120, 160, 3)
+    assert broadcaster.stats()["profiles"]["160w/q50"]["encodes"] == 1
+
+
+def test_clients_never_go_backwards(encodes):
+    broadcaster = FrameBroadcaster()
+    done = threading.Event()
+    received = [[] for _ in range(4)]
+
+    def client(i):
+        last = 0
+        while not done.is_set():
+            result = broadcaster.wait_jpeg(last, timeout=0.2)
+            if result is not None:
+                last, jpeg = result
+                received[i].append((last, _value(jpeg)))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for seq in range(1, 31):
+        broadcaster.publish(_frame(seq * 8))
+        time.sleep(0.005)
+    time.sleep(0.1)
+    done.set()
+    for t in threads:
+        t.join(2.0)
+
+    for frames in received:
+        assert frames
+        seqs = [seq for seq, _ in frames]
+        assert seqs == sorted(set(seqs))  # sempre para a frente, sem repetir
+        # o JPEG entregue é o do seq informado
+        assert all(abs(value - seq * 8) <= 2 for seq, value in frames)
+    # clientes lentos pulam frames em vez de gerar um encode por frame publicado
+    assert len(encodes) <= 30
@@ -0,0 +1,138 @@
+"""
+Testes de precisão do pose.py: marcadores projetados com pose conhecida e cantos com
+ruído gaussiano, como saem do detectMarkers numa câmera real.
+
+    python -m pytest -q test_pose.py
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from pose import (
+    BATCH_MIN_MARKERS,
+    CameraIntrinsics,
+    PoseEstimator,
+    REAL_MARKER_SIZE_M,
+    _build_lut,
+)
+
+IMAGE_SIZE = (1280, 720)
+HALF = REAL_MARKER_SIZE_M / 2
+OBJECT_POINTS = np.array(
+    [[-HALF, HALF, 0], [HALF, HALF, 0], [HALF, -HALF, 0], [-HALF, -HALF, 0]]
+)
+
+
+def _scene(intrinsics, distance, count, noise_px, seed=0):
+    """Cantos projetados (com ruído) e posições verdadeiras de ``count`` marcadores."""
+    rng = np.random.default_rng(seed)
+    corners, truth = [], []
+    while len(corners) < count:
+        rvec = rng.uniform(-0.6, 0.6, 3)
+        tvec = np.array(
+            [rng.uniform(-0.3, 0.3), rng.uniform(-0.15, 0.15), 0.0]
+        ) * distance + [0, 0, distance]
+        projected, _ = cv2.projectPoints(
+            OBJECT_POINTS,
+            rvec,
+            tvec,
+            intrinsics.camera_matrix,
+            intrinsics.dist_coeffs,
+        )
+        projected = projected.reshape(4, 2)
+        w, h = intrinsics.image_size
+        if not np.all((projected >= 0) & (projected < [w - 1, h - 1])):
+            continue  # só marcadores inteiros dentro da imagem
+        corners.append(projected + rng.normal(0, noise_px, projected.shape))
+        truth.append(tvec)
+    return np.array(corners).reshape(-1, 1, 4, 2), np.array(truth)
+
+
+def _relative_errors(estimator, corners, truth):
+    batch = estimator.estimate(corners)
+    return np.linalg.norm(batch.positions - truth, axis=1) / np.linalg.norm(
+        truth, axis=1
+    )
+
+
+@pytest.mark.parametrize("distance", [0.5, 1.0, 1.5])
+def test_noisy_corners_stay_within_two_percent(distance):
+    intrinsics = CameraIntrinsics.default(IMAGE_SIZE)
+    corners, truth = _scene(intrinsics, distance, 200, noise_px=0.3)
+    errors = _relative_errors(PoseEstimator(intrinsics), corners, truth)
+    assert np.median(errors) < 0.02
+
+
+def test_exact_corners_recover_pose():
+    intrinsics = CameraIntrinsics.default(IMAGE_SIZE)
+    corners, truth = _scene(intrinsics, 1.0, 50, noise_px=0.0)
+    batch = PoseEstimator(intrinsics).estimate(corners)
+    np.testing.assert_allclose(batch.positions, truth, atol=1e-6)
+    # rotações ortonormais e coerentes com a translação: reprojetam os cantos
+    rotations = batch.rotations
+    np.testing.assert_allclose(
+        rotations @ rotations.transpose(0, 2, 1),
+        np.tile(np.eye(3), (50, 1, 1)),
+        atol=1e-9,
+    )
+    for i in range(50):
+        projected, _ = cv2.projectPoints(
+            OBJECT_POINTS,
+            batch.rvecs[i],
+            batch.tvecs[i],
+            intrinsics.camera_matrix,
+            intrinsics.dist_coeffs,
+        )
+        np.testing.assert_allclose(projected.reshape(4, 2), corners[i, 0], atol=1e-4)
+
+
+def test_distortion_lut_with_noise():
+    base = CameraIntrinsics.default(IMAGE_SIZE)
+    intrinsics = CameraIntrinsics(
+        base.camera_matrix, np.array([-0.25, 0.08, 0.001, -0.001, 0.0]), IMAGE_SIZE
+    )
+    corners, truth = _scene(intrinsics, 1.0, 100, noise_px=0.3)
+    estimator = PoseEstimator(intrinsics, lut=_build_lut(intrinsics))
+    errors = _relative_errors(estimator, corners, truth)
+    assert np.median(errors) < 0.02
+
+
+@pytest.mark.parametrize("count", [1, BATCH_MIN_MARKERS, 100])
+@pytest.mark.parametrize("noise_px", [0.0, 1.0])
+def test_matches_solvepnp_ippe_square(count, noise_px):
+    intrinsics = CameraIntrinsics.default(IMAGE_SIZE)
+    corners, _ = _scene(intrinsics, 1.0, count, noise_px=noise_px, seed=3)
+    batch = PoseEstimator(intrinsics).estimate(corners)
+    for i in range(count):
+        ok, rvec, tvec = cv2.solvePnP(
+            OBJECT_POINTS,
+            corners[i, 0],
+            intrinsics.camera_matrix,
+            None,
+            flags=cv2.SOLVEPNP_IPPE_SQUARE,
+        )
+        assert ok
+        np.testing.assert_allclose(batch.positions[i], tvec.ravel(), atol=1e-9)
+        np.testing.assert_allclose(
+            batch.rotations[i], cv2.Rodrigues(rvec)[0], atol=1e-9
+        )
+
+
+@pytest.mark.parametrize("good_count", [1, BATCH_MIN_MARKERS])
+def test_degenerate_marker_is_nan(good_count):
+    estimator = PoseEstimator(CameraIntrinsics.default(IMAGE_SIZE))
+    good, truth = _scene(estimator.intrinsics, 1.0, good_count, noise_px=0.0)
+    collapsed = np.full((1, 1, 4, 2), 300.0)  # quatro cantos no mesmo ponto
+    collinear = np.array([[[[100, 100], [200, 100], [300, 100], [400, 100]]]], float)
+    batch = estimator.estimate(np.concatenate([good, collapsed, collinear]))
+    assert len(batch) == good_count + 2
+    np.testing.assert_allclose(batch.positions[:good_count], truth, atol=1e-6)
+    assert np.all(np.isnan(batch.positions[good_count:]))
+    assert np.all(np.isnan(batch.rotations[good_count:]))
+    assert np.all(np.isnan(batch.rvecs[good_count:]))
+
+
+def test_no_markers():
+    estimator = PoseEstimator(CameraIntrinsics.default(IMAGE_SIZE))
+    assert estimator.estimate([]) is None
@@ -0,0 +1,63 @@
+"""
+Testes do ``StreamProfile.from_args``: parâmetros ``w``, ``q`` e ``fps`` de /stream.
+
+    python -m pytest -q test_stream_profile.py
+"""
+
+import pytest
+
+from mjpeg_broadcaster import (
+    JPEG_QUALITY,
+    MAX_QUALITY,
+    MIN_QUALITY,
+    MIN_WIDTH,
+    StreamProfile,
+)
+
+
+def test_defaults():
+    profile = StreamProfile.from_args({})
+    assert profile == StreamProfile(None, JPEG_QUALITY, None)
+    assert profile.encode_key == (None, JPEG_QUALITY)
+    assert profile.label == f"fullw/q{JPEG_QUALITY}"
+
+
+def test_default_quality_and_empty_values():
+    profile = StreamProfile.from_args({"w": "", "q": "", "fps": ""}, 60)
+    assert profile == StreamProfile(None, 60, None)
+
+
+def test_valid_values():
+    profile = StreamProfile.from_args({"w": "320", "q": "50", "fps": "7.5"})
+    assert profile == StreamProfile(320, 50, 7.5)
+    assert profile.encode_key == (320, 50)
+    assert profile.label == "320w/q50"
+
+
+def test_limits_are_inclusive():
+    low = StreamProfile.from_args({"w": str(MIN_WIDTH), "q": str(MIN_QUALITY)})
+    high = StreamProfile.from_args({"q": str(MAX_QUALITY)})
+    assert (low.width, low.quality, high.quality) == (
+        MIN_WIDTH,
+        MIN_QUALITY,
+        MAX_QUALITY,
+    )
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        {"w": "abc"},
+        {"q": "alta"},
+        {"fps": "x"},
+        {"w": "320.5"},
+        {"w": str(MIN_WIDTH - 1)},
+        {"q": str(MIN_QUALITY - 1)},
+        {"q": str(MAX_QUALITY + 1)},
+        {"fps": "0"},
+        {"fps": "-5"},
+    ],
+)
+def test_invalid_values(args):
+    with pytest.raises(ValueError):
+        StreamProfile.from_args(args)
@@ -0,0 +1,155 @@
+"""
+Testes do agrupador de tags: janela de tempo e de tamanho, fusão por chave, queda para
+POSTs individuais quando o backend não tem endpoint de lote e nova sondagem depois de
+``reprobe_s``.
+
+    python -m pytest -q test_tag_batcher.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import tag_batcher
+from tag_batcher import BulkNotSupported, BulkSupport, TagBatcher
+
+
+def _wait_until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class _Backend:
+    """Registra lotes e envios individuais; ``bulk`` diz se o lote existe."""
+
+    def __init__(self, bulk=True):
+        self.bulk = bulk
+        self.batches = []
+        self.singles = []
+        self.lock = threading.Lock()
+
+    def send_batch(self, items):
+        if not self.bulk:
+            raise BulkNotSupported()
+        with self.lock:
+            self.batches.append(list(items))
+        return True
+
+    def send_one(self, item):
+        with self.lock:
+            self.singles.append(item)
+        return True
+
+
+@pytest.fixture
+def batcher():
+    created = []
+
+    def make(backend, **kwargs):
+        kwargs.setdefault("window_s", 0.05)
+        b = TagBatcher(backend.send_batch, backend.send_one, **kwargs)
+        created.append(b)
+        return b
+
+    yield make
+    for b in created:
+        b.stop()
+
+
+def test_window_flushes_one_batch(batcher):
+    backend = _Backend()
+    b = batcher(backend, window_s=0.1)
+    t0 = time.monotonic()
+    for i in range(3):
+        b.add(i)
+    assert _wait_until(lambda: backend.batches)
+    # o primeiro item arma a janela: o lote não sai antes dela nem espera outro item
+    assert 0.08 <= time.monotonic() - t0 < 1.0
+    assert backend.batches == [[0, 1, 2]]
+    assert b.stats()["bulk_supported"] is True
+
+
+def test_full_batch_leaves_before_window(batcher):
+    backend = _Backend()
+    b = batcher(backend, max_size=4, window_s=5.0)
+    for i in range(4):
+        b.add(i)
+    assert _wait_until(lambda: backend.batches, timeout=1.0)
+    assert backend.batches == [[0, 1, 2, 3]]
+
+
+def test_same_key_is_coalesced(batcher):
+    backend = _Backend()
+    b = batcher(backend, window_s=0.1)
+    b.add("a1", key="a")
+    b.add("b1", key="b")
+    b.add("a2", key="a")
+    assert _wait_until(lambda: backend.batches)
+    assert backend.batches == [["a2", "b1"]]
+
+
+def test_falls_back_to_single_posts(batcher):
+    backend = _Backend(bulk=False)
+    b = batcher(backend)
+    b.add("a")
+    b.add("b")
+    assert _wait_until(lambda: len(backend.singles) == 2)
+    assert b.bulk_supported is False
+    # recusado: a próxima janela vai direto para os envios individuais
+    b.add("c")
+    assert _wait_until(lambda: len(backend.singles) == 3)
+    stats = b.stats()
+    assert stats["fanouts"] == 2
+    assert stats["batches"] == 0
+    assert backend.singles == ["a", "b", "c"]
+
+
+def test_reprobes_bulk_endpoint(batcher):
+    backend = _Backend(bulk=False)
+    b = batcher(backend, reprobe_s=0.2)
+    b.add("a")
+    assert _wait_until(lambda: backend.singles == ["a"])
+    backend.bulk = True  # o backend ganhou o endpoint num deploy
+    time.sleep(0.25)
+    b.add("b")
+    assert _wait_until(lambda: backend.batches)
+    assert backend.batches == [["b"]]
+    assert b.bulk_supported is True
+
+
+def test_stop_flushes_pending(batcher):
+    backend = _Backend()
+    b = batcher(backend, window_s=10.0)
+    b.add("a")
+    b.stop()
+    assert backend.batches == [["a"]]
+    assert b.pending() == 0
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bulk_support_reprobe(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(tag_batcher.time, "monotonic", clock)
+    bulk = BulkSupport(reprobe_s=10.0)
+    assert bulk.supported is None and not bulk.disabled()
+    bulk.refused()
+    assert bulk.disabled()
+    clock.now += 9.9
+    assert bulk.disabled()
+    clock.now += 0.1
+    assert not bulk.disabled()  # venceu: volta a sondar
+    assert bulk.supported is None
+    bulk.accepted()
+    assert bulk.supported is True and not bulk.disabled()
@@ -0,0 +1,195 @@
+"""
+Testes da outbox durável: reenvio do que ficou em disco depois de um reinício,
+idempotência por chave, expiração, limite de itens e dead letter. Cada teste usa um
+banco SQLite próprio em ``tmp_path``.
+
+    python -m pytest -q test_tag_outbox.py
+"""
+
+import time
+
+import pytest
+
+from tag_batcher import BulkNotSupported
+from tag_outbox import PermanentFailure, TagOutbox
+
+
+def _wait_until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "outbox.db")
+
+
+def _outbox(path, send_one, send_batch=None, **kwargs):
+    kwargs.setdefault("rate_per_s", 0)
+    kwargs.setdefault("backoff_base_s", 0.01)
+    kwargs.setdefault("backoff_max_s", 0.02)
+    return TagOutbox(send_batch, send_one, path=path, **kwargs)
+
+
+def test_items_survive_restart_and_replay_in_order(db_path):
+    first = _outbox(db_path, lambda item: False)  # processo cai antes de drenar
+    for i in range(3):
+        assert first.put({"tag": i}, key=f"k{i}")
+
+    sent = []
+    second = _outbox(db_path, lambda item: sent.append(item) or True)
+    assert second.pending() == 3
+    assert not second.put({"tag": 0}, key="k0")  # mesma chave: ignorada
+    assert second.stats()["duplicates"] == 1
+    second.start()
+    try:
+        assert _wait_until(lambda: second.pending() == 0)
+    finally:
+        second.stop()
+    assert sent == [{"tag": 0}, {"tag": 1}, {"tag": 2}]
+    assert second.sent == 3
+
+
+def test_transient_failure_retries_with_backoff(db_path):
+    calls = []
+
+    def send_one(item):
+        calls.append(item)
+        return len(calls) > 2  # backend volta na terceira tentativa
+
+    outbox = _outbox(db_path, send_one)
+    outbox.put("a", key="a")
+    outbox.start()
+    try:
+        assert _wait_until(lambda: outbox.sent == 1)
+    finally:
+        outbox.stop()
+    assert calls == ["a", "a", "a"]
+    stats = outbox.stats()
+    assert stats["failures"] == 2
+    assert stats["backoff_s"] == 0.0
+    assert stats["dead_letter"] == 0
+
+
+def test_expired_items_are_dropped_unsent(db_path):
+    sent = []
+    outbox = _outbox(db_path, lambda item: sent.append(item) or True, max_age_s=0.05)
+    outbox.put("velho", key="velho")
+    time.sleep(0.1)
+    outbox.start()
+    try:
+        assert _wait_until(lambda: outbox.expired == 1)
+    finally:
+        outbox.stop()
+    assert sent == []
+    assert outbox.pending() == 0
+
+
+def test_max_items_drops_oldest(db_path):
+    sent = []
+    outbox = _outbox(db_path, lambda item: sent.append(item) or True, max_items=2)
+    for key in "abc":
+        outbox.put(key, key=key)
+    assert outbox.pending() == 2
+    assert outbox.dropped == 1
+    outbox.start()
+    try:
+        assert _wait_until(lambda: outbox.pending() == 0)
+    finally:
+        outbox.stop()
+    assert sent == ["b", "c"]
+
+
+def test_permanent_failure_goes_to_dead_letter(db_path):
+    sent = []
+
+    def send_one(item):
+        if item == "ruim":
+            raise PermanentFailure("HTTP 400")
+        sent.append(item)
+        return True
+
+    def send_batch(items):
+        raise PermanentFailure("HTTP 400")  # o lote inteiro cai por um item
+
+    outbox = _outbox(db_path, send_one, send_batch)
+    for key in ["a", "ruim", "b"]:
+        outbox.put(key, key=key)
+    outbox.start()
+    try:
+        assert _wait_until(lambda: outbox.pending() == 0)
+    finally:
+        outbox.stop()
+    assert sent == ["a", "b"]
+    (dead,) = outbox.dead_letters()
+    assert (dead["key"], dead["item"], dead["reason"]) == ("ruim", "ruim", "HTTP 400")
+    assert outbox.stats()["dead_letter"] == 1
+
+
+def test_exhausted_attempts_go_to_dead_letter(db_path):
+    outbox = _outbox(db_path, lambda item: False, max_attempts=3)
+    outbox.put("a", key="a")
+    outbox.start()
+    try:
+        assert _wait_until(lambda: outbox.stats()["dead_letter"] == 1)
+    finally:
+        outbox.stop()
+    (dead,) = outbox.dead_letters()
+    assert dead["attempts"] == 3
+    assert dead["reason"].startswith("3 tentativas")
+    assert outbox.pending() == 0
+
+
+def test_falls_back_to_single_sends_without_bulk_endpoint(db_path):
+    sent = []
+
+    def send_batch(items):
+        raise BulkNotSupported()
+
+    outbox = _outbox(db_path, lambda item: sent.append(item) or True, send_batch)
+    for key in "ab":
+        outbox.put(key, key=key)
+    outbox.start()
+    try:
+        assert _wait_until(lambda: outbox.pending() == 0)
+    finally:
+        outbox.stop()
+    assert sent == ["a", "b"]
+    assert outbox.bulk_supported is False
+
+
+def test_reprobes_bulk_endpoint_after_ttl(db_path):
+    bulk_calls, sent = [], []
+    endpoint = {"exists": False}
+
+    def send_batch(items):
+        bulk_calls.append(list(items))
+        if not endpoint["exists"]:
+            raise BulkNotSupported()
+        sent.extend(items)
+        return True
+
+    outbox = _outbox(
+        db_path, lambda item: sent.append(item) or True, send_batch, reprobe_s=0.2
+    )
+    outbox.start()
+    try:
+        outbox.put("a", key="a")
+        assert _wait_until(lambda: outbox.pending() == 0)
+        assert outbox.bulk_supported is False
+        outbox.put("b", key="b")  # dentro do TTL: item a item, sem sondar o lote
+        assert _wait_until(lambda: outbox.pending() == 0)
+        assert len(bulk_calls) == 1
+        endpoint["exists"] = True  # deploy novo ganhou o endpoint
+        time.sleep(0.25)
+        outbox.put("c", key="c")
+        assert _wait_until(lambda: outbox.pending() == 0)
+    finally:
+        outbox.stop()
+    assert bulk_calls == [["a"], ["c"]]
+    assert sent == ["a", "b", "c"]
+    assert outbox.bulk_supported is True
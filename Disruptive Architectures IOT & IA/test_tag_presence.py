@@ -0,0 +1,75 @@
+"""
+Testes das transições de presença: candidata -> presente [enter], saída por TTL [exit],
+heartbeat, retry e flush. O relógio é passado explicitamente em cada ``update``.
+
+    python -m pytest -q test_tag_presence.py
+"""
+
+from tag_presence import ENTER, EXIT, HEARTBEAT, TagPresenceTracker
+
+
+def _kinds(events):
+    return [(e.kind, e.tag_id) for e in events]
+
+
+def test_enter_after_enter_frames():
+    tracker = TagPresenceTracker(enter_frames=3, exit_after_s=1.0)
+    assert tracker.update([7], now=0.0) == []
+    assert tracker.update([7], now=0.1) == []
+    events = tracker.update([7], now=0.2)
+    assert _kinds(events) == [(ENTER, 7)]
+    assert events[0].duration_s == 0.2
+    assert tracker.present() == [7]
+    # continua presente sem novo evento
+    assert tracker.update([7], now=0.3) == []
+
+
+def test_candidate_expires_without_event():
+    tracker = TagPresenceTracker(enter_frames=2, exit_after_s=1.0)
+    tracker.update([5], now=0.0)  # falso positivo de um frame
+    assert tracker.update([], now=1.5) == []
+    stats = tracker.stats()
+    assert stats["candidates"] == 0
+    assert stats["enters"] == stats["exits"] == 0
+
+
+def test_exit_after_ttl_not_on_short_occlusion():
+    tracker = TagPresenceTracker(enter_frames=1, exit_after_s=1.0)
+    assert _kinds(tracker.update([3], now=0.0)) == [(ENTER, 3)]
+    assert tracker.update([], now=0.8) == []  # oclusão curta
+    tracker.update([3], now=1.0)
+    assert tracker.update([], now=1.9) == []
+    events = tracker.update([], now=2.5)
+    assert _kinds(events) == [(EXIT, 3)]
+    assert events[0].duration_s == 1.0  # do primeiro ao último frame em que foi vista
+    assert tracker.present() == []
+
+
+def test_heartbeat_only_while_seen():
+    tracker = TagPresenceTracker(enter_frames=1, exit_after_s=5.0, heartbeat_s=1.0)
+    tracker.update([1], now=0.0)
+    assert tracker.update([1], now=0.5) == []
+    assert _kinds(tracker.update([1], now=1.0)) == [(HEARTBEAT, 1)]
+    assert tracker.update([], now=3.0) == []  # sem ser vista: sem heartbeat
+    assert _kinds(tracker.update([1], now=3.1)) == [(HEARTBEAT, 1)]
+    assert tracker.stats()["heartbeats"] == 2
+
+
+def test_retry_emits_new_enter_on_next_sighting():
+    tracker = TagPresenceTracker(enter_frames=3, exit_after_s=5.0)
+    for t in (0.0, 0.1, 0.2):
+        tracker.update([9], now=t)
+    tracker.retry(9)
+    assert tracker.present() == []
+    assert _kinds(tracker.update([9], now=0.3)) == [(ENTER, 9)]
+    assert tracker.stats()["retries"] == 1
+
+
+def test_flush_exits_present_tags_only():
+    tracker = TagPresenceTracker(enter_frames=2, exit_after_s=5.0)
+    tracker.update([1, 2], now=0.0)
+    tracker.update([1], now=0.1)
+    events = tracker.flush(now=0.5)
+    assert _kinds(events) == [(EXIT, 1)]
+    assert tracker.stats()["candidates"] == 0
+    assert tracker.present() == []
@@ -0,0 +1,239 @@
+"""
+Ajuste automático de ``cv2.aruco.DetectorParameters`` sobre um corpus rotulado.
+
+Busca aleatória (reprodutível por ``--seed``) no espaço de parâmetros do limiar
+adaptativo e dos filtros de contorno, mais os perfis atuais como candidatos. Cada
+candidato roda ``detectMarkers`` sobre os frames já pré-processados (o preprocess não
+depende dos parâmetros, então é feito uma vez) e é pontuado por
+
+    score = recall - time_weight * (ms_por_frame / ms_do_default) - fp_weight * fp_por_frame
+
+Os perfis gerados vão para ``detector_profiles.json`` e podem ser escolhidos em
+``POST /config {"profile": "fast"}`` ou com DETECTOR_PROFILE=fast:
+
+- "fast":      peso alto de tempo, perdendo no máximo ``--max-recall-loss`` de recall
+- "balanced":  peso baixo de tempo
+- "low-light": pontuado só nos frames "night"/"noise" do corpus
+
+    python tune_detector.py --frames 40 --trials 60
+    python tune_detector.py --corpus gravacoes/patio --output detector_profiles.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from bench_corpus import LabeledFrame, load_corpus, score, synthetic_corpus
+from detection import DEFAULT_DICT_NAME, build_detector, detect_markers
+from detector_profiles import (
+    BUILTIN_PROFILES,
+    PROFILES_FILE,
+    resolve_profile,
+    threshold_passes,
+)
+from preprocess import PreprocessPipeline
+
+# Valores candidatos por parâmetro
+SEARCH_SPACE = {
+    "adaptiveThreshWinSizeMin": [3, 5, 7],
+    "adaptiveThreshWinSizeMax": [15, 23, 33, 43, 53],
+    "adaptiveThreshWinSizeStep": [4, 6, 8, 10, 20],
+    "adaptiveThreshConstant": [5.0, 7.0, 9.0],
+    "minMarkerPerimeterRate": [0.02, 0.03, 0.05],
+    "polygonalApproxAccuracyRate": [0.03, 0.05],
+}
+LOW_LIGHT_CONDITIONS = ("night", "noise")
+
+# nome -> (time_weight, condições avaliadas ou None = todas)
+OBJECTIVES = {
+    "fast": (0.5, None),
+    "balanced": (0.1, None),
+    "low-light": (0.05, LOW_LIGHT_CONDITIONS),
+}
+FP_WEIGHT = 0.5
+
+
+def _candidates(trials: int, seed: int) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    seen = set()
+    out = []
+    # perfis atuais entram sempre (o default é a referência de tempo)
+    for name in BUILTIN_PROFILES:
+        values = resolve_profile(name)
+        out.append(values)
+        seen.add(tuple(sorted(values.items())))
+    base = resolve_profile(None)
+    attempts = 0
+    while len(out) < trials + len(BUILTIN_PROFILES) and attempts < trials * 20:
+        attempts += 1
+        values = dict(base)
+        for key, options in SEARCH_SPACE.items():
+            values[key] = options[int(rng.integers(len(options)))]
+        if values["adaptiveThreshWinSizeMax"] < values["adaptiveThreshWinSizeMin"]:
+            continue
+        key = tuple(sorted(values.items()))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(values)
+    return out
+
+
+def evaluate(values: dict, frames: List[np.ndarray], dict_name: str) -> List[tuple]:
+    """Roda detectMarkers com ``values`` em cada frame pré-processado.
+
+    Retorna [(ids, segundos), ...] na ordem dos frames.
+    """
+    detector = build_detector(dict_name, values=values)[0]
+    detect_markers(detector, frames[0])  # aquecimento
+    out = []
+    for gray in frames:
+        t0 = time.perf_counter()
+        _corners, ids = detect_markers(detector, gray)
+        out.append((ids, time.perf_counter() - t0))
+    return out
+
+
+def summarize(
+    results: List[tuple], corpus: List[LabeledFrame], conditions=None
+) -> Optional[dict]:
+    tp = fp = expected = n = 0
+    seconds = 0.0
+    for (ids, s), f in zip(results, corpus):
+        if conditions and f.condition not in conditions:
+            continue
+        f_tp, f_fp, f_exp = score(f.ids, ids)
+        tp, fp, expected = tp + f_tp, fp + f_fp, expected + f_exp
+        seconds += s
+        n += 1
+    if not n:
+        return None
+    return {
+        "frames": n,
+        "recall": tp / expected if expected else 1.0,
+        "fp_per_frame": fp / n,
+        "detect_ms": seconds / n * 1000,
+    }
+
+
+def objective(summary: dict, ref_ms: float, time_weight: float) -> float:
+    return (
+        summary["recall"]
+        - time_weight * summary["detect_ms"] / ref_ms
+        - FP_WEIGHT * summary["fp_per_frame"]
+    )
+
+
+def _rounded(summary: dict) -> dict:
+    return {
+        "frames": summary["frames"],
+        "recall": round(summary["recall"], 4),
+        "fp_per_frame": round(summary["fp_per_frame"], 4),
+        "detect_ms": round(summary["detect_ms"], 3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", help="pasta com imagens + labels.json")
+    parser.add_argument("--frames", type=int, default=40, help="frames sintéticos")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--size", default="1280x720", help="resolução sintética LxA")
+    parser.add_argument("--dict", default=DEFAULT_DICT_NAME, dest="dict_name")
+    parser.add_argument("--trials", type=int, default=40, help="candidatos aleatórios")
+    parser.add_argument(
+        "--preprocess",
+        default="adaptive",
+        choices=("adaptive", "always"),
+        help="pré-processamento aplicado antes (igual ao PREPROCESS_MODE do serviço)",
+    )
+    parser.add_argument("--max-recall-loss", type=float, default=0.02)
+    parser.add_argument("--output", default=PROFILES_FILE)
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        corpus, dict_name = load_corpus(args.corpus)
+        source = args.corpus
+    else:
+        w, h = (int(v) for v in args.size.lower().split("x"))
+        dict_name = args.dict_name
+        corpus = synthetic_corpus(args.frames, args.seed, (w, h), dict_name)
+        source = "synthetic"
+    if not corpus:
+        print("[TUNE] Corpus vazio")
+        return 2
+
+    preprocess = PreprocessPipeline.from_mode(args.preprocess)
+    frames = [
+        preprocess(cv2.cvtColor(f.image, cv2.COLOR_BGR2GRAY)).copy() for f in corpus
+    ]
+    candidates = _candidates(args.trials, args.seed)
+    print(
+        f"[TUNE] {len(corpus)} frames ({source}), {len(candidates)} candidatos, "
+        f"OpenCV {cv2.__version__}"
+    )
+
+    evaluated = []
+    for i, values in enumerate(candidates):
+        results = evaluate(values, frames, dict_name)
+        full = summarize(results, corpus)
+        evaluated.append((values, results, full))
+        print(
+            f"[TUNE] {i + 1:3d}/{len(candidates)} passes={threshold_passes(values):2d} "
+            f"recall={full['recall']:.3f} fp/frame={full['fp_per_frame']:.3f} "
+            f"{full['detect_ms']:.1f} ms"
+        )
+
+    baseline_values, _baseline_results, baseline = evaluated[0]  # perfil "default"
+    ref_ms = baseline["detect_ms"] or 1.0
+    profiles: Dict[str, dict] = {}
+    for name, (time_weight, conditions) in OBJECTIVES.items():
+        base_subset = summarize(evaluated[0][1], corpus, conditions)
+        if base_subset is None:
+            print(f"[TUNE] Perfil {name}: sem frames das condições {conditions}")
+            continue
+        best = None
+        for values, results, _full in evaluated:
+            subset = summarize(results, corpus, conditions)
+            if subset["recall"] < base_subset["recall"] - args.max_recall_loss:
+                continue
+            s = objective(subset, ref_ms, time_weight)
+            if best is None or s > best[0]:
+                best = (s, values, subset)
+        s, values, subset = best
+        profiles[name] = {
+            "params": values,
+            "threshold_passes": threshold_passes(values),
+            "score": round(s, 4),
+            "metrics": _rounded(subset),
+            "default_metrics": _rounded(base_subset),
+        }
+        print(
+            f"[TUNE] Perfil {name}: passes {threshold_passes(baseline_values)} -> "
+            f"{threshold_passes(values)}, recall {base_subset['recall']:.3f} -> "
+            f"{subset['recall']:.3f}, {base_subset['detect_ms']:.1f} -> "
+            f"{subset['detect_ms']:.1f} ms"
+        )
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "opencv": cv2.__version__,
+        "corpus": {"source": source, "frames": len(corpus), "dict": dict_name},
+        "preprocess": args.preprocess,
+        "default_metrics": _rounded(baseline),
+        "profiles": profiles,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"[TUNE] Perfis salvos em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())